@@ -0,0 +1,178 @@
+from datetime import date
+
+import numpy as np
+
+# date.toordinal() для 1970-01-01: сдвиг к эпохе datetime64[D].
+EPOCH_ORDINAL = 719163
+
+
+class FinanceColumns:
+    # Колоночное представление финансовых записей для аналитики: суммы,
+    # порядковые номера дат и коды категорий лежат в массивах NumPy, а
+    # агрегаты считаются векторно. Массивы растут удвоением, удаление —
+    # перенос последней строки на место удалённой, так что put и remove
+    # стоят O(1) и представление можно держать в синхроне с хранилищем.
+    def __init__(self, amount_function, day_function, category_function) -> None:
+        self.amount_function = amount_function
+        self.day_function = day_function
+        self.category_function = category_function
+        self.size = 0
+        self.amounts = np.empty(0, dtype=np.float64)
+        self.days = np.empty(0, dtype=np.int64)
+        self.codes = np.empty(0, dtype=np.int32)
+        self.ids = []
+        self.positions = {}
+        self.categories = []
+        self.category_codes = {}
+
+    def build(self, data) -> "FinanceColumns":
+        amounts, days, codes = [], [], []
+        for id, value in data.items():
+            self.positions[id] = len(self.ids)
+            self.ids.append(id)
+            amounts.append(self.amount_function(value))
+            days.append(self.day_ordinal(value))
+            codes.append(self.category_code(value))
+        self.amounts = np.array(amounts, dtype=np.float64)
+        self.days = np.array(days, dtype=np.int64)
+        self.codes = np.array(codes, dtype=np.int32)
+        self.size = len(self.ids)
+        return self
+
+    def day_ordinal(self, value: dict) -> int:
+        # Записи с неразборчивой датой получают 0 и в периоды не попадают.
+        day = self.day_function(value)
+        return 0 if day is None else day
+
+    def category_code(self, value: dict) -> int:
+        category = self.category_function(value)
+        if category not in self.category_codes:
+            self.category_codes[category] = len(self.categories)
+            self.categories.append(category)
+        return self.category_codes[category]
+
+    def grow(self) -> None:
+        capacity = max(16, 2 * len(self.amounts))
+        for name in ("amounts", "days", "codes"):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[: self.size] = column[: self.size]
+            setattr(self, name, grown)
+
+    def put(self, id: str, value: dict) -> None:
+        position = self.positions.get(id)
+        if position is None:
+            if self.size == len(self.amounts):
+                self.grow()
+            position = self.size
+            self.positions[id] = position
+            self.ids.append(id)
+            self.size += 1
+        self.amounts[position] = self.amount_function(value)
+        self.days[position] = self.day_ordinal(value)
+        self.codes[position] = self.category_code(value)
+
+    def remove(self, id: str) -> None:
+        position = self.positions.pop(id, None)
+        if position is None:
+            return
+        last = self.size - 1
+        if position != last:
+            self.amounts[position] = self.amounts[last]
+            self.days[position] = self.days[last]
+            self.codes[position] = self.codes[last]
+            self.ids[position] = self.ids[last]
+            self.positions[self.ids[position]] = position
+        self.ids.pop()
+        self.size = last
+
+    def period_mask(self, start: int = None, end: int = None):
+        # Маска живых строк за период; None, если период не задан.
+        if start is None and end is None:
+            return None
+        days = self.days[: self.size]
+        mask = days > 0
+        if start is not None:
+            mask &= days >= start
+        if end is not None:
+            mask &= days <= end
+        return mask
+
+    def columns(self, start: int = None, end: int = None) -> tuple:
+        amounts = self.amounts[: self.size]
+        days = self.days[: self.size]
+        codes = self.codes[: self.size]
+        mask = self.period_mask(start, end)
+        if mask is None:
+            return amounts, days, codes
+        return amounts[mask], days[mask], codes[mask]
+
+    def balance(self) -> float:
+        return float(self.amounts[: self.size].sum())
+
+    def category_totals(self, start: int = None, end: int = None) -> dict:
+        amounts, days, codes = self.columns(start, end)
+        sums = np.bincount(codes, weights=amounts, minlength=len(self.categories))
+        counts = np.bincount(codes, minlength=len(self.categories))
+        return {
+            self.categories[code]: float(sums[code])
+            for code in np.flatnonzero(counts)
+        }
+
+    def rollup(self, period: str = "month", start: int = None, end: int = None) -> dict:
+        # Доходы и расходы по месяцам ("ГГГГ-ММ") или неделям (дата
+        # понедельника "ГГГГ-ММ-ДД").
+        amounts, days, codes = self.columns(start, end)
+        dated = days > 0
+        amounts = amounts[dated]
+        dates = (days[dated] - EPOCH_ORDINAL).astype("datetime64[D]")
+        if period == "month":
+            keys = dates.astype("datetime64[M]")
+        elif period == "week":
+            # 1970-01-01 — четверг, отсюда сдвиг на 3 дня к понедельнику.
+            keys = dates - (dates.astype(np.int64) + 3) % 7
+        else:
+            raise ValueError(f"Неизвестный период: {period}")
+        periods, inverse = np.unique(keys, return_inverse=True)
+        income = np.bincount(
+            inverse, weights=np.where(amounts > 0, amounts, 0), minlength=len(periods)
+        )
+        expense = np.bincount(
+            inverse, weights=np.where(amounts < 0, amounts, 0), minlength=len(periods)
+        )
+        return {
+            str(key): dict(
+                income=float(income[i]),
+                expense=float(expense[i]),
+                total=float(income[i] + expense[i]),
+            )
+            for i, key in enumerate(periods)
+        }
+
+    def running_balance(self) -> dict:
+        # Баланс на конец каждого дня, в котором были записи.
+        amounts, days, codes = self.columns()
+        dated = days > 0
+        order = np.argsort(days[dated], kind="stable")
+        days = days[dated][order]
+        balance = np.cumsum(amounts[dated][order])
+        # Сумма записей без даты учитывается с самого начала.
+        balance += amounts[~dated].sum()
+        last = np.flatnonzero(np.diff(days, append=days[-1:] + 1))
+        return {
+            date.fromordinal(int(days[i])).strftime("%d-%m-%Y"): float(balance[i])
+            for i in last
+        }
+
+    def top_expenses(self, n: int = 10, start: int = None, end: int = None) -> list:
+        # id n крупнейших расходов (самых отрицательных сумм).
+        positions = np.arange(self.size)
+        amounts = self.amounts[: self.size]
+        mask = self.period_mask(start, end)
+        if mask is not None:
+            positions = positions[mask]
+        positions = positions[amounts[positions] < 0]
+        if len(positions) > n:
+            positions = positions[np.argpartition(amounts[positions], n)[:n]]
+        positions = positions[np.argsort(amounts[positions], kind="stable")]
+        return [self.ids[position] for position in positions]
@@ -0,0 +1,308 @@
+import asyncio
+from functools import partial
+
+from personal_assistant import (
+    Contact,
+    ContactManager,
+    FinanceManager,
+    FinanceRecord,
+    Note,
+    NoteManager,
+    Task,
+    TaskManager,
+)
+from storage import JsonStorage
+
+
+class AsyncManager:
+    # Обёртка над синхронным менеджером для asyncio. Изменения применяются
+    # в памяти сразу, в потоке цикла событий, а запись на диск хранилище
+    # откладывает (как при write_behind). Все изменения, пришедшие за одну
+    # итерацию цикла, попадают в одно «окно», которое записывается одним
+    # flush в executor; каждый add/edit/delete возвращается, когда его
+    # окно записано. Копия данных для записи снимается под mutex
+    # хранилища, поэтому чтения и изменения во время записи не ждут.
+    # Хранилища без отложенной записи (SQLite, разделы рабочего
+    # пространства) пишут на диск при каждом изменении — там вызовы окна
+    # копятся и выполняются в executor одним пакетом: одна точка
+    # сохранения и одна фиксация на окно. Чтения ждут конца пакета.
+    manager_class = None
+    entity = None
+
+    def __init__(self, manager, executor=None) -> None:
+        storage = manager.storage
+        self.deferred = isinstance(storage, JsonStorage)
+        if self.deferred:
+            if storage.shared or storage.lazy:
+                raise ValueError("Асинхронный менеджер несовместим с lazy и shared")
+            storage.deferring = True
+        self.manager = manager
+        self.queued = []
+        self.executor = executor
+        self.window = None
+        self.flushing = None
+        self.flush_task = None
+        self.busy = None
+
+    @classmethod
+    async def open(cls, filename: str, executor=None, **options) -> "AsyncManager":
+        # Загрузка файла — тоже дисковая операция, поэтому в executor.
+        loop = asyncio.get_running_loop()
+        manager = await loop.run_in_executor(
+            executor, partial(cls.manager_class, filename, **options)
+        )
+        return cls(manager, executor)
+
+    @property
+    def data(self):
+        return self.manager.data
+
+    async def settled(self) -> None:
+        while self.busy is not None:
+            await asyncio.shield(self.busy)
+
+    async def read(self, method, *args, **kwargs):
+        await self.settled()
+        return method(*args, **kwargs)
+
+    async def write(self, method, *args, **kwargs):
+        await self.settled()
+        if self.deferred:
+            result = method(*args, **kwargs)
+        else:
+            position = len(self.queued)
+            self.queued.append((method, args, kwargs))
+        if self.window is None:
+            loop = asyncio.get_running_loop()
+            self.window = loop.create_future()
+            self.flush_task = loop.create_task(self.flush_window())
+        results = await asyncio.shield(self.window)
+        return result if self.deferred else results[position]
+
+    def run_queued(self, queued: list) -> list:
+        # Ошибка любого вызова откатывает пакет окна целиком.
+        with self.manager.batch():
+            return [method(*args, **kwargs) for method, args, kwargs in queued]
+
+    async def flush(self) -> None:
+        window = self.window
+        if window is None:
+            return
+        await self.flush_window()
+        window.result()
+
+    async def flush_window(self) -> None:
+        # Ошибку записи получают все, кто ждёт окна; фоновая задача её
+        # не поднимает, чтобы она не повисла неполученной. Записи идут
+        # по очереди: следующее окно ждёт окончания предыдущего.
+        while self.flushing is not None:
+            await asyncio.shield(self.flushing)
+        if self.window is None:
+            return
+        window, self.window = self.window, None
+        queued, self.queued = self.queued, []
+        loop = asyncio.get_running_loop()
+        if self.deferred:
+            self.flushing = loop.run_in_executor(self.executor, self.manager.flush)
+        else:
+            self.flushing = self.busy = loop.run_in_executor(
+                self.executor, self.run_queued, queued
+            )
+        try:
+            results = await self.flushing
+        except Exception as error:
+            window.set_exception(error)
+            window.exception()
+        else:
+            window.set_result(results)
+        finally:
+            self.flushing = None
+            if not self.deferred:
+                self.busy = None
+
+    async def exclusive(self, method, *args, **kwargs):
+        # Тяжёлые операции (полный снимок, импорт, экспорт) целиком идут в
+        # executor, и на это время цикл не трогает данные менеджера.
+        await self.settled()
+
+        def run():
+            result = method(*args, **kwargs)
+            self.manager.flush()
+            return result
+
+        loop = asyncio.get_running_loop()
+        self.busy = loop.run_in_executor(self.executor, run)
+        try:
+            return await self.busy
+        finally:
+            self.busy = None
+
+    async def iterate(self, chunk: int = 500):
+        # Асинхронный обход: между порциями отдаём управление циклу, а
+        # изменения, сделанные за это время, видны (удалённые пропускаются).
+        await self.settled()
+        ids = list(self.data)
+        for start in range(0, len(ids), chunk):
+            await self.settled()
+            data = self.data
+            for id in ids[start : start + chunk]:
+                value = data.get(id)
+                if value is not None:
+                    yield self.entity.from_json(value)
+            await asyncio.sleep(0)
+
+    async def save_to_file(self) -> None:
+        await self.exclusive(self.manager.save_to_file)
+
+    async def export_to_csv(self, filename: str) -> None:
+        await self.exclusive(self.manager.export_to_csv, filename)
+
+    async def import_from_csv(self, filename: str, merge: bool = False) -> int:
+        return await self.exclusive(self.manager.import_from_csv, filename, merge)
+
+    async def close(self) -> None:
+        await self.settled()
+        await self.flush()
+        while self.flushing is not None:
+            await asyncio.shield(self.flushing)
+
+
+class AsyncNoteManager(AsyncManager):
+    manager_class = NoteManager
+    entity = Note
+
+    async def create_note(self, note: Note) -> None:
+        await self.write(self.manager.create_note, note)
+
+    async def edit_note(self, note: Note) -> None:
+        await self.write(self.manager.edit_note, note)
+
+    async def delete_note(self, id: str) -> None:
+        await self.write(self.manager.delete_note, id)
+
+    async def get_all_notes(self) -> list[Note]:
+        return await self.read(self.manager.get_all_notes)
+
+    async def get_note_by_id(self, id: str) -> Note:
+        return await self.read(self.manager.get_note_by_id, id)
+
+    async def search_notes(
+        self, query: str, limit: int = None, prefix: bool = False
+    ) -> list[Note]:
+        return await self.read(self.manager.search_notes, query, limit, prefix)
+
+    def iter_notes(self, chunk: int = 500):
+        return self.iterate(chunk)
+
+
+class AsyncTaskManager(AsyncManager):
+    manager_class = TaskManager
+    entity = Task
+
+    async def add_task(self, task: Task) -> None:
+        await self.write(self.manager.add_task, task)
+
+    async def edit_task(self, updated_task: Task) -> None:
+        await self.write(self.manager.edit_task, updated_task)
+
+    async def delete_task(self, task_id: str) -> None:
+        await self.write(self.manager.delete_task, task_id)
+
+    async def get_all_tasks(self) -> list[Task]:
+        return await self.read(self.manager.get_all_tasks)
+
+    async def get_task_by_id(self, task_id: str) -> Task:
+        return await self.read(self.manager.get_task_by_id, task_id)
+
+    async def filter_tasks(self, status=None, priority=None, due_date=None) -> list[Task]:
+        return await self.read(self.manager.filter_tasks, status, priority, due_date)
+
+    async def tasks_due_between(
+        self, start_date: str = None, end_date: str = None, status=None
+    ) -> list[Task]:
+        return await self.read(
+            self.manager.tasks_due_between, start_date, end_date, status
+        )
+
+    async def overdue_tasks(self, today: str = None) -> list[Task]:
+        return await self.read(self.manager.overdue_tasks, today)
+
+    async def tasks_due_soon(self, days: int = 7, today: str = None) -> list[Task]:
+        return await self.read(self.manager.tasks_due_soon, days, today)
+
+    def iter_tasks(self, chunk: int = 500):
+        return self.iterate(chunk)
+
+
+class AsyncContactManager(AsyncManager):
+    manager_class = ContactManager
+    entity = Contact
+
+    async def add_contact(self, contact: Contact) -> None:
+        await self.write(self.manager.add_contact, contact)
+
+    async def edit_contact(self, updated_contact: Contact) -> None:
+        await self.write(self.manager.edit_contact, updated_contact)
+
+    async def delete_contact(self, contact_id: str) -> None:
+        await self.write(self.manager.delete_contact, contact_id)
+
+    async def get_all_contacts(self) -> list[Contact]:
+        return await self.read(self.manager.get_all_contacts)
+
+    async def search_contact(
+        self, query: str, limit: int = None, prefix: bool = False
+    ) -> list[Contact]:
+        return await self.read(self.manager.search_contact, query, limit, prefix)
+
+    def iter_contacts(self, chunk: int = 500):
+        return self.iterate(chunk)
+
+
+class AsyncFinanceManager(AsyncManager):
+    manager_class = FinanceManager
+    entity = FinanceRecord
+
+    async def add_record(self, record: FinanceRecord) -> None:
+        await self.write(self.manager.add_record, record)
+
+    async def edit_record(self, updated_record: FinanceRecord) -> None:
+        await self.write(self.manager.edit_record, updated_record)
+
+    async def delete_record(self, record_id: str) -> None:
+        await self.write(self.manager.delete_record, record_id)
+
+    async def get_all_records(self) -> list[FinanceRecord]:
+        return await self.read(self.manager.get_all_records)
+
+    async def filter_records(self, category=None, date=None) -> list[FinanceRecord]:
+        return await self.read(self.manager.filter_records, category, date)
+
+    async def records_between(
+        self, start_date=None, end_date=None
+    ) -> list[FinanceRecord]:
+        return await self.read(self.manager.records_between, start_date, end_date)
+
+    async def calculate_balance(self) -> float:
+        return await self.read(self.manager.calculate_balance)
+
+    async def generate_report(self, start_date=None, end_date=None) -> dict:
+        return await self.read(self.manager.generate_report, start_date, end_date)
+
+    async def category_totals(self, start_date=None, end_date=None) -> dict:
+        return await self.read(self.manager.category_totals, start_date, end_date)
+
+    async def monthly_totals(self, start_date=None, end_date=None) -> dict:
+        return await self.read(self.manager.monthly_totals, start_date, end_date)
+
+    async def weekly_totals(self, start_date=None, end_date=None) -> dict:
+        return await self.read(self.manager.weekly_totals, start_date, end_date)
+
+    async def running_balance(self) -> dict:
+        return await self.read(self.manager.running_balance)
+
+    async def top_expenses(self, n: int = 10, start_date=None, end_date=None) -> list:
+        return await self.read(self.manager.top_expenses, n, start_date, end_date)
+
+    def iter_records(self, chunk: int = 500):
+        return self.iterate(chunk)
@@ -0,0 +1,379 @@
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from itertools import cycle
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from personal_assistant import (  # noqa: E402
+    MANAGERS,
+    Contact,
+    FinanceRecord,
+    Note,
+    Task,
+)
+
+BACKENDS = dict(
+    json=(".json", {}),
+    journal=(".json", dict(journal=True)),
+    binary=(".bin", {}),
+    sqlite=(".db", {}),
+)
+PRIORITIES = ("Высокий", "Средний", "Низкий")
+CATEGORIES = ("еда", "транспорт", "жильё", "зарплата", "связь", "здоровье")
+WORDS = (
+    "анна борис виктор галина дмитрий елена иван ольга пётр мария "
+    "отчёт встреча проект звонок покупка счёт ремонт поездка"
+).split()
+
+
+class Generator:
+    # Синтетические записи: при одном seed одни и те же данные, включая
+    # id, — прогоны на разных машинах и версиях сравнимы между собой.
+    def __init__(self, seed: int) -> None:
+        self.random = random.Random(seed)
+
+    def id(self) -> str:
+        return str(uuid.UUID(int=self.random.getrandbits(128)))
+
+    def date(self) -> str:
+        return (
+            f"{self.random.randint(1, 28):02d}-{self.random.randint(1, 12):02d}-"
+            f"{self.random.randint(2020, 2025)}"
+        )
+
+    def text(self, words: int) -> str:
+        return " ".join(self.random.choice(WORDS) for _ in range(words))
+
+    def note(self) -> Note:
+        return Note(self.text(3), self.text(20), f"{self.date()} 12:00:00", self.id())
+
+    def task(self) -> Task:
+        return Task(
+            self.text(3),
+            self.text(10),
+            self.random.choice(PRIORITIES),
+            self.date(),
+            self.id(),
+            self.random.random() < 0.3,
+        )
+
+    def contact(self) -> Contact:
+        name = f"{self.random.choice(WORDS).title()} {self.random.randint(1, 10**6)}"
+        return Contact(
+            name,
+            f"+7{self.random.randint(10**9, 10**10 - 1)}",
+            f"user{self.random.randint(1, 10**6)}@example.com",
+            self.id(),
+        )
+
+    def record(self) -> FinanceRecord:
+        return FinanceRecord(
+            round(self.random.uniform(-5000, 5000), 2),
+            self.random.choice(CATEGORIES),
+            self.date(),
+            self.text(4),
+            self.id(),
+        )
+
+
+ENTITIES = dict(
+    notes=Generator.note,
+    tasks=Generator.task,
+    contacts=Generator.contact,
+    finance=Generator.record,
+)
+
+
+class Workspace:
+    # Хранилища одного размера. Каждый замер открывает менеджер на свежей
+    # копии файла, так что изменяющие замеры не влияют на следующие.
+    def __init__(self, directory: str, size: int, backend: str, seed: int) -> None:
+        self.directory = directory
+        self.size = size
+        self.extension, self.options = BACKENDS[backend]
+        self.generator = Generator(seed)
+        self.ids = {}
+        self.copies = 0
+        self.scratch = os.path.join(directory, "scratch")
+        self.clean()
+        for kind, make in ENTITIES.items():
+            data = {}
+            for _ in range(size):
+                entity = make(self.generator)
+                data[entity.id] = entity.to_json()
+            manager = self.open(kind, self.source(kind))
+            manager.storage.replace(data)
+            manager.flush()
+            if hasattr(manager.storage, "connection"):
+                # Копируется только сам файл базы — переносим в него WAL.
+                manager.storage.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.ids[kind] = list(data)
+
+    def source(self, kind: str) -> str:
+        return os.path.join(self.directory, f"{kind}-{self.size}{self.extension}")
+
+    def open(self, kind: str, filename: str):
+        return MANAGERS[kind](filename, **self.options)
+
+    def clean(self) -> None:
+        # Копии и CSV одного замера; на миллионе записей их лучше не копить.
+        shutil.rmtree(self.scratch, ignore_errors=True)
+        os.makedirs(self.scratch)
+
+    def copy(self, kind: str) -> str:
+        self.copies += 1
+        filename = os.path.join(self.scratch, f"copy{self.copies}{self.extension}")
+        shutil.copy(self.source(kind), filename)
+        return filename
+
+    def manager(self, kind: str):
+        return self.open(kind, self.copy(kind))
+
+    def random_ids(self, kind: str, count: int) -> list:
+        return [self.generator.random.choice(self.ids[kind]) for _ in range(count)]
+
+
+# Каждый замер — функция (workspace) -> операция без аргументов. Подготовка
+# (открытие менеджера, выбор id) в замер не входит.
+def cold_start(kind: str):
+    return lambda workspace: (lambda: workspace.open(kind, workspace.source(kind)))
+
+
+def add(kind: str, method: str):
+    def prepare(workspace):
+        manager = workspace.manager(kind)
+        make = ENTITIES[kind]
+        return lambda: getattr(manager, method)(make(workspace.generator))
+
+    return prepare
+
+
+def get_by_id(kind: str, method: str):
+    def prepare(workspace):
+        manager = workspace.manager(kind)
+        ids = cycle(workspace.random_ids(kind, 1000))
+        return lambda: getattr(manager, method)(next(ids))
+
+    return prepare
+
+
+def get_all(kind: str, method: str):
+    def prepare(workspace):
+        return getattr(workspace.manager(kind), method)
+
+    return prepare
+
+
+def filter_tasks(workspace):
+    manager = workspace.manager("tasks")
+    choice = workspace.generator.random.choice
+    return lambda: manager.filter_tasks(
+        status=choice((True, False)), priority=choice(PRIORITIES)
+    )
+
+
+def search_contact(workspace):
+    manager = workspace.manager("contacts")
+    choice = workspace.generator.random.choice
+    return lambda: manager.search_contact(choice(WORDS), limit=20)
+
+
+# Отчёты запоминаются (@memoized) до следующего изменения: замер без
+# сброса мерил бы повторную выдачу запомненного, а не сам отчёт.
+def generate_report(workspace):
+    manager = workspace.manager("finance")
+    generator = workspace.generator
+
+    def run():
+        manager.memo.clear()
+        year = generator.random.randint(2020, 2025)
+        return manager.generate_report(f"01-01-{year}", f"28-06-{year}")
+
+    return run
+
+
+def calculate_balance(workspace):
+    manager = workspace.manager("finance")
+
+    def run():
+        manager.memo.clear()
+        return manager.calculate_balance()
+
+    return run
+
+
+def export_csv(kind: str):
+    def prepare(workspace):
+        manager = workspace.manager(kind)
+        filename = os.path.join(workspace.scratch, f"{kind}.csv")
+        return lambda: manager.export_to_csv(filename)
+
+    return prepare
+
+
+def import_csv(kind: str):
+    def prepare(workspace):
+        filename = os.path.join(workspace.scratch, f"{kind}-import.csv")
+        workspace.manager(kind).export_to_csv(filename)
+        manager = workspace.manager(kind)
+        return lambda: manager.import_from_csv(filename)
+
+    return prepare
+
+
+BENCHMARKS = dict(
+    **{f"init_{kind}": cold_start(kind) for kind in ENTITIES},
+    create_note=add("notes", "create_note"),
+    add_task=add("tasks", "add_task"),
+    add_contact=add("contacts", "add_contact"),
+    add_record=add("finance", "add_record"),
+    get_note_by_id=get_by_id("notes", "get_note_by_id"),
+    get_task_by_id=get_by_id("tasks", "get_task_by_id"),
+    get_all_tasks=get_all("tasks", "get_all_tasks"),
+    filter_tasks=filter_tasks,
+    search_contact=search_contact,
+    generate_report=generate_report,
+    calculate_balance=calculate_balance,
+    export_tasks_csv=export_csv("tasks"),
+    import_tasks_csv=import_csv("tasks"),
+    export_finance_csv=export_csv("finance"),
+    import_finance_csv=import_csv("finance"),
+)
+
+
+def percentile(values: list, fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def measure(prepare, workspace, min_time: float, max_ops: int) -> dict:
+    # Операция повторяется, пока не наберётся min_time секунд (но не
+    # больше max_ops раз). Память — пик аллокаций Python за одну операцию
+    # после прогрева в отдельном прогоне: tracemalloc сам замедляет код и
+    # исказил бы время.
+    run = prepare(workspace)
+    run()  # прогрев: ленивые индексы и кэши строятся один раз
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < max_ops and (
+        not latencies or time.perf_counter() - started < min_time
+    ):
+        start = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - start)
+    total = time.perf_counter() - started
+    latencies.sort()
+
+    run = prepare(workspace)
+    run()
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return dict(
+        ops=len(latencies),
+        ops_per_s=len(latencies) / total,
+        p50_us=statistics.median(latencies) * 10**6,
+        p95_us=percentile(latencies, 0.95) * 10**6,
+        p99_us=percentile(latencies, 0.99) * 10**6,
+        peak_kb=peak / 1024,
+    )
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    # Регрессия — пропускная способность ниже базовой больше чем на
+    # tolerance или пик памяти выше базового больше чем на tolerance.
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["ops_per_s"] < base["ops_per_s"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {result['ops_per_s']:.1f} оп/с против {base['ops_per_s']:.1f}"
+            )
+        if result["peak_kb"] > base["peak_kb"] * (1 + tolerance) + 64:
+            regressions.append(
+                f"{name}: пик памяти {result['peak_kb']:.0f} КБ против {base['peak_kb']:.0f}"
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Производительность менеджеров на синтетических хранилищах"
+    )
+    parser.add_argument(
+        "--sizes",
+        default="1000,100000",
+        help="размеры хранилищ через запятую, например 1000,100000,1000000",
+    )
+    parser.add_argument("--backend", choices=BACKENDS, default="json")
+    parser.add_argument("--only", help="замеры через запятую (по умолчанию все)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--min-time", type=float, default=1.0, help="секунд на каждый замер"
+    )
+    parser.add_argument("--max-ops", type=int, default=10000)
+    parser.add_argument("--baseline", help="JSON с прошлыми результатами для сравнения")
+    parser.add_argument("--save", help="сохранить результаты как новую базу")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="допустимое ухудшение относительно базы (доля)",
+    )
+    args = parser.parse_args()
+
+    # Построчные сообщения менеджеров (в том числе предупреждения о
+    # создании файлов) мерили бы вместо них самих.
+    logging.disable(logging.WARNING)
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"неизвестные замеры: {', '.join(sorted(unknown))}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in map(int, args.sizes.split(",")):
+            started = time.perf_counter()
+            workspace = Workspace(directory, size, args.backend, args.seed)
+            print(
+                f"# {size} записей, {args.backend}: хранилища созданы за "
+                f"{time.perf_counter() - started:.1f} с"
+            )
+            for name in names:
+                key = f"{args.backend}/{size}/{name}"
+                result = measure(BENCHMARKS[name], workspace, args.min_time, args.max_ops)
+                results[key] = result
+                workspace.clean()
+                print(
+                    f"{key}: {result['ops_per_s']:.1f} оп/с, "
+                    f"p50 {result['p50_us']:.1f} мкс, p95 {result['p95_us']:.1f} мкс, "
+                    f"p99 {result['p99_us']:.1f} мкс, пик {result['peak_kb']:.0f} КБ"
+                )
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, ensure_ascii=False)
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding="utf-8") as file:
+        regressions = compare(results, json.load(file), args.tolerance)
+    for regression in regressions:
+        print(f"Регрессия: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
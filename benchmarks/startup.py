@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Модули, которые не должны загружаться при простом импорте менеджеров:
+# они нужны только отдельным режимам и подгружаются при первом обращении.
+HEAVY_MODULES = ("pandas", "numpy", "sqlite3")
+
+IMPORT_SNIPPET = (
+    "import sys, json, personal_assistant; "
+    f"print(json.dumps(sorted(set({HEAVY_MODULES!r}) & set(sys.modules))))"
+)
+
+
+def run(code: str) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, check=True, stdout=subprocess.DEVNULL
+    )
+    return time.perf_counter() - start
+
+
+def measure(runs: int) -> dict:
+    interpreter = [run("pass") for _ in range(runs)]
+    startup = [run("import personal_assistant") for _ in range(runs)]
+    overhead = statistics.median(startup) - statistics.median(interpreter)
+    return dict(
+        interpreter_ms=statistics.median(interpreter) * 1000,
+        startup_ms=statistics.median(startup) * 1000,
+        import_overhead_ms=overhead * 1000,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Время запуска personal_assistant и бюджет на регрессии"
+    )
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=100.0,
+        help="допустимое время импорта сверх запуска голого интерпретатора",
+    )
+    args = parser.parse_args()
+
+    loaded = json.loads(
+        subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            cwd=ROOT,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+    )
+    result = measure(args.runs)
+    for name, value in result.items():
+        print(f"{name}: {value:.1f}")
+
+    failed = False
+    if loaded:
+        print(f"При старте загружены тяжёлые модули: {', '.join(loaded)}")
+        failed = True
+    if result["import_overhead_ms"] > args.budget_ms:
+        print(
+            f"Импорт занимает {result['import_overhead_ms']:.1f} мс "
+            f"при бюджете {args.budget_ms:.1f} мс"
+        )
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import csv
+import io
+import json
+import logging
+import mmap
+import operator
+import os
+import re
+import uuid
+
+# Размер куска файла для одного процесса. Куски крупные: на каждый
+# приходится пересылка результата в основной процесс, и она должна
+# теряться на фоне разбора.
+CHUNK_SIZE = 4 * 2**20
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+# Сколько ошибок строк попадает в лог; остальные — только в результат.
+ERRORS_LOGGED = 100
+# Байты, не разобранные как UTF-8, после decode(errors="surrogateescape").
+UNDECODED = re.compile("[\udc80-\udcff]")
+UNDECODED_MESSAGE = "некорректная последовательность UTF-8"
+
+
+def convert_values(values: list, converters: tuple, key: int) -> tuple:
+    # Значения записи в порядке полей схемы: приведение типов (строки и
+    # пропуски; ValueError — строка с ошибкой) и id, если его нет.
+    for position, converter in converters:
+        current = values[position]
+        if current is None or isinstance(current, str):
+            values[position] = converter(current or "")
+    if not values[key]:
+        values[key] = str(uuid.uuid4())
+    return tuple(values)
+
+
+def record_end(buffer, start: int, position: int) -> int:
+    # Конец записи CSV не раньше position: перевод строки вне кавычек.
+    # start — начало записи; кавычки внутри поля удваиваются, поэтому
+    # «внутри кавычек» — это нечётное их число от start.
+    inside = buffer[start:position].count(b'"') % 2
+    while True:
+        newline = buffer.find(b"\n", position)
+        if newline == -1:
+            return len(buffer)
+        inside ^= buffer[position:newline].count(b'"') % 2
+        if not inside:
+            return newline + 1
+        position = newline + 1
+
+
+def split_file(filename: str, csv_format: bool, chunk_size: int = CHUNK_SIZE):
+    # Заголовок CSV (или None) и куски (начало, конец, номер первой
+    # строки) по границам записей. Файл читается через mmap и только
+    # считается — разбирают его процессы.
+    with open(filename, "rb") as file:
+        if not os.fstat(file.fileno()).st_size:
+            return None, []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            size = len(buffer)
+            header = None
+            start = 0
+            if csv_format:
+                start = record_end(buffer, 0, 0)
+                header = next(csv.reader([buffer[:start].decode("utf-8")]), [])
+            line = buffer[:start].count(b"\n") + 1
+            chunks = []
+            while start < size:
+                end = min(start + chunk_size, size)
+                if end < size:
+                    end = (
+                        record_end(buffer, start, end)
+                        if csv_format
+                        else buffer.find(b"\n", end) + 1 or size
+                    )
+                chunks.append((start, end, line))
+                line += buffer[start:end].count(b"\n")
+                start = end
+    return header, chunks
+
+
+def parse_chunk(job: tuple) -> tuple:
+    # Разбор одного куска в процессе пула: записи — кортежи в порядке
+    # fields (пересылаются дешевле словарей), поля вне схемы
+    # отбрасываются, недостающие — None; ошибки — (номер строки,
+    # сообщение). Ошибка строки её пропускает, а не обрывает кусок.
+    # Строки делятся только по "\n", как их считает split_file:
+    # splitlines() разбил бы и по U+2028, \x85 и другим разделителям.
+    filename, start, end, line, header, fields, converters = job
+    with open(filename, "rb") as file:
+        file.seek(start)
+        blob = file.read(end - start)
+    try:
+        text = blob.decode("utf-8")
+        damaged = False
+    except UnicodeDecodeError:
+        # Нераспознанные байты не заменяются молча на U+FFFD: строка с
+        # ними идёт в ошибки.
+        text = blob.decode("utf-8", errors="surrogateescape")
+        damaged = True
+    key = fields.index("id")
+    converters = tuple(
+        (fields.index(field), converter) for field, converter in converters.items()
+    )
+    rows = []
+    errors = []
+    if header is None:
+        for number, source in enumerate(io.StringIO(text, newline="\n"), start=line):
+            if not source.strip():
+                continue
+            try:
+                if damaged and UNDECODED.search(source):
+                    raise ValueError(UNDECODED_MESSAGE)
+                record = json.loads(source)
+                if not isinstance(record, dict):
+                    raise ValueError("ожидался объект JSON")
+                values = [record.get(field) for field in fields]
+                rows.append(convert_values(values, converters, key))
+            except ValueError as error:
+                errors.append((number, str(error)))
+        return rows, errors
+
+    # Столбцы схемы по заголовку; отсутствующим соответствует лишний
+    # None в конце строки. При повторе имени берётся последний столбец,
+    # как у csv.DictReader.
+    width = len(header)
+    columns = {name: position for position, name in enumerate(header)}
+    pick = operator.itemgetter(*(columns.get(field, width) for field in fields))
+    padding = [None] * (width + 1)
+    # Одиночный "\r" вне кавычек csv считает ошибкой строки, а не её
+    # концом — иначе номера строк разошлись бы с split_file.
+    reader = csv.reader(io.StringIO(text, newline="\n"))
+    consumed = 0
+    while True:
+        number = line + consumed
+        try:
+            row = next(reader)
+        except StopIteration:
+            break
+        except csv.Error as error:
+            errors.append((number, str(error)))
+            consumed = reader.line_num
+            continue
+        consumed = reader.line_num
+        if not row:
+            continue
+        if damaged and any(map(UNDECODED.search, row)):
+            errors.append((number, UNDECODED_MESSAGE))
+            continue
+        row = (row + padding)[: width + 1]
+        try:
+            rows.append(convert_values(list(pick(row)), converters, key))
+        except ValueError as error:
+            errors.append((number, str(error)))
+    return rows, errors
+
+
+def parse_file(
+    filename: str, fields: tuple, converters: dict, workers: int = None,
+    chunk_size: int = CHUNK_SIZE,
+):
+    # Куски (строки, ошибки) в порядке файла. Формат — по расширению:
+    # .ndjson/.jsonl — по объекту JSON в строке, остальное — CSV с
+    # заголовком. workers — число процессов (None — по числу ядер);
+    # файл в один кусок или workers=1 разбирается без пула.
+    header, chunks = split_file(
+        filename, not filename.endswith(NDJSON_EXTENSIONS), chunk_size
+    )
+    jobs = [(filename, *chunk, header, fields, converters) for chunk in chunks]
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        yield from map(parse_chunk, jobs)
+        return
+    # Пул нужен только здесь — не тянем multiprocessing при старте.
+    from concurrent.futures import ProcessPoolExecutor
+
+    logging.info(f"Разбор {filename}: {len(jobs)} кусков в {workers} процессах")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(parse_chunk, jobs)
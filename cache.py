@@ -0,0 +1,91 @@
+import threading
+from collections import OrderedDict
+
+# Предел кэша по умолчанию: объекты давно не читанных записей
+# вытесняются, а выборки больше него идут мимо кэша (см. fits).
+CACHE_SIZE = 10000
+
+
+class EntityCache:
+    # Кэш сущностей менеджера: id -> объект, собранный из словаря записи.
+    # Повторное чтение не вызывает from_json (и не читает запись с диска
+    # в ленивом режиме), а отдаёт копию кэшированного объекта
+    # (entity.copy()): объекты изменяемы, и правка чужой копии не должна
+    # менять то, что прочтут другие. size ограничивает число объектов
+    # (вытесняются давно не читанные, LRU), None — без ограничения,
+    # 0 — кэш выключен; по умолчанию — CACHE_SIZE.
+    # Как и индексы, это производная структура: put и remove сбрасывают
+    # объект по id, и следующее чтение соберёт его заново.
+    def __init__(self, factory, size: int = CACHE_SIZE) -> None:
+        self.factory = factory
+        self.size = size
+        self.entries = OrderedDict()
+        # Читатели в режиме thread_safe идут параллельно, а чтение здесь
+        # тоже меняет порядок объектов.
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def fits(self, count: int) -> bool:
+        # Выборка больше кэша вытеснила бы его целиком и сама в нём не
+        # удержалась — такие выборки собираются мимо кэша.
+        return self.size is None or count <= self.size
+
+    def add(self, key: str, value: dict):
+        entity = self.factory(value)
+        if self.size == 0:
+            return entity
+        with self.lock:
+            self.misses += 1
+            self.entries[key] = entity
+            if self.size is not None and len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return entity.copy()
+
+    def get(self, key: str, data: dict):
+        with self.lock:
+            entity = self.entries.get(key)
+            if entity is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entity.copy()
+        return self.add(key, data[key])
+
+    def lookup(self, keys, data: dict) -> list:
+        # Объекты по id; запись из data читается только при промахе, так
+        # что ленивая таблица не читает с диска то, что уже в кэше.
+        keys = list(keys)
+        if not self.fits(len(keys)):
+            return [self.factory(data[key]) for key in keys]
+        entries = self.entries
+        result = []
+        missing = []
+        with self.lock:
+            for key in keys:
+                entity = entries.get(key)
+                if entity is None:
+                    missing.append(len(result))
+                else:
+                    entries.move_to_end(key)
+                    entity = entity.copy()
+                result.append(entity)
+            self.hits += len(result) - len(missing)
+        for position in missing:
+            key = keys[position]
+            result[position] = self.add(key, data[key])
+        return result
+
+    def wrap(self, values) -> list:
+        # То же для уже прочитанных записей (выборки SQLite).
+        values = list(values)
+        return self.lookup(
+            [value["id"] for value in values],
+            {value["id"]: value for value in values},
+        )
+
+    def put(self, key: str, value: dict) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def remove(self, key: str) -> None:
+        self.put(key, None)
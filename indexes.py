@@ -0,0 +1,500 @@
+import heapq
+import math
+import re
+from bisect import bisect_left, bisect_right, insort
+
+
+class FieldIndex:
+    # Значение поля -> id записей с этим значением. Постинги — dict без
+    # значений: это упорядоченное множество, поэтому результаты фильтров
+    # идут в порядке добавления, как и раньше.
+    def __init__(self, key_function) -> None:
+        self.key_function = key_function
+        self.postings = {}
+        self.keys = {}
+
+    def put(self, id: str, value: dict) -> None:
+        self.remove(id)
+        key = self.key_function(value)
+        self.postings.setdefault(key, {})[id] = None
+        self.keys[id] = key
+
+    def remove(self, id: str) -> None:
+        if id not in self.keys:
+            return
+        key = self.keys.pop(id)
+        posting = self.postings[key]
+        del posting[id]
+        if not posting:
+            del self.postings[key]
+
+    def build(self, data) -> "FieldIndex":
+        # Сборка с нуля: без remove и повторного поиска на каждую запись.
+        postings = self.postings
+        keys = self.keys
+        key_function = self.key_function
+        for id, value in data.items():
+            key = keys[id] = key_function(value)
+            posting = postings.get(key)
+            if posting is None:
+                posting = postings[key] = {}
+            posting[id] = None
+        return self
+
+    def get(self, key) -> dict:
+        return self.postings.get(key, {})
+
+
+class SortedIndex:
+    # Отсортированный список (ключ, id) для запросов по диапазону.
+    # Записи без ключа (None) в индекс не попадают.
+    def __init__(self, key_function) -> None:
+        self.key_function = key_function
+        self.entries = []
+        self.keys = {}
+
+    def build(self, data) -> "SortedIndex":
+        # Сборка с нуля: ключи сортируются один раз. insort на каждую
+        # запись сдвигал бы список и давал O(N²) на большом хранилище;
+        # он остаётся только для одиночных изменений.
+        for id, value in data.items():
+            key = self.key_function(value)
+            if key is not None:
+                self.keys[id] = key
+        self.entries = sorted((key, id) for id, key in self.keys.items())
+        return self
+
+    def put(self, id: str, value: dict) -> None:
+        self.remove(id)
+        key = self.key_function(value)
+        if key is None:
+            return
+        insort(self.entries, (key, id))
+        self.keys[id] = key
+
+    def remove(self, id: str) -> None:
+        if id not in self.keys:
+            return
+        entry = (self.keys.pop(id), id)
+        position = bisect_left(self.entries, entry)
+        del self.entries[position]
+
+    def range(self, low=None, high=None) -> list:
+        # Границы включительно; None — без ограничения с этой стороны.
+        start = 0 if low is None else bisect_left(self.entries, (low,))
+        end = (
+            len(self.entries)
+            if high is None
+            else bisect_right(self.entries, (high, chr(0x10FFFF)))
+        )
+        return [id for key, id in self.entries[start:end]]
+
+
+class Indexes(dict):
+    # Набор именованных индексов одного хранилища, обновляемых вместе.
+    # Индекс строится при первом обращении по имени: запросу нужны один-
+    # два индекса, а не все. Изменения получают только построенные.
+    def __init__(self, data, **definitions) -> None:
+        super().__init__()
+        self.data = data
+        self.definitions = definitions
+
+    def __missing__(self, name: str):
+        index = self[name] = self.definitions[name].build(self.data)
+        return index
+
+    def build(self) -> "Indexes":
+        for name in self.definitions:
+            self[name]
+        return self
+
+    def put(self, id: str, value: dict) -> None:
+        for index in self.values():
+            index.put(id, value)
+
+    def remove(self, id: str) -> None:
+        for index in self.values():
+            index.remove(id)
+
+
+def intersect(postings: list) -> list:
+    # Пересечение постингов: идём по самому короткому и проверяем
+    # вхождение в остальные.
+    postings = sorted(postings, key=len)
+    return [id for id in postings[0] if all(id in posting for posting in postings[1:])]
+
+
+def money_parts(amount) -> tuple:
+    # Сумма -> (целые копейки, остаток). Копейки складываются без
+    # погрешности, поэтому итог по сотням тысяч записей совпадает с
+    # точной суммой; в остаток идут только суммы с долями копейки.
+    if isinstance(amount, int):
+        return amount * 100, 0.0
+    if isinstance(amount, float) and math.isfinite(amount):
+        cents = round(amount * 100)
+        if cents / 100 == amount:
+            return cents, 0.0
+    return 0, amount
+
+
+def money_total(cents: int, rest: float) -> float:
+    # Деление целых в Python округляется верно: 74194439 / 100 — это
+    # ровно ближайший к 741944.39 float.
+    return cents / 100 + rest if rest else cents / 100
+
+
+def money_sum(amounts) -> float:
+    # Сумма денежных сумм без накопления погрешности float.
+    cents, rest = 0, 0.0
+    for amount in amounts:
+        amount_cents, amount_rest = money_parts(amount)
+        cents += amount_cents
+        rest += amount_rest
+    return money_total(cents, rest)
+
+
+class RangeSumIndex:
+    # Суммы value по группам для диапазона ключей (например, по
+    # категориям за период). Храним суммы по ячейкам (ключ, группа) и
+    # отсортированный список ключей: отчёт — это два bisect и сложение
+    # ячеек диапазона. Суммы ячеек ведутся в копейках (money_parts): и
+    # разность префиксных сумм, и сложение float копили бы погрешность,
+    # заметную в денежном отчёте.
+    def __init__(self, key_function, group_function, value_function) -> None:
+        self.key_function = key_function
+        self.group_function = group_function
+        self.value_function = value_function
+        # Ключ -> группа -> [копейки, остаток, число записей]. Записи без
+        # ключа лежат под None и в sorted_keys не входят.
+        self.cells = {}
+        self.sorted_keys = []
+        self.entries = {}
+
+    def build(self, data) -> "RangeSumIndex":
+        # Сборка с нуля: ключи сортируются один раз в конце.
+        cells = self.cells
+        for id, value in data.items():
+            key = self.key_function(value)
+            group = self.group_function(value)
+            cents, rest = money_parts(self.value_function(value))
+            self.entries[id] = (key, group, cents, rest)
+            groups = cells.get(key)
+            if groups is None:
+                groups = cells[key] = {}
+            cell = groups.get(group)
+            if cell is None:
+                cell = groups[group] = [0, 0.0, 0]
+            cell[0] += cents
+            cell[1] += rest
+            cell[2] += 1
+        self.sorted_keys = sorted(key for key in cells if key is not None)
+        return self
+
+    def put(self, id: str, value: dict) -> None:
+        self.remove(id)
+        key = self.key_function(value)
+        group = self.group_function(value)
+        cents, rest = money_parts(self.value_function(value))
+        self.entries[id] = (key, group, cents, rest)
+        if key not in self.cells:
+            self.cells[key] = {}
+            if key is not None:
+                insort(self.sorted_keys, key)
+        cell = self.cells[key].setdefault(group, [0, 0.0, 0])
+        cell[0] += cents
+        cell[1] += rest
+        cell[2] += 1
+
+    def remove(self, id: str) -> None:
+        if id not in self.entries:
+            return
+        key, group, cents, rest = self.entries.pop(id)
+        groups = self.cells[key]
+        cell = groups[group]
+        cell[0] -= cents
+        cell[1] -= rest
+        cell[2] -= 1
+        if not cell[2]:
+            del groups[group]
+            if not groups:
+                del self.cells[key]
+                if key is not None:
+                    del self.sorted_keys[bisect_left(self.sorted_keys, key)]
+
+    def sum(self, low=None, high=None) -> dict:
+        # Без границ — итоги по всем записям, включая те, у которых ключа
+        # нет (например, дата не разбирается): так отчёт совпадает с
+        # прежним полным проходом.
+        if low is None and high is None:
+            keys = list(self.cells)
+        else:
+            start = 0 if low is None else bisect_left(self.sorted_keys, low)
+            end = (
+                len(self.sorted_keys)
+                if high is None
+                else bisect_right(self.sorted_keys, high)
+            )
+            keys = self.sorted_keys[start:end]
+        totals = {}
+        for key in keys:
+            for group, (cents, rest, count) in self.cells[key].items():
+                total = totals.get(group)
+                if total is None:
+                    total = totals[group] = [0, 0.0]
+                total[0] += cents
+                total[1] += rest
+        return {group: money_total(*total) for group, total in totals.items()}
+
+
+class Summary:
+    # Материализованные итоги по группам: для каждой группы — число
+    # записей и суммы values. В отличие от индексов id записей не
+    # хранятся: изменение применяется по старому и новому значению
+    # записи за O(1), а сами итоги малы, их можно сохранить рядом с
+    # хранилищем и после перезапуска загрузить без прохода по данным.
+    # Суммы ведутся, как и в RangeSumIndex, в копейках и остатке
+    # (money_parts): строка группы — [число, копейки1, остаток1, ...].
+    def __init__(self, group_function, values: dict) -> None:
+        self.group_function = group_function
+        self.names = tuple(values)
+        self.functions = tuple(values.values())
+        self.groups = {}
+
+    def add(self, value: dict, sign: int = 1) -> None:
+        group = self.group_function(value)
+        row = self.groups.get(group)
+        if row is None:
+            row = self.groups[group] = [0] + [0, 0.0] * len(self.functions)
+        row[0] += sign
+        for position, function in enumerate(self.functions):
+            cents, rest = money_parts(function(value))
+            row[2 * position + 1] += sign * cents
+            if rest:
+                row[2 * position + 2] += sign * rest
+        if not row[0]:
+            # Последняя запись группы ушла — заодно уходит и накопленная
+            # погрешность дробных остатков.
+            del self.groups[group]
+
+    def change(self, old: dict = None, new: dict = None) -> None:
+        if old is not None:
+            self.add(old, -1)
+        if new is not None:
+            self.add(new, 1)
+
+    def result(self) -> dict:
+        return {
+            group: dict(
+                count=row[0],
+                **{
+                    name: money_total(row[2 * position + 1], row[2 * position + 2])
+                    for position, name in enumerate(self.names)
+                },
+            )
+            for group, row in self.groups.items()
+        }
+
+    def dump(self) -> dict:
+        return dict(
+            values=list(self.names),
+            money=True,
+            rows=[[group, *row] for group, row in self.groups.items()],
+        )
+
+    def load(self, dumped: dict) -> bool:
+        # False — итоги сохранены с другим набором сумм или прежним
+        # форматом строк (суммы float без копеек).
+        if dumped["values"] != list(self.names) or not dumped.get("money"):
+            return False
+        width = 2 * len(self.names) + 1
+        if any(len(row) != width + 1 for row in dumped["rows"]):
+            return False
+        self.groups = {row[0]: list(row[1:]) for row in dumped["rows"]}
+        return True
+
+
+class Summaries(dict):
+    # Набор именованных итогов одного хранилища.
+    def build(self, data) -> "Summaries":
+        for value in data.values():
+            self.change(None, value)
+        return self
+
+    def change(self, old: dict = None, new: dict = None) -> None:
+        for summary in self.values():
+            summary.change(old, new)
+
+    def dump(self) -> dict:
+        return {name: summary.dump() for name, summary in self.items()}
+
+    def load(self, dumped: dict) -> bool:
+        # False — сохранённые итоги не той схемы: тогда их пересчитывают.
+        try:
+            if set(dumped) != set(self):
+                return False
+            return all(summary.load(dumped[name]) for name, summary in self.items())
+        except (KeyError, TypeError, IndexError):
+            return False
+
+
+def summary_mismatches(stored: dict, fresh: dict, tolerance: float = 1e-6) -> list:
+    # Группы, в которых сохранённые итоги разошлись с пересчитанными.
+    # Суммы сравниваются с допуском: при пошаговом обновлении дробные
+    # суммы копят погрешность округления.
+    mismatches = []
+    for group in {**stored, **fresh}:
+        old = stored.get(group)
+        new = fresh.get(group)
+        if old is None or new is None or old.keys() != new.keys():
+            mismatches.append(group)
+        elif any(
+            abs(old[name] - new[name]) > tolerance * max(1, abs(new[name]))
+            for name in new
+        ):
+            mismatches.append(group)
+    return mismatches
+
+
+WORD = re.compile(r"\w+")
+
+
+def tokenize(text) -> list[str]:
+    if text is None:
+        return []
+    return WORD.findall(str(text).lower())
+
+
+class TextIndex:
+    # Инвертированный индекс слово -> {id: вес} по нескольким полям.
+    # Префиксы ищутся bisect-ом по отсортированному словарю, подстроки —
+    # через триграммы самих слов словаря (а не документов), поэтому
+    # память растёт со словарём, а не с объёмом текста. Подстроки из двух
+    # символов ищутся по таблице биграмм; один символ ищется только как
+    # префикс — в подстроке под него подошла бы заметная доля словаря.
+    EXACT, PREFIX, SUBSTRING = 3, 2, 1
+
+    def __init__(self, fields: dict) -> None:
+        self.fields = fields
+        self.postings = {}
+        self.words = {}
+        self.vocabulary = []
+        self.grams = {}
+        self.pairs = {}
+
+    @staticmethod
+    def trigrams(word: str) -> set:
+        return {word[i : i + 3] for i in range(len(word) - 2)}
+
+    @staticmethod
+    def bigrams(word: str) -> set:
+        return {word[i : i + 2] for i in range(len(word) - 1)}
+
+    def build(self, data) -> "TextIndex":
+        # Сборка с нуля: словарь сортируется один раз в конце, а не
+        # insort на каждое новое слово.
+        for id, value in data.items():
+            self.add(id, value)
+        self.vocabulary = sorted(self.postings)
+        return self
+
+    def put(self, id: str, value: dict) -> None:
+        self.remove(id)
+        for word in self.add(id, value):
+            insort(self.vocabulary, word)
+
+    def add(self, id: str, value: dict) -> list:
+        # Слова записи в постинги; возвращает слова, новые для словаря.
+        weights = {}
+        for field, weight in self.fields.items():
+            for word in tokenize(value.get(field)):
+                weights[word] = weights.get(word, 0) + weight
+        new = []
+        for word, weight in weights.items():
+            posting = self.postings.get(word)
+            if posting is None:
+                posting = self.postings[word] = {}
+                self.add_grams(word)
+                new.append(word)
+            posting[id] = weight
+        self.words[id] = list(weights)
+        return new
+
+    def add_grams(self, word: str) -> None:
+        for table, grams in (
+            (self.grams, self.trigrams(word)),
+            (self.pairs, self.bigrams(word)),
+        ):
+            for gram in grams:
+                words = table.get(gram)
+                if words is None:
+                    words = table[gram] = set()
+                words.add(word)
+
+    def remove_grams(self, word: str) -> None:
+        for gram in self.trigrams(word):
+            self.grams[gram].discard(word)
+            if not self.grams[gram]:
+                del self.grams[gram]
+        for pair in self.bigrams(word):
+            self.pairs[pair].discard(word)
+            if not self.pairs[pair]:
+                del self.pairs[pair]
+
+    def remove(self, id: str) -> None:
+        for word in self.words.pop(id, ()):
+            posting = self.postings[word]
+            del posting[id]
+            if posting:
+                continue
+            del self.postings[word]
+            del self.vocabulary[bisect_left(self.vocabulary, word)]
+            self.remove_grams(word)
+
+    def match(self, token: str, prefix: bool) -> dict:
+        # Слова словаря, подходящие под token, с качеством совпадения.
+        matches = {}
+        vocabulary = self.vocabulary
+        for position in range(bisect_left(vocabulary, token), len(vocabulary)):
+            word = vocabulary[position]
+            if not word.startswith(token):
+                break
+            matches[word] = self.EXACT if word == token else self.PREFIX
+        if prefix or len(token) < 2:
+            return matches
+        if len(token) >= 3:
+            grams = [self.grams.get(gram, set()) for gram in self.trigrams(token)]
+            candidates = set.intersection(*sorted(grams, key=len))
+        else:
+            candidates = self.pairs.get(token, ())
+        for word in candidates:
+            if word not in matches and token in word:
+                matches[word] = self.SUBSTRING
+        return matches
+
+    def search(self, query: str, limit: int = None, prefix: bool = False) -> list:
+        # Каждое слово запроса должно найтись в записи (И); счёт записи —
+        # сумма лучших совпадений по словам с учётом весов полей.
+        scores = None
+        for token in tokenize(query):
+            token_scores = {}
+            for word, quality in self.match(token, prefix).items():
+                for id, weight in self.postings[word].items():
+                    score = quality * weight
+                    if score > token_scores.get(id, 0):
+                        token_scores[id] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    id: score + token_scores[id]
+                    for id, score in scores.items()
+                    if id in token_scores
+                }
+            if not scores:
+                return []
+        if scores is None:
+            # Пустой запрос, как и раньше подстрока "", подходит ко всему.
+            return list(self.words)[:limit]
+        if limit is not None:
+            return heapq.nlargest(limit, scores, key=scores.get)
+        return sorted(scores, key=scores.get, reverse=True)
@@ -0,0 +1,239 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+# Верхние границы корзин гистограммы задержек, секунды.
+BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+PROFILE_MODES = ("cprofile", "tracemalloc")
+
+
+class OperationStats:
+    __slots__ = ("count", "errors", "seconds", "buckets", "bytes_read", "bytes_written")
+
+    def __init__(self, size: int) -> None:
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        # Последняя корзина — +Inf.
+        self.buckets = [0] * (size + 1)
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+
+class Metrics:
+    # Счётчики, гистограммы задержек и объём ввода-вывода по операциям
+    # менеджеров ("TaskManager.filter_tasks"). По умолчанию выключены:
+    # тогда обёртка операции стоит одну проверку флага. Байты относятся
+    # ко всем операциям, открытым в этом потоке, — как и время, они
+    # включают вложенные вызовы (import_from_csv считает и save_to_file).
+    def __init__(self, buckets: tuple = BUCKETS) -> None:
+        self.enabled = False
+        self.bucket_bounds = tuple(buckets)
+        self.operations = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.armed = {}
+        self.profiles = {}
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self.lock:
+            self.operations = {}
+            self.profiles = {}
+
+    def stats(self, operation: str) -> OperationStats:
+        stats = self.operations.get(operation)
+        if stats is None:
+            with self.lock:
+                stats = self.operations.setdefault(
+                    operation, OperationStats(len(self.bucket_bounds))
+                )
+        return stats
+
+    def call(self, operation: str, function, args: tuple, kwargs: dict):
+        mode = self.take_profile(operation) if self.armed else None
+        with self.measure(operation):
+            if mode is None:
+                return function(*args, **kwargs)
+            return self.run_profiled(operation, mode, function, args, kwargs)
+
+    @contextmanager
+    def measure(self, operation: str):
+        stats = self.stats(operation)
+        active = getattr(self.local, "active", None)
+        if active is None:
+            active = self.local.active = []
+        active.append(stats)
+        failed = False
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            active.pop()
+            with self.lock:
+                stats.count += 1
+                stats.errors += failed
+                stats.seconds += elapsed
+                stats.buckets[bisect_left(self.bucket_bounds, elapsed)] += 1
+
+    def count_bytes(self, read: int = 0, written: int = 0) -> None:
+        if not self.enabled:
+            return
+        active = getattr(self.local, "active", None)
+        if not active:
+            return
+        with self.lock:
+            for stats in active:
+                stats.bytes_read += read
+                stats.bytes_written += written
+
+    # Профилирование отдельных вызовов: profile() помечает следующие
+    # calls вызовов операции, они проходят под cProfile (в profiles
+    # попадает pstats.Stats) или tracemalloc (пик памяти и снимок
+    # аллокаций). Метрики при этом включаются — без них обёртки операций
+    # вызовы не перехватывают.
+    def profile(self, operation: str, mode: str = "cprofile", calls: int = 1) -> None:
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Неизвестный режим профилирования: {mode}")
+        with self.lock:
+            self.armed[operation] = [mode, calls]
+        self.enable()
+
+    def take_profile(self, operation: str):
+        with self.lock:
+            armed = self.armed.get(operation)
+            if armed is None:
+                return None
+            armed[1] -= 1
+            if not armed[1]:
+                del self.armed[operation]
+            return armed[0]
+
+    def run_profiled(self, operation: str, mode: str, function, args: tuple, kwargs: dict):
+        # Профилировщики нужны редко — импортируются только здесь.
+        if mode == "cprofile":
+            import cProfile
+            import pstats
+
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(function, *args, **kwargs)
+            finally:
+                self.add_profile(operation, pstats.Stats(profiler))
+
+        import tracemalloc
+
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        try:
+            return function(*args, **kwargs)
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            self.add_profile(
+                operation,
+                dict(
+                    peak_bytes=peak - base,
+                    retained_bytes=current - base,
+                    snapshot=tracemalloc.take_snapshot(),
+                ),
+            )
+            if started:
+                tracemalloc.stop()
+
+    def add_profile(self, operation: str, result) -> None:
+        with self.lock:
+            self.profiles.setdefault(operation, []).append(result)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            snapshot = {}
+            for operation, stats in sorted(self.operations.items()):
+                cumulative = 0
+                buckets = {}
+                for bound, count in zip((*self.bucket_bounds, "+Inf"), stats.buckets):
+                    cumulative += count
+                    buckets[str(bound)] = cumulative
+                snapshot[operation] = dict(
+                    count=stats.count,
+                    errors=stats.errors,
+                    seconds=stats.seconds,
+                    buckets=buckets,
+                    bytes_read=stats.bytes_read,
+                    bytes_written=stats.bytes_written,
+                )
+        return snapshot
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False)
+
+    def to_prometheus(self, prefix: str = "personal_assistant") -> str:
+        # Текстовый формат экспозиции Prometheus 0.0.4.
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_operation_seconds Длительность операций менеджеров.",
+            f"# TYPE {prefix}_operation_seconds histogram",
+        ]
+        for operation, stats in snapshot.items():
+            label = f'operation="{operation}"'
+            for bound, count in stats["buckets"].items():
+                lines.append(
+                    f'{prefix}_operation_seconds_bucket{{{label},le="{bound}"}} {count}'
+                )
+            lines.append(f"{prefix}_operation_seconds_sum{{{label}}} {stats['seconds']}")
+            lines.append(f"{prefix}_operation_seconds_count{{{label}}} {stats['count']}")
+        for name, key, description in (
+            ("errors", "errors", "Операции, завершившиеся исключением."),
+            ("read_bytes", "bytes_read", "Прочитано байт из файлов хранилища и CSV."),
+            ("written_bytes", "bytes_written", "Записано байт в файлы хранилища и CSV."),
+        ):
+            lines.append(f"# HELP {prefix}_operation_{name}_total {description}")
+            lines.append(f"# TYPE {prefix}_operation_{name}_total counter")
+            for operation, stats in snapshot.items():
+                lines.append(
+                    f'{prefix}_operation_{name}_total{{operation="{operation}"}} {stats[key]}'
+                )
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+def measured(manager, name: str):
+    # То же для участка кода, который не метод (например, пакет целиком).
+    if not METRICS.enabled:
+        return nullcontext()
+    return METRICS.measure(f"{type(manager).__name__}.{name}")
+
+
+def timed(method):
+    # Обёртка метода менеджера: при выключенных метриках — одна проверка
+    # флага, при включённых — замер под именем "Класс.метод".
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not METRICS.enabled:
+            return method(self, *args, **kwargs)
+        return METRICS.call(
+            f"{type(self).__name__}.{name}", method, (self, *args), kwargs
+        )
+
+    return wrapper
@@ -1,13 +1,214 @@
+import csv
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 import json
 import logging
-import pandas as pd
 import operator
+from functools import lru_cache, wraps
+from itertools import repeat
+import sys
+from contextlib import ExitStack, contextmanager
+
+from bulk_import import CHUNK_SIZE, ERRORS_LOGGED, parse_file
+from cache import CACHE_SIZE, EntityCache
+from indexes import (
+    FieldIndex,
+    Indexes,
+    RangeSumIndex,
+    SortedIndex,
+    Summaries,
+    Summary,
+    TextIndex,
+    intersect,
+    money_sum,
+    summary_mismatches,
+)
+from metrics import METRICS, measured, timed
+from serializers import SERIALIZERS, FormatError
+from storage import (
+    DURABILITY_MODES,
+    JsonStorage,
+    SqliteTable,
+    open_storage,
+    open_workspace,
+)
+
+
+@lru_cache(maxsize=65536)
+def date_key(date: str):
+    # "ДД-ММ-ГГГГ" -> ГГГГММДД: такие числа сравниваются в порядке дат.
+    # Кэш нужен потому, что у тысяч записей обычно одна и та же дата, а
+    # strptime на каждую из них — основная цена построения индексов.
+    try:
+        return int(datetime.strptime(date, "%d-%m-%Y").strftime("%Y%m%d"))
+    except (TypeError, ValueError):
+        return None
+
+
+def month_key(date: str):
+    # "ДД-ММ-ГГГГ" -> ГГГГММ.
+    key = date_key(date)
+    return None if key is None else key // 100
+
+
+@lru_cache(maxsize=65536)
+def date_ordinal(date: str):
+    try:
+        return datetime.strptime(date, "%d-%m-%Y").toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+def ordinal_bounds(start_date: str = None, end_date: str = None) -> tuple:
+    # Границы периода как date.toordinal() — в таком виде их ждёт
+    # колоночная аналитика.
+    return tuple(
+        date_ordinal(date) if date_bound(date) is not None else None
+        for date in (start_date, end_date)
+    )
+
+
+def date_bound(date: str):
+    # Граница периода в запросе: пустая — без ограничения, а неверную
+    # дату не пропускаем молча, как раньше не пропускал strptime.
+    if not date:
+        return None
+    key = date_key(date)
+    if key is None:
+        raise ValueError(f"Некорректная дата: {date}")
+    return key
+
+
+def parse_bool(value: str) -> bool:
+    if value.strip().lower() in ("true", "1", "да"):
+        return True
+    if value.strip().lower() in ("false", "0", "нет", ""):
+        return False
+    raise ValueError(f"ожидалось True/False, получено {value!r}")
+
+
+def parse_date(value: str) -> str:
+    if date_key(value) is None:
+        raise ValueError(f"некорректная дата {value!r}")
+    return value
+
+
+def refreshed(method):
+    # Перед операцией менеджер сверяется с файлом: если его изменил
+    # другой процесс (shared=True), данные перечитываются. Сама операция
+    # идёт под блокировкой чтения (thread_safe=True).
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.refresh()
+        with self.storage.reading():
+            return method(self, *args, **kwargs)
+
+    return timed(wrapper)
+
+
+def mutating(method):
+    # Изменение целиком под блокировкой хранилища: фоновая запись не
+    # снимет копию данных посреди него, а в режиме shared проверка
+    # записи и сама запись идут под одной блокировкой файла. В режиме
+    # thread_safe на диск изменение пишется уже после блокировки.
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.storage.locked():
+            self.refresh()
+            result = method(self, *args, **kwargs)
+        self.storage.write_through()
+        return result
+
+    return timed(wrapper)
+
+
+def memoized(method):
+    # Результат запоминается до следующего изменения данных: ключ — имя
+    # метода и аргументы, а при смене self.version запомненное
+    # сбрасывается целиком. Словари и списки отдаются копиями (вместе с
+    # вложенными), чтобы вызывающий не испортил запомненное. Ставится под
+    # @refreshed.
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.memo_version != self.version:
+            self.memo = {}
+            self.memo_version = self.version
+        key = (name, args, tuple(sorted(kwargs.items())))
+        if key in self.memo:
+            result = self.memo[key]
+        else:
+            result = method(self, *args, **kwargs)
+            if len(self.memo) < self.memo_size:
+                self.memo[key] = result
+        return copied(result)
+
+    return wrapper
+
+
+def copied(value):
+    # Копия словарей и списков на всю глубину (итоги по месяцам — словари
+    # словарей); числа и строки неизменяемы и не копируются.
+    if isinstance(value, dict):
+        return {
+            key: copied(item) if isinstance(item, (dict, list)) else item
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [
+            copied(item) if isinstance(item, (dict, list)) else item
+            for item in value
+        ]
+    return value
+
+
+def write_csv(filename: str, fields: tuple, values) -> int:
+    # Построчная запись: values может быть генератором, в памяти
+    # одновременно находится одна запись. Поля вне схемы не выгружаются.
+    count = 0
+    with open(filename, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        for value in values:
+            writer.writerow(value)
+            count += 1
+        METRICS.count_bytes(written=file.tell())
+    return count
+
+
+def read_csv(filename: str, converters: dict):
+    # Построчное чтение с приведением типов. Строки с ошибками
+    # пропускаются с сообщением в лог, а не обрывают весь импорт.
+    with open(filename, newline="", encoding="utf-8") as file:
+        METRICS.count_bytes(read=os.fstat(file.fileno()).st_size)
+        # Номер первой строки записи в файле, а не номер записи: поле в
+        # кавычках может занимать несколько строк. fieldnames читает
+        # заголовок, чтобы отсчёт шёл после него.
+        reader = csv.DictReader(file)
+        reader.fieldnames
+        consumed = reader.line_num
+        for row in reader:
+            line_number = consumed + 1
+            consumed = reader.line_num
+            row.pop(None, None)
+            try:
+                for field, converter in converters.items():
+                    row[field] = converter(row.get(field) or "")
+            except ValueError as error:
+                logging.error(
+                    f"Строка {line_number} файла {filename} пропущена: {error}"
+                )
+                continue
+            if not row.get("id"):
+                row["id"] = str(uuid.uuid4())
+            yield row
 
 
 class Note:
+    __slots__ = ("id", "title", "content", "timestamp")
+
     def __init__(self, title, content, timestamp=None, id=None):
         if id is None:
             id = str(uuid.uuid4())
@@ -24,6 +225,16 @@ class Note:
         if not new_content is None:
             self.content = new_content
 
+    def copy(self):
+        # Копия без __init__ — так кэш сущностей менеджера отдаёт
+        # каждому читателю свой объект.
+        clone = Note.__new__(Note)
+        clone.id = self.id
+        clone.title = self.title
+        clone.content = self.content
+        clone.timestamp = self.timestamp
+        return clone
+
     def to_json(self):
         return dict(
             id=self.id, title=self.title, content=self.content, timestamp=self.timestamp
@@ -38,6 +249,8 @@ class Note:
 
 
 class Task:
+    __slots__ = ("id", "title", "description", "priority", "due_date", "done")
+
     def __init__(self, title, description, priority, due_date, id=None, done=None):
         if id is None:
             id = str(uuid.uuid4())
@@ -48,6 +261,7 @@ class Task:
         self.description = description
         self.priority = priority
         self.due_date = due_date
+        self.done = done
 
     def edit_note(
         self, new_title=None, new_description=None, new_priority=None, new_due_date=None
@@ -64,6 +278,16 @@ class Task:
     def toggle_done(self):
         self.done = not self.done
 
+    def copy(self):
+        clone = Task.__new__(Task)
+        clone.id = self.id
+        clone.title = self.title
+        clone.description = self.description
+        clone.priority = self.priority
+        clone.due_date = self.due_date
+        clone.done = self.done
+        return clone
+
     def to_json(self):
         return dict(
             id=self.id,
@@ -71,6 +295,7 @@ class Task:
             description=self.description,
             priority=self.priority,
             due_date=self.due_date,
+            done=self.done,
         )
 
     def __str__(self) -> str:
@@ -82,6 +307,8 @@ class Task:
 
 
 class Contact:
+    __slots__ = ("id", "name", "phone", "email")
+
     def __init__(self, name, phone, email, id=None):
         if id is None:
             id = str(uuid.uuid4())
@@ -98,6 +325,14 @@ class Contact:
         if new_email is not None:
             self.email = new_email
 
+    def copy(self):
+        clone = Contact.__new__(Contact)
+        clone.id = self.id
+        clone.name = self.name
+        clone.phone = self.phone
+        clone.email = self.email
+        return clone
+
     def to_json(self):
         return dict(id=self.id, name=self.name, phone=self.phone, email=self.email)
 
@@ -110,6 +345,8 @@ class Contact:
 
 
 class FinanceRecord:
+    __slots__ = ("id", "amount", "category", "date", "description")
+
     def __init__(self, amount, category, date, description, id=None):
         if id is None:
             id = str(uuid.uuid4())
@@ -131,6 +368,15 @@ class FinanceRecord:
         if new_description is not None:
             self.description = new_description
 
+    def copy(self):
+        clone = FinanceRecord.__new__(FinanceRecord)
+        clone.id = self.id
+        clone.amount = self.amount
+        clone.category = self.category
+        clone.date = self.date
+        clone.description = self.description
+        return clone
+
     def to_json(self):
         return dict(
             id=self.id,
@@ -148,352 +394,912 @@ class FinanceRecord:
         return FinanceRecord(**record_json)
 
 
-class NoteManager:
-    def __init__(self, filename: str) -> None:
-        self.filename = filename
-        self.init_notes()
-
-    def init_notes(self) -> None:
-        if not os.path.isfile(self.filename):
-            logging.warning(f"Файл {self.filename} не найден")
-            with open(self.filename, "w") as file:
-                file.write("{}")
-                logging.info(f"Файл {self.filename} создан")
-            self.notes = {}
-
-        with open(self.filename, "r+") as file:
-            try:
-                notes = json.loads(file.read())
-                logging.info(f"Файл {self.filename} найден и является валидным JSON")
-                self.notes = notes
-            except:
-                logging.warning(f"Файл {self.filename} найден, но поврежден")
-                file.seek(0)
-                file.truncate(0)
-                file.write("{}")
-                logging.info(f"Файл {self.filename} перезаписан")
-                self.notes = {}
-
+def data_alias():
+    # Прежнее имя данных менеджера (notes, tasks, ...) как синоним data.
+    return property(
+        lambda self: self.data, lambda self, value: setattr(self, "data", value)
+    )
+
+
+class EntityStore:
+    # Общий движок менеджеров: хранилище, производные структуры (индексы,
+    # колонки), пакеты, CRUD, поиск и CSV для одного класса сущностей.
+    # Менеджер задаёт схему атрибутами класса, а методам даёт привычные
+    # имена (add_task = EntityStore.add).
+    entity = None
+    table = None
+    sqlite_columns = {}
+    interned_fields = ()
+    date_fields = ()
+    csv_converters = {}
+    # Поля полнотекстового поиска с весами; пусто — поиска нет.
+    text_fields = {}
+    # Производные от данных структуры: строятся лениво, обновляются в
+    # _commit и сбрасываются, когда данные заменяются целиком.
+    derived = ("indexes", "cache")
+    messages = {}
+    # Предел карты идентичности (EntityCache): 0 — объекты собираются
+    # заново при каждом чтении. Без предела кэш рос бы до размера всего
+    # хранилища и держал бы в памяти вторую его копию.
+    cache_size = CACHE_SIZE
+    # Сколько разных вызовов держит @memoized до следующего изменения.
+    memo_size = 256
+    # Итоги по группам для SQLite: имя -> (выражение группы, {сумма:
+    # выражение}), см. SqliteStorage; для остальных хранилищ те же итоги
+    # задаёт summary_definitions().
+    sqlite_summaries = {}
+
+    def __init__(
+        self,
+        filename: str = None,
+        journal: bool = False,
+        backend: str = None,
+        storage=None,
+        cache_size: int = None,
+        **options,
+    ) -> None:
+        # storage — уже открытое хранилище (раздел рабочего пространства
+        # Workspace); тогда файл и параметры хранилища не нужны.
+        if cache_size is not None:
+            self.cache_size = cache_size
+        # version растёт с каждым изменением данных; по нему @memoized
+        # узнаёт, что запомненные результаты устарели.
+        self.version = 0
+        self.memo = {}
+        self.memo_version = 0
+        if storage is None:
+            storage = open_storage(
+                filename,
+                self.table,
+                self.sqlite_columns,
+                journal=journal,
+                backend=backend,
+                fields=self.entity.__slots__,
+                interned=self.interned_fields,
+                dates=self.date_fields,
+                summaries=self.sqlite_summaries,
+                **options,
+            )
+        self.filename = storage.filename
+        self.storage = storage
+        self.init_store()
+
+    def reset_derived(self) -> None:
+        for name in self.derived:
+            setattr(self, name, None)
+        self.summaries = None
+        self.version += 1
+
+    @timed
+    def init_store(self) -> None:
+        self.data = self.storage.load()
+        self.reset_derived()
+
+    def refresh(self) -> None:
+        data = self.storage.refresh(self.data)
+        if data is not None:
+            self.data = data
+            self.reset_derived()
+
+    @timed
     def save_to_file(self) -> None:
-        with open(self.filename, "w") as file:
-            file.write(json.dumps(self.notes))
-
-    def create_note(self, note: Note) -> None:
-        self.notes[note.id] = note.to_json()
-        self.save_to_file()
-        logging.info(f"Заметка с ID {note.id} добавлена в базу данных")
-
-    def get_all_notes(self) -> list[Note]:
-        notes = [Note.from_json(item) for item in self.notes.values()]
-        logging.info(f"Запрос на получение всех заметок")
-        return notes
-
-    def get_note_by_id(self, id: str) -> Note:
-        if id not in self.notes:
-            logging.error(f"Заметки с ID {id} нет")
-            return
-        note = Note.from_json(self.notes[id])
-        logging.info(f"Запрос на получение заметки с ID {id}")
-        return note
-
-    def edit_note(self, note: Note) -> None:
-        if note.id not in self.notes:
-            logging.error(f"Заметки с ID {id} нет")
-            return
-        self.notes[note.id] = note.to_json()
-        self.save_to_file()
-        logging.info(f"Запрос на изменение заметки с ID {note.id}")
-
-    def delete_note(self, id: str) -> None:
-        if id not in self.notes:
-            logging.error(f"Заметки с ID {id} нет")
-            return
-        del self.notes[id]
-        self.save_to_file()
-        logging.info(f"Заметка с ID {id} удалена")
-
-    def export_to_csv(self, filename: str) -> None:
-        df = pd.DataFrame.from_dict(self.notes)
-
-        df = df.transpose().reset_index(drop=True)
-        df.to_csv(filename, index=False)
-
-    def import_from_csv(self, filename: str) -> None:
-        df = pd.read_csv(filename)
-        df.index = df["id"]
-        data = df.to_dict("index")
-        self.notes = data
-        self.save_to_file()
-
-
-class TaskManager:
-    def __init__(self, filename: str) -> None:
-        self.filename = filename
-        self.init_tasks()
-
-    def init_tasks(self) -> None:
-        if not os.path.isfile(self.filename):
-            logging.warning(f"Файл {self.filename} не найден")
-            with open(self.filename, "w") as file:
-                file.write("{}")
-                logging.info(f"Файл {self.filename} создан")
-            self.tasks = {}
+        self.storage.save(self.data)
+        self.save_summaries()
+
+    @timed
+    def flush(self) -> None:
+        self.storage.flush()
+        self.save_summaries()
+
+    def _commit(self, op: str, key: str, value: dict = None, old: dict = None) -> None:
+        # old — прежнее значение записи (см. previous), по нему итоги
+        # вычитают её вклад.
+        self.version += 1
+        if self.summaries is not None:
+            self.summaries.change(old, value if op == "put" else None)
+        for name in self.derived:
+            structure = getattr(self, name)
+            if structure is None:
+                continue
+            if op == "put":
+                structure.put(key, value)
+            else:
+                structure.remove(key)
+        snapshots = self.storage.snapshots
+        data = self.storage.commit(self.data, [(op, key, value)])
+        if data is not None:
+            self.data = data
+            self.reset_derived()
+        self.snapshot_summaries(snapshots)
+
+    def snapshot_summaries(self, snapshots: int) -> None:
+        # Итоги пишутся вместе со снимком (без журнала — на каждое
+        # изменение, с журналом — при свёртке) и при flush. Дописанная в
+        # журнал строка делает файл итогов устаревшим, но переписывать его
+        # ради каждой записи дороже самой записи.
+        if self.storage.snapshots != snapshots:
+            self.save_summaries()
+
+    def previous(self, key: str):
+        # Прежнее значение записи нужно только итогам — без них лишний
+        # раз запись не читаем (ленивой таблице и SQLite это чтение).
+        # Сохранённые итоги подхватываются и здесь, чтобы изменение их
+        # обновило, а не сделало устаревшими; пересчёта ради записи нет.
+        if self.summaries is None:
+            self.summaries = self.stored_summaries()
+            if self.summaries is None:
+                return None
+        return self.data.get(key)
+
+    def summary_definitions(self) -> dict:
+        # Итоги менеджера по имени (indexes.Summary).
+        return {}
+
+    def stored_summaries(self):
+        # Итоги из файла рядом с хранилищем или None, если их там нет или
+        # они не соответствуют данным.
+        definitions = self.summary_definitions()
+        if not definitions:
+            return None
+        summaries = Summaries(**definitions)
+        dumped = self.storage.load_summaries()
+        if dumped is None or not summaries.load(dumped):
+            return None
+        return summaries
+
+    def get_summaries(self) -> Summaries:
+        # Сохранённые итоги, а если они не годятся — проход по записям;
+        # дальше _commit обновляет их по одной записи.
+        if self.summaries is None:
+            self.summaries = self.stored_summaries()
+            if self.summaries is None:
+                definitions = self.summary_definitions()
+                self.summaries = Summaries(**definitions).build(self.data)
+                self.save_summaries()
+        return self.summaries
+
+    def save_summaries(self) -> None:
+        # Под блокировкой чтения: в режиме thread_safe изменение из
+        # другого потока не попадёт между снятием итогов и подписью файла.
+        with self.storage.reading():
+            if self.summaries is not None:
+                self.storage.save_summaries(self.summaries.dump())
+
+    def summary(self, name: str) -> dict:
+        # {группа: {"count": ..., сумма: ...}} без прохода по записям.
+        if isinstance(self.data, SqliteTable):
+            return self.storage.summary(name)
+        return self.get_summaries()[name].result()
+
+    @mutating
+    def verify_summaries(self, rebuild: bool = False) -> dict:
+        # Сверка итогов с полным пересчётом: {имя: расходящиеся группы}.
+        # rebuild=True заменяет итоги пересчитанными.
+        sqlite = isinstance(self.data, SqliteTable)
+        if sqlite:
+            computed = {
+                name: self.storage.compute_summary(name)
+                for name in self.sqlite_summaries
+            }
+        else:
+            fresh = Summaries(**self.summary_definitions()).build(self.data)
+            computed = {name: summary.result() for name, summary in fresh.items()}
+        mismatches = {}
+        for name, result in computed.items():
+            groups = summary_mismatches(self.summary(name), result)
+            if groups:
+                mismatches[name] = groups
+                logging.warning("Итоги %s расходятся с данными: %s", name, groups)
+        if not (rebuild and mismatches):
+            return mismatches
+        if sqlite:
+            mark = self.storage.begin(self.data)
+            try:
+                for name in mismatches:
+                    self.storage.rebuild_summary(name)
+            except BaseException:
+                self.storage.rollback(mark)
+                raise
+            self.storage.end(self.data)
         else:
-            with open(self.filename, "r+") as file:
+            self.summaries = fresh
+            self.save_summaries()
+        self.version += 1
+        logging.info("Итоги пересчитаны")
+        return mismatches
+
+    def index_definitions(self) -> dict:
+        # Индексы менеджера по имени; текстовый добавляется по text_fields.
+        return {}
+
+    def get_indexes(self) -> Indexes:
+        # Каждый индекс строится при первом запросе к нему, а дальше
+        # обновляется в _commit — так ленивое открытие хранилища остаётся
+        # дешёвым, а отчёту не нужно строить индексы фильтров.
+        if self.indexes is None:
+            definitions = self.index_definitions()
+            if self.text_fields:
+                definitions["text"] = TextIndex(self.text_fields)
+            self.indexes = Indexes(self.data, **definitions)
+        return self.indexes
+
+    def get_cache(self) -> EntityCache:
+        if self.cache is None:
+            self.cache = EntityCache(self.entity.from_json, self.cache_size)
+        return self.cache
+
+    def entities(self, ids) -> list:
+        # Объекты сущностей по id через кэш: каждый вызов получает свои
+        # копии, так что изменённый объект не виден другим до edit().
+        return self.get_cache().lookup(ids, self.data)
+
+    @contextmanager
+    def batch(self):
+        # Пакет целиком идёт под блокировкой хранилища (в режиме shared —
+        # и файла), фоновая запись не застанет его на середине.
+        with measured(self, "batch"):
+            with self.storage.locked():
+                self.refresh()
+                mark = self.storage.begin(self.data)
                 try:
-                    tasks = json.loads(file.read())
-                    logging.info(
-                        f"Файл {self.filename} найден и является валидным JSON"
-                    )
-                    self.tasks = tasks
-                except:
-                    logging.warning(f"Файл {self.filename} поврежден")
-                    file.seek(0)
-                    file.truncate(0)
-                    file.write("{}")
-                    logging.info(f"Файл {self.filename} перезаписан")
-                    self.tasks = {}
-
-    def save_to_file(self) -> None:
-        with open(self.filename, "w") as file:
-            file.write(json.dumps(self.tasks))
-
-    def add_task(self, task: Task) -> None:
-        self.tasks[task.id] = task.to_json()
-        self.save_to_file()
-        logging.info(f"Задача с ID {task.id} добавлена")
-
-    def get_all_tasks(self) -> list[Task]:
-        logging.info("Запрос на получение всех задач")
-        return [Task.from_json(item) for item in self.tasks.values()]
-
-    def get_task_by_id(self, task_id: str) -> Task:
-        if task_id not in self.tasks:
-            logging.error(f"Задачи с ID {task_id} нет")
+                    yield self
+                except BaseException:
+                    self.data = self.storage.rollback(mark)
+                    self.reset_derived()
+                    logging.warning("Пакет изменений отменён")
+                    raise
+                snapshots = self.storage.snapshots
+                self.storage.end(self.data)
+                self.snapshot_summaries(snapshots)
+            self.storage.write_through()
+
+    @mutating
+    def add(self, entity) -> None:
+        value = entity.to_json()
+        old = self.previous(entity.id)
+        self.data[entity.id] = value
+        self._commit("put", entity.id, value, old)
+        logging.info(self.messages["added"], entity.id)
+
+    @refreshed
+    def iter_entities(self):
+        for item in self.storage.iter_values(self.data):
+            yield self.entity.from_json(item)
+
+    @refreshed
+    def get_all(self) -> list:
+        logging.info(self.messages["listed"])
+        if isinstance(self.data, SqliteTable):
+            return self.get_cache().wrap(self.data.values())
+        return self.entities(self.data)
+
+    @refreshed
+    def get_by_id(self, id: str):
+        if id not in self.data:
+            logging.error(self.messages["missing"], id)
             return None
-        logging.info(f"Запрос на получение задачи с ID {task_id}")
-        return Task.from_json(self.tasks[task_id])
+        logging.info(self.messages["fetched"], id)
+        return self.get_cache().get(id, self.data)
+
+    @refreshed
+    def search(self, query: str, limit: int = None, prefix: bool = False) -> list:
+        # Текстовый индекс есть только у менеджеров с text_fields.
+        if not self.text_fields:
+            raise ValueError(
+                f"{type(self).__name__}: поиск по тексту не поддерживается"
+            )
+        ids = self.get_indexes()["text"].search(query, limit, prefix)
+        results = self.entities(ids)
+        logging.info(self.messages["searched"], query)
+        return results
 
-    def edit_task(self, updated_task: Task) -> None:
-        if updated_task.id not in self.tasks:
-            logging.error(f"Задачи с ID {updated_task.id} нет")
+    @mutating
+    def edit(self, entity) -> None:
+        if entity.id not in self.data:
+            logging.error(self.messages["missing"], entity.id)
             return
-        self.tasks[updated_task.id] = updated_task.to_json()
-        self.save_to_file()
-        logging.info(f"Задача с ID {updated_task.id} обновлена")
-
-    def delete_task(self, task_id: str) -> None:
-        if task_id not in self.tasks:
-            logging.error(f"Задачи с ID {task_id} нет")
+        value = entity.to_json()
+        old = self.previous(entity.id)
+        self.data[entity.id] = value
+        self._commit("put", entity.id, value, old)
+        logging.info(self.messages["edited"], entity.id)
+
+    @mutating
+    def delete(self, id: str) -> None:
+        if id not in self.data:
+            logging.error(self.messages["missing"], id)
             return
-        del self.tasks[task_id]
-        self.save_to_file()
-        logging.info(f"Задача с ID {task_id} удалена")
+        old = self.previous(id)
+        del self.data[id]
+        self._commit("delete", id, None, old)
+        logging.info(self.messages["deleted"], id)
 
+    @refreshed
     def export_to_csv(self, filename: str) -> None:
-        df = pd.DataFrame.from_dict(self.tasks, orient="index")
-        df.to_csv(filename, index=False)
-        logging.info(f"Задачи экспортированы в файл {filename}")
-
-    def import_from_csv(self, filename: str) -> None:
-        df = pd.read_csv(filename)
-        df.index = df["id"]
-        self.tasks = df.to_dict("index")
-        self.save_to_file()
-        logging.info(f"Задачи импортированы из файла {filename}")
+        count = write_csv(filename, self.entity.__slots__, self.data.values())
+        logging.info(self.messages["exported"], filename, count)
+
+    @timed
+    def import_from_csv(self, filename: str, merge: bool = False) -> int:
+        # merge=False заменяет хранилище содержимым файла, merge=True
+        # добавляет новые записи и обновляет существующие по id.
+        count = 0
+        with self.batch():
+            if not merge:
+                self.data.clear()
+                self.reset_derived()
+                self.save_to_file()
+            for value in read_csv(filename, self.csv_converters):
+                old = self.previous(value["id"])
+                self.data[value["id"]] = value
+                self._commit("put", value["id"], value, old)
+                count += 1
+        logging.info(self.messages["imported"], filename, count)
+        return count
+
+    @timed
+    def bulk_import(
+        self, filename: str, merge: bool = False, workers: int = None,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> tuple:
+        # Импорт большого файла CSV или NDJSON: куски разбираются и
+        # проверяются в процессах (см. bulk_import.parse_file), а в
+        # хранилище всё уходит одним пакетом. Строки с ошибками
+        # пропускаются; возвращаются число записей и список ошибок
+        # (номер строки, сообщение).
+        fields = self.entity.__slots__
+        key = operator.itemgetter(fields.index("id"))
+        count = 0
+        errors = []
+        with self.batch():
+            if not merge:
+                self.data.clear()
+            chunks = parse_file(
+                filename, fields, self.csv_converters, workers, chunk_size
+            )
+            for rows, chunk_errors in chunks:
+                self.data.update(
+                    zip(map(key, rows), map(dict, map(zip, repeat(fields), rows)))
+                )
+                count += len(rows)
+                errors.extend(chunk_errors)
+            # Индексы и итоги дешевле собрать заново при первом обращении,
+            # чем обновлять по записи.
+            self.reset_derived()
+            self.save_to_file()
+        METRICS.count_bytes(read=os.path.getsize(filename))
+        for line_number, message in errors[:ERRORS_LOGGED]:
+            logging.error(f"Строка {line_number} файла {filename} пропущена: {message}")
+        if len(errors) > ERRORS_LOGGED:
+            logging.error(f"Ещё {len(errors) - ERRORS_LOGGED} строк с ошибками")
+        logging.info(self.messages["imported"], filename, count)
+        return count, errors
+
+
+class NoteManager(EntityStore):
+    entity = Note
+    table = "notes"
+    text_fields = dict(title=3, content=1)
+    messages = dict(
+        added="Заметка с ID %s добавлена в базу данных",
+        listed="Запрос на получение всех заметок",
+        fetched="Запрос на получение заметки с ID %s",
+        missing="Заметки с ID %s нет",
+        searched="Поиск заметок по запросу '%s'",
+        edited="Запрос на изменение заметки с ID %s",
+        deleted="Заметка с ID %s удалена",
+        exported="Заметки экспортированы в файл %s (%s)",
+        imported="Заметки импортированы из файла %s (%s)",
+    )
+
+    notes = data_alias()
+    init_notes = EntityStore.init_store
+    create_note = EntityStore.add
+    iter_notes = EntityStore.iter_entities
+    get_all_notes = EntityStore.get_all
+    get_note_by_id = EntityStore.get_by_id
+    search_notes = EntityStore.search
+    edit_note = EntityStore.edit
+    delete_note = EntityStore.delete
+
+
+class TaskManager(EntityStore):
+    entity = Task
+    table = "tasks"
+    sqlite_columns = dict(
+        done=lambda task: bool(task.get("done")),
+        priority=lambda task: task.get("priority"),
+        due_date=lambda task: task.get("due_date"),
+        due_day=lambda task: date_key(task.get("due_date")),
+    )
+    interned_fields = ("priority", "due_date")
+    date_fields = ("due_date",)
+    csv_converters = dict(done=parse_bool)
+    messages = dict(
+        added="Задача с ID %s добавлена",
+        listed="Запрос на получение всех задач",
+        fetched="Запрос на получение задачи с ID %s",
+        missing="Задачи с ID %s нет",
+        edited="Задача с ID %s обновлена",
+        deleted="Задача с ID %s удалена",
+        exported="Задачи экспортированы в файл %s (%s)",
+        imported="Задачи импортированы из файла %s (%s)",
+    )
+
+    tasks = data_alias()
+    init_tasks = EntityStore.init_store
+    add_task = EntityStore.add
+    iter_tasks = EntityStore.iter_entities
+    get_all_tasks = EntityStore.get_all
+    get_task_by_id = EntityStore.get_by_id
+    edit_task = EntityStore.edit
+    delete_task = EntityStore.delete
+
+    def index_definitions(self) -> dict:
+        return dict(
+            done=FieldIndex(lambda task: bool(task.get("done"))),
+            priority=FieldIndex(lambda task: task.get("priority")),
+            due_date=FieldIndex(lambda task: task.get("due_date")),
+            due_day=SortedIndex(lambda task: date_key(task.get("due_date"))),
+        )
 
+    @refreshed
     def filter_tasks(self, status=None, priority=None, due_date=None) -> list[Task]:
-        tasks = self.get_all_tasks()
-        if status is not None:
-            tasks = [task for task in tasks if task.done == status]
-        if priority is not None:
-            tasks = [task for task in tasks if task.priority == priority]
-        if due_date is not None:
-            tasks = [task for task in tasks if task.due_date == due_date]
-        return tasks
+        conditions = dict(done=status, priority=priority, due_date=due_date)
+        conditions = {
+            name: value for name, value in conditions.items() if value is not None
+        }
+        if isinstance(self.data, SqliteTable):
+            where = " AND ".join(f"{name} = ?" for name in conditions)
+            return self.get_cache().wrap(
+                self.data.select(where, tuple(conditions.values()))
+            )
+        if not conditions:
+            return self.get_all_tasks()
 
+        indexes = self.get_indexes()
+        ids = intersect(
+            [indexes[name].get(value) for name, value in conditions.items()]
+        )
+        return self.entities(ids)
+
+    @refreshed
+    def tasks_due_between(
+        self, start_date: str = None, end_date: str = None, status=None
+    ) -> list[Task]:
+        # Задачи с дедлайном в [start_date, end_date] в порядке дедлайна.
+        low = date_bound(start_date)
+        high = date_bound(end_date)
+        if isinstance(self.data, SqliteTable):
+            where, params = ["due_day IS NOT NULL"], []
+            if low is not None:
+                where.append("due_day >= ?")
+                params.append(low)
+            if high is not None:
+                where.append("due_day <= ?")
+                params.append(high)
+            if status is not None:
+                where.append("done = ?")
+                params.append(status)
+            return self.get_cache().wrap(
+                self.data.select(
+                    " AND ".join(where) + " ORDER BY due_day", tuple(params)
+                )
+            )
 
-class ContactManager:
-    def __init__(self, filename: str) -> None:
-        self.filename = filename
-        self.init_contacts()
-
-    def init_contacts(self) -> None:
-        if not os.path.isfile(self.filename):
-            logging.warning(f"Файл {self.filename} не найден")
-            with open(self.filename, "w") as file:
-                file.write("{}")
-                logging.info(f"Файл {self.filename} создан")
-            self.contacts = {}
-        else:
-            with open(self.filename, "r+") as file:
-                try:
-                    contacts = json.loads(file.read())
-                    logging.info(
-                        f"Файл {self.filename} найден и является валидным JSON"
-                    )
-                    self.contacts = contacts
-                except:
-                    logging.warning(f"Файл {self.filename} поврежден")
-                    file.seek(0)
-                    file.truncate(0)
-                    file.write("{}")
-                    logging.info(f"Файл {self.filename} перезаписан")
-                    self.contacts = {}
+        indexes = self.get_indexes()
+        ids = indexes["due_day"].range(low, high)
+        if status is not None:
+            posting = indexes["done"].get(status)
+            ids = [id for id in ids if id in posting]
+        return self.entities(ids)
+
+    def overdue_tasks(self, today: str = None) -> list[Task]:
+        today = today or datetime.now().strftime("%d-%m-%Y")
+        yesterday = datetime.strptime(today, "%d-%m-%Y") - timedelta(days=1)
+        return self.tasks_due_between(
+            end_date=yesterday.strftime("%d-%m-%Y"), status=False
+        )
 
-    def save_to_file(self) -> None:
-        with open(self.filename, "w") as file:
-            file.write(json.dumps(self.contacts))
-
-    def add_contact(self, contact: Contact) -> None:
-        self.contacts[contact.id] = contact.to_json()
-        self.save_to_file()
-        logging.info(f"Контакт с ID {contact.id} добавлен")
-
-    def get_all_contacts(self) -> list[Contact]:
-        logging.info("Запрос на получение всех контактов")
-        return [Contact.from_json(item) for item in self.contacts.values()]
-
-    def search_contact(self, query: str) -> list[Contact]:
-        results = [
-            Contact.from_json(contact)
-            for contact in self.contacts.values()
-            if query.lower() in contact["name"].lower() or query in contact["phone"]
-        ]
-        logging.info(f"Поиск контактов по запросу '{query}'")
-        return results
+    def tasks_due_soon(self, days: int = 7, today: str = None) -> list[Task]:
+        today = today or datetime.now().strftime("%d-%m-%Y")
+        until = datetime.strptime(today, "%d-%m-%Y") + timedelta(days=days)
+        return self.tasks_due_between(today, until.strftime("%d-%m-%Y"), status=False)
+
+
+class ContactManager(EntityStore):
+    entity = Contact
+    table = "contacts"
+    text_fields = dict(name=3, email=2, phone=1)
+    messages = dict(
+        added="Контакт с ID %s добавлен",
+        listed="Запрос на получение всех контактов",
+        fetched="Запрос на получение контакта с ID %s",
+        missing="Контакт с ID %s не найден",
+        searched="Поиск контактов по запросу '%s'",
+        edited="Контакт с ID %s обновлён",
+        deleted="Контакт с ID %s удалён",
+        exported="Контакты экспортированы в файл %s (%s)",
+        imported="Контакты импортированы из файла %s (%s)",
+    )
+
+    contacts = data_alias()
+    init_contacts = EntityStore.init_store
+    add_contact = EntityStore.add
+    iter_contacts = EntityStore.iter_entities
+    get_all_contacts = EntityStore.get_all
+    search_contact = EntityStore.search
+    edit_contact = EntityStore.edit
+    delete_contact = EntityStore.delete
+
+
+class FinanceManager(EntityStore):
+    entity = FinanceRecord
+    table = "finance"
+    sqlite_columns = dict(
+        amount=lambda record: record.get("amount"),
+        category=lambda record: record.get("category"),
+        date=lambda record: record.get("date"),
+        day=lambda record: date_key(record.get("date")),
+    )
+    interned_fields = ("category", "date")
+    date_fields = ("date",)
+    csv_converters = dict(amount=float, date=parse_date)
+    derived = ("indexes", "columns", "cache")
+    # Баланс и итоги по категориям и месяцам хранятся готовыми: запросы
+    # без периода не проходят по записям (и не строят индексы).
+    sqlite_summaries = dict(
+        categories=("{row}.category", dict(total="coalesce({row}.amount, 0)")),
+        months=(
+            "{row}.day / 100",
+            dict(
+                income="max(coalesce({row}.amount, 0), 0)",
+                expense="min(coalesce({row}.amount, 0), 0)",
+            ),
+        ),
+    )
+    messages = dict(
+        added="Финансовая запись с ID %s добавлена",
+        listed="Запрос на получение всех финансовых записей",
+        fetched="Запрос на получение финансовой записи с ID %s",
+        missing="Запись с ID %s не найдена",
+        edited="Финансовая запись с ID %s обновлена",
+        deleted="Финансовая запись с ID %s удалена",
+        exported="Финансовые записи экспортированы в файл %s (%s)",
+        imported="Финансовые записи импортированы из файла %s (%s)",
+    )
+
+    records = data_alias()
+    init_records = EntityStore.init_store
+    add_record = EntityStore.add
+    iter_records = EntityStore.iter_entities
+    get_all_records = EntityStore.get_all
+    edit_record = EntityStore.edit
+    delete_record = EntityStore.delete
+
+    def summary_definitions(self) -> dict:
+        return dict(
+            categories=Summary(
+                lambda record: record.get("category"),
+                dict(total=lambda record: record.get("amount") or 0),
+            ),
+            months=Summary(
+                lambda record: month_key(record.get("date")),
+                dict(
+                    income=lambda record: max(record.get("amount") or 0, 0),
+                    expense=lambda record: min(record.get("amount") or 0, 0),
+                ),
+            ),
+        )
 
-    def edit_contact(self, updated_contact: Contact) -> None:
-        if updated_contact.id not in self.contacts:
-            logging.error(f"Контакт с ID {updated_contact.id} не найден")
-            return
-        self.contacts[updated_contact.id] = updated_contact.to_json()
-        self.save_to_file()
-        logging.info(f"Контакт с ID {updated_contact.id} обновлён")
+    def index_definitions(self) -> dict:
+        return dict(
+            category=FieldIndex(lambda record: record.get("category")),
+            date=FieldIndex(lambda record: record.get("date")),
+            day=SortedIndex(lambda record: date_key(record.get("date"))),
+            report=RangeSumIndex(
+                lambda record: date_key(record.get("date")),
+                lambda record: record.get("category"),
+                lambda record: record.get("amount"),
+            ),
+        )
 
-    def delete_contact(self, contact_id: str) -> None:
-        if contact_id not in self.contacts:
-            logging.error(f"Контакт с ID {contact_id} не найден")
-            return
-        del self.contacts[contact_id]
-        self.save_to_file()
-        logging.info(f"Контакт с ID {contact_id} удалён")
+    @refreshed
+    def filter_records(self, category=None, date=None) -> list[FinanceRecord]:
+        conditions = dict(category=category, date=date)
+        conditions = {
+            name: value for name, value in conditions.items() if value is not None
+        }
+        if isinstance(self.data, SqliteTable):
+            where = " AND ".join(f"{name} = ?" for name in conditions)
+            return self.get_cache().wrap(
+                self.data.select(where, tuple(conditions.values()))
+            )
+        if not conditions:
+            return self.get_all_records()
 
-    def export_to_csv(self, filename: str) -> None:
-        df = pd.DataFrame.from_dict(self.contacts, orient="index")
-        df.to_csv(filename, index=False)
-        logging.info(f"Контакты экспортированы в файл {filename}")
+        indexes = self.get_indexes()
+        ids = intersect(
+            [indexes[name].get(value) for name, value in conditions.items()]
+        )
+        return self.entities(ids)
+
+    @refreshed
+    def records_between(self, start_date=None, end_date=None) -> list[FinanceRecord]:
+        # Записи за период в порядке дат: bisect по индексу дней и срез.
+        low = date_bound(start_date)
+        high = date_bound(end_date)
+        if isinstance(self.data, SqliteTable):
+            where, params = ["day IS NOT NULL"], []
+            if low is not None:
+                where.append("day >= ?")
+                params.append(low)
+            if high is not None:
+                where.append("day <= ?")
+                params.append(high)
+            return self.get_cache().wrap(
+                self.data.select(
+                    " AND ".join(where) + " ORDER BY day", tuple(params)
+                )
+            )
 
-    def import_from_csv(self, filename: str) -> None:
-        df = pd.read_csv(filename)
-        df.index = df["id"]
-        self.contacts = df.to_dict("index")
-        self.save_to_file()
-        logging.info(f"Контакты импортированы из файла {filename}")
+        ids = self.get_indexes()["day"].range(low, high)
+        return self.entities(ids)
 
+    @refreshed
+    @memoized
+    def calculate_balance(self) -> float:
+        balance = money_sum(row["total"] for row in self.summary("categories").values())
+        logging.info("Общий баланс: %s руб.", balance)
+        return balance
 
-class FinanceManager:
-    def __init__(self, filename: str) -> None:
-        self.filename = filename
-        self.init_records()
-
-    def init_records(self) -> None:
-        if not os.path.isfile(self.filename):
-            logging.warning(f"Файл {self.filename} не найден")
-            with open(self.filename, "w") as file:
-                file.write("{}")
-                logging.info(f"Файл {self.filename} создан")
-            self.records = {}
+    @refreshed
+    @memoized
+    def generate_report(self, start_date=None, end_date=None):
+        low = date_bound(start_date)
+        high = date_bound(end_date)
+        if low is None and high is None:
+            report = {
+                category: row["total"]
+                for category, row in self.summary("categories").items()
+            }
+        elif isinstance(self.data, SqliteTable):
+            where, params = [], []
+            if low is not None:
+                where.append("day >= ?")
+                params.append(low)
+            if high is not None:
+                where.append("day <= ?")
+                params.append(high)
+            report = self.data.sum(
+                "amount", " AND ".join(where), tuple(params), group_by="category"
+            )
         else:
-            with open(self.filename, "r+") as file:
-                try:
-                    records = json.loads(file.read())
-                    logging.info(
-                        f"Файл {self.filename} найден и является валидным JSON"
-                    )
-                    self.records = records
-                except:
-                    logging.warning(f"Файл {self.filename} поврежден")
-                    file.seek(0)
-                    file.truncate(0)
-                    file.write("{}")
-                    logging.info(f"Файл {self.filename} перезаписан")
-                    self.records = {}
+            report = self.get_indexes()["report"].sum(low, high)
 
-    def save_to_file(self) -> None:
-        with open(self.filename, "w") as file:
-            file.write(json.dumps(self.records))
+        logging.info("Отчёт о финансовой активности сгенерирован")
+        return report
 
-    def add_record(self, record: FinanceRecord) -> None:
-        self.records[record.id] = record.to_json()
-        self.save_to_file()
-        logging.info(f"Финансовая запись с ID {record.id} добавлена")
+    @refreshed
+    def get_columns(self):
+        # Колоночное представление для аналитики; NumPy импортируется
+        # только здесь, остальной менеджер без него работает.
+        if self.columns is None:
+            from analytics import FinanceColumns
+
+            self.columns = FinanceColumns(
+                lambda record: record.get("amount"),
+                lambda record: date_ordinal(record.get("date")),
+                lambda record: record.get("category"),
+            ).build(self.data)
+        return self.columns
+
+    @refreshed
+    @memoized
+    def category_totals(self, start_date=None, end_date=None) -> dict:
+        if not start_date and not end_date:
+            return {
+                category: float(row["total"])
+                for category, row in self.summary("categories").items()
+            }
+        return self.get_columns().category_totals(
+            *ordinal_bounds(start_date, end_date)
+        )
 
-    def get_all_records(self) -> list[FinanceRecord]:
-        logging.info("Запрос на получение всех финансовых записей")
-        return [FinanceRecord.from_json(item) for item in self.records.values()]
+    @refreshed
+    @memoized
+    def monthly_totals(self, start_date=None, end_date=None) -> dict:
+        if not start_date and not end_date:
+            months = self.summary("months")
+            return {
+                f"{month // 100:04d}-{month % 100:02d}": dict(
+                    income=float(row["income"]),
+                    expense=float(row["expense"]),
+                    total=float(row["income"] + row["expense"]),
+                )
+                for month, row in sorted(
+                    (month, row) for month, row in months.items() if month is not None
+                )
+            }
+        return self.get_columns().rollup(
+            "month", *ordinal_bounds(start_date, end_date)
+        )
 
-    def filter_records(self, category=None, date=None) -> list[FinanceRecord]:
-        records = self.get_all_records()
-        if category is not None:
-            records = [record for record in records if record.category == category]
-        if date is not None:
-            records = [record for record in records if record.date == date]
-        return records
+    @refreshed
+    @memoized
+    def weekly_totals(self, start_date=None, end_date=None) -> dict:
+        return self.get_columns().rollup(
+            "week", *ordinal_bounds(start_date, end_date)
+        )
 
-    def calculate_balance(self) -> float:
-        balance = sum(record.amount for record in self.get_all_records())
-        logging.info(f"Общий баланс: {balance} руб.")
-        return balance
+    @refreshed
+    @memoized
+    def running_balance(self) -> dict:
+        return self.get_columns().running_balance()
 
-    def generate_report(self, start_date=None, end_date=None):
-        records = self.get_all_records()
-        if start_date:
-            records = [
-                record
-                for record in records
-                if datetime.strptime(record.date, "%d-%m-%Y")
-                >= datetime.strptime(start_date, "%d-%m-%Y")
-            ]
-        if end_date:
-            records = [
-                record
-                for record in records
-                if datetime.strptime(record.date, "%d-%m-%Y")
-                <= datetime.strptime(end_date, "%d-%m-%Y")
-            ]
-
-        report = {}
-        for record in records:
-            if record.category not in report:
-                report[record.category] = 0
-            report[record.category] += record.amount
+    @refreshed
+    def top_expenses(self, n: int = 10, start_date=None, end_date=None) -> list:
+        ids = self.get_columns().top_expenses(
+            n, *ordinal_bounds(start_date, end_date)
+        )
+        return self.entities(ids)
 
-        logging.info("Отчёт о финансовой активности сгенерирован")
-        return report
 
-    def delete_record(self, record_id: str) -> None:
-        if record_id not in self.records:
-            logging.error(f"Запись с ID {record_id} не найдена")
-            return
-        del self.records[record_id]
-        self.save_to_file()
-        logging.info(f"Финансовая запись с ID {record_id} удалена")
+MANAGERS = dict(
+    notes=NoteManager,
+    tasks=TaskManager,
+    contacts=ContactManager,
+    finance=FinanceManager,
+)
 
-    def export_to_csv(self, filename: str) -> None:
-        df = pd.DataFrame.from_dict(self.records, orient="index")
-        df.to_csv(filename, index=False)
-        logging.info(f"Финансовые записи экспортированы в файл {filename}")
 
-    def import_from_csv(self, filename: str) -> None:
-        df = pd.read_csv(filename)
-        df.index = df["id"]
-        self.records = df.to_dict("index")
-        self.save_to_file()
-        logging.info(f"Финансовые записи импортированы из файла {filename}")
+WORKSPACE_FILENAME = "assistant.json"
+
+
+class Workspace:
+    # Все менеджеры над одним хранилищем: один JSON-файл с разделами или
+    # одна база SQLite за одним соединением. Файл читается один раз при
+    # открытии, а менеджеры создаются при первом обращении и живут
+    # столько же, сколько рабочее пространство, — возврат в меню или
+    # очередной запрос сервиса данные не перечитывает.
+    def __init__(
+        self, filename: str = WORKSPACE_FILENAME, backend: str = None, **options
+    ) -> None:
+        self.filename = filename
+        self.storage = open_workspace(filename, backend, **options)
+        self.managers = {}
+        for filename in self.legacy_files(self.directory).values():
+            logging.warning(
+                f"{filename} не используется: данные разделов лежат в "
+                f"{self.filename}; перенести их можно командой adopt"
+            )
+
+    @property
+    def directory(self) -> str:
+        return os.path.dirname(self.filename)
+
+    def __getitem__(self, kind: str) -> EntityStore:
+        manager = self.managers.get(kind)
+        if manager is None:
+            manager_class = MANAGERS[kind]
+            storage = self.storage.section(
+                manager_class.table,
+                manager_class.sqlite_columns,
+                manager_class.sqlite_summaries,
+            )
+            manager = self.managers[kind] = manager_class(storage=storage)
+        return manager
+
+    @contextmanager
+    def transaction(self, *kinds):
+        # Изменения нескольких разделов атомарно: пакеты всех менеджеров
+        # открыты вместе и уходят на диск одной записью (в SQLite — одной
+        # транзакцией), а исключение откатывает их все. Менеджеры
+        # создаются до открытия пакетов: в SQLite откат отменил бы и
+        # создание их таблиц.
+        managers = [self[kind] for kind in kinds or MANAGERS]
+        opened = set(self.managers)
+        try:
+            with ExitStack() as stack:
+                for manager in managers:
+                    stack.enter_context(manager.batch())
+                yield self
+        except BaseException:
+            # Менеджеры разделов, впервые открытых внутри транзакции,
+            # пересоздаются заново.
+            for kind in set(self.managers) - opened:
+                del self.managers[kind]
+            raise
+
+    @staticmethod
+    def legacy_files(directory: str) -> dict:
+        # Прежние отдельные файлы разделов (notes.json, tasks.json, ...).
+        filenames = {
+            kind: os.path.join(directory, f"{kind}.json") for kind in MANAGERS
+        }
+        return {
+            kind: filename
+            for kind, filename in filenames.items()
+            if os.path.isfile(filename)
+        }
+
+    def adopt_files(self, directory: str = None) -> dict:
+        # Перенос прежних файлов разделов в общий файл — только по явной
+        # команде (adopt или подтверждение в меню). Раздел, в котором уже
+        # есть данные, не перезаписывается: тогда не переносится ничего.
+        # Перенесённые файлы переименовываются в .adopted, иначе их
+        # продолжили бы менять мимо общего файла. Возвращает перенесённые
+        # файлы по разделам.
+        filenames = self.legacy_files(self.directory if directory is None else directory)
+        occupied = [kind for kind in filenames if len(self[kind].data)]
+        if occupied:
+            raise ValueError(
+                f"{self.filename}: разделы {', '.join(occupied)} уже не пусты, "
+                "перенос отменён"
+            )
+        if not filenames:
+            return filenames
+        with self.transaction(*filenames):
+            for kind, filename in filenames.items():
+                manager = self[kind]
+                manager.data = manager.storage.replace(JsonStorage(filename).load())
+                manager.reset_derived()
+        for kind, filename in filenames.items():
+            os.replace(filename, filename + ".adopted")
+            logging.info(
+                "Раздел %s перенесён из %s (файл переименован в %s.adopted)",
+                kind, filename, filename,
+            )
+        return filenames
+
+    def flush(self) -> None:
+        for manager in self.managers.values():
+            manager.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self.storage.close()
+
+
+def migrate_to_sqlite(kind: str, json_filename: str, db_filename: str) -> None:
+    data = JsonStorage(json_filename).load()
+    manager = MANAGERS[kind](db_filename, backend="sqlite")
+    manager.storage.replace(data)
+    logging.info(
+        f"{len(data)} записей перенесено из {json_filename} в {db_filename} ({kind})"
+    )
+
+
+def convert_store(kind: str, source: str, target: str) -> None:
+    # Перенос хранилища между форматами; формат каждого файла
+    # определяется по расширению: .json, .bin (бинарный), .db (SQLite).
+    data = MANAGERS[kind](source).storage.load()
+    manager = MANAGERS[kind](target)
+    manager.storage.replace(data)
+    logging.info(
+        f"{len(data)} записей перенесено из {source} в {target} ({kind})"
+    )
+
+
+def offer_adoption(workspace: Workspace):
+    # Прежние файлы разделов переносятся в общий файл только с согласия
+    # пользователя.
+    filenames = workspace.legacy_files(workspace.directory)
+    if not filenames:
+        return
+    print(f"Найдены прежние файлы разделов: {', '.join(filenames.values())}")
+    answer = input(f"Перенести их в {workspace.filename}? (да/нет): ")
+    if answer.strip().lower() not in ("да", "д", "yes", "y"):
+        return
+    try:
+        workspace.adopt_files()
+    except ValueError as error:
+        print(f"Ошибка: {error}")
+    else:
+        print("Данные перенесены.")
 
 
-def main_menu():
+def main_menu(workspace: Workspace):
     while True:
         print("\nДобро пожаловать в Персональный помощник!")
         print("Выберите действие:")
@@ -507,13 +1313,13 @@ def main_menu():
         choice = input("Введите номер действия: ")
 
         if choice == "1":
-            notes_menu()
+            notes_menu(workspace["notes"])
         elif choice == "2":
-            tasks_menu()
+            tasks_menu(workspace["tasks"])
         elif choice == "3":
-            contacts_menu()
+            contacts_menu(workspace["contacts"])
         elif choice == "4":
-            finance_menu()
+            finance_menu(workspace["finance"])
         elif choice == "5":
             calculator_menu()
         elif choice == "6":
@@ -523,9 +1329,7 @@ def main_menu():
             print("Некорректный ввод. Попробуйте снова.")
 
 
-def notes_menu():
-    note_manager = NoteManager("notes.json")
-
+def notes_menu(note_manager: NoteManager):
     while True:
         print("\n--- Управление заметками ---")
         print("1. Добавить заметку")
@@ -564,9 +1368,7 @@ def notes_menu():
             print("Некорректный ввод.")
 
 
-def tasks_menu():
-    task_manager = TaskManager("tasks.json")
-
+def tasks_menu(task_manager: TaskManager):
     while True:
         print("\n--- Управление задачами ---")
         print("1. Добавить задачу")
@@ -599,7 +1401,7 @@ def tasks_menu():
             print(f"Задача {task_id} обновлена.")
         elif choice == "4":
             task_id = input("Введите ID задачи для изменения статуса: ")
-            task = task_manager.get_task_by_id(task_id=task_id)
+            task = task_manager.get_task_by_id(task_id)
             task.update_task_status()
             task_manager.edit_task(task)
             print(f"Статус задачи {task_id} изменён.")
@@ -617,9 +1419,7 @@ def tasks_menu():
             print("Некорректный ввод.")
 
 
-def contacts_menu():
-    contact_manager = ContactManager("contacts.json")
-
+def contacts_menu(contact_manager: ContactManager):
     while True:
         print("\n--- Управление контактами ---")
         print("1. Добавить контакт")
@@ -663,9 +1463,7 @@ def contacts_menu():
             print("Некорректный ввод.")
 
 
-def finance_menu():
-    finance_manager = FinanceManager("finance.json")
-
+def finance_menu(finance_manager: FinanceManager):
     while True:
         print("\n--- Управление финансовыми записями ---")
         print("1. Добавить финансовую запись")
@@ -742,21 +1540,337 @@ def calculator_menu():
         print("Ошибка: некорректный ввод. Введите числа корректно.")
 
 
+# Неинтерактивный режим: python personal_assistant.py <раздел> <команда>.
+# Записи читаются из stdin и пишутся в stdout построчно в NDJSON.
+def read_ndjson(file):
+    # Пары (номер строки, значение): по номеру строки сообщается ошибка
+    # в записи.
+    for line_number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as error:
+            raise ValueError(f"строка {line_number}: {error}") from None
+
+
+def write_ndjson(entities) -> None:
+    write = sys.stdout.write
+    for entity in entities:
+        write(json.dumps(entity.to_json(), ensure_ascii=False) + "\n")
+
+
+def convert_record(record: dict, converters: dict) -> dict:
+    # Те же приведения типов, что и у импорта CSV. Строки и пропуски
+    # разбираются как ячейки CSV, остальные значения — по их записи в
+    # строку: 10 и "10" дают 10.0, а true в поле суммы или число в поле
+    # даты — ValueError, а не запись, на которой потом упадёт отчёт.
+    for field, converter in converters.items():
+        value = record.get(field)
+        if value is None or isinstance(value, str):
+            record[field] = converter(value or "")
+        elif isinstance(value, (bool, int, float)):
+            record[field] = converter(str(value))
+        else:
+            raise ValueError(f"{field}: неподходящее значение {value!r}")
+    return record
+
+
+def apply_operations(manager, operations) -> list:
+    # Пакет операций {"op": "add"|"edit"|"delete", ...} — пар (номер
+    # строки, операция) — в одной записи на диск; при любой ошибке весь
+    # пакет откатывается.
+    entity_class = manager.entity
+    changed = []
+    with manager.batch():
+        for number, operation in operations:
+            try:
+                if not isinstance(operation, dict):
+                    raise ValueError("ожидался объект JSON")
+                op = operation.get("op", "add")
+                record = operation.get("record", operation)
+                if not isinstance(record, dict):
+                    raise ValueError("ожидался объект JSON")
+                record = {key: value for key, value in record.items() if key != "op"}
+                if op == "add":
+                    record = convert_record(record, manager.csv_converters)
+                    entity = entity_class.from_json(record)
+                    manager.add(entity)
+                elif op == "edit":
+                    # Правка может быть частичной: недостающие поля берём
+                    # из хранимой записи.
+                    record = convert_record(
+                        {**manager.data[record["id"]], **record}, manager.csv_converters
+                    )
+                    entity = entity_class.from_json(record)
+                    manager.edit(entity)
+                elif op == "delete":
+                    manager.delete(record["id"])
+                    continue
+                else:
+                    raise ValueError(f"неизвестная операция {op!r}")
+            except (KeyError, TypeError, ValueError) as error:
+                raise ValueError(f"строка {number}: {error!r}") from None
+            changed.append(entity)
+    return changed
+
+
+def build_parser():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="personal_assistant",
+        description="Персональный помощник. Без аргументов запускается меню.",
+    )
+    parser.add_argument("-v", "--verbose", action="store_true")
+    parser.add_argument(
+        "--metrics",
+        choices=("prometheus", "json"),
+        help="после команды вывести метрики операций в stderr",
+    )
+    sections = parser.add_subparsers(dest="kind", required=True)
+
+    storage = argparse.ArgumentParser(add_help=False)
+    storage.add_argument(
+        "--file",
+        help=f"отдельный файл хранилища (по умолчанию — общий {WORKSPACE_FILENAME}, "
+        "как в меню)",
+    )
+    storage.add_argument("--backend", choices=("json", "journal", "sqlite"))
+    storage.add_argument("--journal", action="store_true")
+    storage.add_argument("--lazy", action="store_true")
+    storage.add_argument("--compact", action="store_true")
+    storage.add_argument(
+        "--shared", action="store_true", help="файл открыт и другими процессами"
+    )
+    storage.add_argument("--durability", choices=DURABILITY_MODES)
+    storage.add_argument(
+        "--format", choices=("json", *SERIALIZERS), help="формат снимка"
+    )
+
+    commands_by_kind = {}
+    for kind in MANAGERS:
+        section = sections.add_parser(kind)
+        commands = section.add_subparsers(dest="command", required=True)
+        commands_by_kind[kind] = commands
+        commands.add_parser("list", parents=[storage])
+        get = commands.add_parser("get", parents=[storage])
+        get.add_argument("id")
+        commands.add_parser("add", parents=[storage], help="записи NDJSON из stdin")
+        delete = commands.add_parser("delete", parents=[storage])
+        delete.add_argument("ids", nargs="+")
+        apply = commands.add_parser(
+            "apply", parents=[storage], help="пакет операций NDJSON одной записью"
+        )
+        apply.add_argument("operations", nargs="?", default="-")
+        import_ = commands.add_parser("import", parents=[storage])
+        import_.add_argument("csv")
+        import_.add_argument("--merge", action="store_true")
+        import_.add_argument(
+            "--workers", type=int,
+            help="параллельный разбор в N процессах (0 — по числу ядер), "
+            "также для .ndjson/.jsonl",
+        )
+        export = commands.add_parser("export", parents=[storage])
+        export.add_argument("csv")
+        if MANAGERS[kind].text_fields:
+            search = commands.add_parser("search", parents=[storage])
+            search.add_argument("query")
+            search.add_argument("--limit", type=int)
+            search.add_argument("--prefix", action="store_true")
+
+    tasks = commands_by_kind["tasks"]
+    filter_ = tasks.add_parser("filter", parents=[storage])
+    filter_.add_argument("--status", type=parse_bool)
+    filter_.add_argument("--priority")
+    filter_.add_argument("--due-date")
+    due = tasks.add_parser("due", parents=[storage])
+    due.add_argument("--from", dest="start_date")
+    due.add_argument("--to", dest="end_date")
+    due.add_argument("--status", type=parse_bool)
+
+    finance = commands_by_kind["finance"]
+    filter_ = finance.add_parser("filter", parents=[storage])
+    filter_.add_argument("--category")
+    filter_.add_argument("--date")
+    report = finance.add_parser("report", parents=[storage])
+    report.add_argument("--from", dest="start_date")
+    report.add_argument("--to", dest="end_date")
+    finance.add_parser("balance", parents=[storage])
+    verify = finance.add_parser(
+        "verify", parents=[storage], help="сверка сохранённых итогов с данными"
+    )
+    verify.add_argument("--rebuild", action="store_true", help="пересчитать итоги")
+
+    migrate = sections.add_parser("migrate", help="перенос JSON-хранилища в SQLite")
+    migrate.add_argument("section", choices=list(MANAGERS))
+    migrate.add_argument("source")
+    migrate.add_argument("target")
+    convert = sections.add_parser(
+        "convert", help="перенос хранилища в другой формат (по расширению)"
+    )
+    convert.add_argument("section", choices=list(MANAGERS))
+    convert.add_argument("source")
+    convert.add_argument("target")
+    adopt = sections.add_parser(
+        "adopt", help="перенос прежних файлов разделов (notes.json, ...) в общий файл"
+    )
+    adopt.add_argument("--file", default=WORKSPACE_FILENAME, help="общий файл")
+    return parser
+
+
+def open_manager(args):
+    # Без --file команда работает с тем же общим файлом, что и меню:
+    # иначе меню и командная строка меняли бы разные данные. Режимы
+    # отдельного файла к общему не относятся.
+    if args.file is None:
+        # Общий файл и так ведётся с журналом: --journal здесь не нужен,
+        # но и не ошибка.
+        unsupported = [
+            f"--{name}"
+            for name in ("lazy", "compact", "shared", "format")
+            if getattr(args, name)
+        ]
+        if args.backend not in (None, "json", "journal"):
+            unsupported.append("--backend")
+        if unsupported:
+            raise ValueError(f"{', '.join(unsupported)}: только вместе с --file")
+        options = dict(durability=args.durability) if args.durability else {}
+        return Workspace(**options)[args.kind]
+
+    options = dict(journal=args.journal, backend=args.backend)
+    for name in ("lazy", "compact", "shared"):
+        if getattr(args, name):
+            options[name] = True
+    for name in ("durability", "format"):
+        if getattr(args, name):
+            options[name] = getattr(args, name)
+    return MANAGERS[args.kind](args.file, **options)
+
+
+def run_command(args) -> int:
+    if args.kind == "migrate":
+        migrate_to_sqlite(args.section, args.source, args.target)
+        return 0
+    if args.kind == "convert":
+        convert_store(args.section, args.source, args.target)
+        return 0
+    if args.kind == "adopt":
+        workspace = Workspace(args.file)
+        adopted = workspace.adopt_files()
+        workspace.close()
+        for kind, filename in adopted.items():
+            print(f"{kind}: {filename}")
+        return 0
+
+    manager = open_manager(args)
+    command = args.command
+    if command == "list":
+        write_ndjson(manager.iter_entities())
+    elif command == "get":
+        if args.id not in manager.data:
+            print(f"Записи с ID {args.id} нет", file=sys.stderr)
+            return 1
+        write_ndjson([manager.entity.from_json(manager.data[args.id])])
+    elif command in ("add", "apply"):
+        source = args.operations if command == "apply" else "-"
+        file = sys.stdin if source == "-" else open(source, encoding="utf-8")
+        try:
+            operations = read_ndjson(file)
+            if command == "add":
+                operations = (
+                    (number, dict(op="add", record=record))
+                    for number, record in operations
+                )
+            write_ndjson(apply_operations(manager, operations))
+        except ValueError as error:
+            print(f"Пакет отменён: {error}", file=sys.stderr)
+            return 1
+        finally:
+            if file is not sys.stdin:
+                file.close()
+    elif command == "delete":
+        apply_operations(
+            manager, enumerate((dict(op="delete", id=id) for id in args.ids), start=1)
+        )
+    elif command == "import" and args.workers is not None:
+        count, errors = manager.bulk_import(
+            args.csv, merge=args.merge, workers=args.workers or None
+        )
+        for line_number, message in errors:
+            print(f"{line_number}: {message}", file=sys.stderr)
+        print(count)
+    elif command == "import":
+        print(manager.import_from_csv(args.csv, merge=args.merge))
+    elif command == "export":
+        manager.export_to_csv(args.csv)
+    elif command == "search":
+        write_ndjson(manager.search(args.query, args.limit, args.prefix))
+    elif command == "filter" and args.kind == "tasks":
+        write_ndjson(manager.filter_tasks(args.status, args.priority, args.due_date))
+    elif command == "due":
+        write_ndjson(
+            manager.tasks_due_between(args.start_date, args.end_date, args.status)
+        )
+    elif command == "filter":
+        write_ndjson(manager.filter_records(args.category, args.date))
+    elif command == "report":
+        report = manager.generate_report(args.start_date, args.end_date)
+        print(json.dumps(report, ensure_ascii=False))
+    elif command == "balance":
+        print(json.dumps(manager.calculate_balance()))
+    elif command == "verify":
+        mismatches = manager.verify_summaries(args.rebuild)
+        print(json.dumps(mismatches, ensure_ascii=False))
+        if mismatches and not args.rebuild:
+            return 1
+    # Итоги сохраняются один раз на команду, а не на каждое изменение.
+    manager.flush()
+    return 0
+
+
+def cli(argv: list) -> int:
+    args = build_parser().parse_args(argv)
+    # В пакетном режиме построчные INFO-сообщения только мешают конвейеру.
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    if args.metrics:
+        METRICS.enable()
+    try:
+        return run_command(args)
+    except (ValueError, FormatError) as error:
+        print(f"Ошибка: {error}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # Читатель конвейера (например, head) закрылся раньше нас.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    finally:
+        if args.metrics == "prometheus":
+            sys.stderr.write(METRICS.to_prometheus())
+        elif args.metrics == "json":
+            print(METRICS.to_json(), file=sys.stderr)
+
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
 
+    if len(sys.argv) > 1:
+        sys.exit(cli(sys.argv[1:]))
+
+    workspace = Workspace()
+    offer_adoption(workspace)
     while True:
-        main_menu()
+        main_menu(workspace)
         choice = input("Введите ваш выбор: ")
 
         if choice == "1":
-            notes_menu()
+            notes_menu(workspace["notes"])
         elif choice == "2":
-            tasks_menu()
+            tasks_menu(workspace["tasks"])
         elif choice == "3":
-            contacts_menu()
+            contacts_menu(workspace["contacts"])
         elif choice == "4":
-            finance_menu()
+            finance_menu(workspace["finance"])
         elif choice == "5":
             calculator_menu()
         elif choice == "6":
@@ -764,3 +1878,4 @@ if __name__ == "__main__":
             break
         else:
             print("Некорректный ввод. Попробуйте снова.")
+    workspace.close()
@@ -0,0 +1,202 @@
+import json
+import operator
+import struct
+import zlib
+from itertools import repeat
+
+from metrics import METRICS
+
+# Заголовок бинарного файла: сигнатура с номером формата и CRC32 тела —
+# повреждение замечается при чтении, а не превращается молча в другие
+# данные. Файлы прежнего формата PAB1 (тело marshal) не читаются:
+# marshal.loads над содержимым файла небезопасен.
+MAGIC = b"PAB2"
+HEADER = struct.Struct("<4sI")
+
+
+class FormatError(Exception):
+    # Файл цел (контрольная сумма сходится), но записан форматом, который
+    # эта версия не читает. Это не повреждение: откладывать файл и
+    # поднимать резервную копию нельзя, поэтому и не ValueError.
+    pass
+
+
+def encode_date(value):
+    # "ДД-ММ-ГГГГ" -> ГГГГММДД. Всё, что обратно не восстановится байт в
+    # байт (другой формат, мусор), остаётся строкой.
+    if not isinstance(value, str) or len(value) != 10:
+        return value
+    code = value[6:] + value[3:5] + value[:2]
+    if not code.isdigit() or decode_date(int(code)) != value:
+        return value
+    return int(code)
+
+
+def decode_date(code):
+    if type(code) is not int:
+        return code
+    return f"{code % 100:02d}-{code // 100 % 100:02d}-{code // 10000:04d}"
+
+
+def recode(column: list, function) -> list:
+    # Колонки дат и категорий состоят из немногих значений: функция
+    # считается по разу на значение.
+    mapping = {value: function(value) for value in set(column)}
+    return list(map(mapping.__getitem__, column))
+
+
+def dictionary_encode(column: list) -> dict:
+    # Колонка из немногих значений: разные значения по разу и номера.
+    values = list(dict.fromkeys(column))
+    positions = {value: position for position, value in enumerate(values)}
+    return dict(values=values, codes=list(map(positions.__getitem__, column)))
+
+
+def dictionary_decode(column: dict, function=None) -> list:
+    values = column["values"]
+    if function is not None:
+        values = [function(value) for value in values]
+    return list(map(values.__getitem__, column["codes"]))
+
+
+class BinarySerializer:
+    # Снимок хранилища в колоночном виде: тело — JSON, для каждого поля
+    # схемы — список значений по всем записям. Имена полей не повторяются
+    # в каждой записи, суммы лежат числами, даты — целыми ГГГГММДД, а
+    # колонки дат и интернированных полей — словарём: разные значения по
+    # разу и номера. JSON, в отличие от marshal, не зависит от версии
+    # Python. Записи, не совпадающие со схемой (лишние или недостающие
+    # поля, id не равен ключу, не строка в поле даты или категории),
+    # хранятся как есть в irregular.
+    extension = ".bin"
+
+    def __init__(self, fields: tuple = (), dates: tuple = (), interned: tuple = ()) -> None:
+        # Без поля id запись из колонок не восстановить — тогда все записи
+        # идут в irregular.
+        self.fields = tuple(fields) if "id" in fields else ()
+        self.dates = tuple(field for field in dates if field in self.fields)
+        self.interned = tuple(field for field in interned if field in self.fields)
+        self.field_set = set(self.fields)
+
+    def regular(self, key: str, value: dict) -> bool:
+        if value.keys() != self.field_set or value.get("id") != key:
+            return False
+        # Только строки и None: True и 1 в recode слились бы в одно значение.
+        return all(
+            isinstance(value[field], (str, type(None)))
+            for field in self.dates + self.interned
+        )
+
+    def columns(self, ids: list, rows: list):
+        # Колонки по всем записям или None, если хоть одна не подходит под
+        # схему. Проверки идут целыми колонками через map — это в разы
+        # быстрее, чем regular() для каждой записи.
+        if not all(map(operator.eq, map(dict.keys, rows), repeat(self.field_set))):
+            return None
+        columns = {field: [row[field] for row in rows] for field in self.fields}
+        if not all(map(operator.eq, ids, columns["id"])):
+            return None
+        for field in self.dates + self.interned:
+            if not set(map(type, columns[field])) <= {str, type(None)}:
+                return None
+        return columns
+
+    def dumps(self, data) -> bytes:
+        items = list(data.items())
+        ids = [key for key, value in items]
+        rows = [value for key, value in items]
+        irregular = {}
+        columns = self.columns(ids, rows) if self.fields else None
+        if columns is None:
+            regular = []
+            for key, value in items:
+                if self.fields and self.regular(key, value):
+                    regular.append(value)
+                else:
+                    irregular[key] = value
+            columns = {field: [row[field] for row in regular] for field in self.fields}
+        for field in dict.fromkeys(self.dates + self.interned):
+            columns[field] = dictionary_encode(columns[field])
+            if field in self.dates:
+                columns[field]["values"] = list(
+                    map(encode_date, columns[field]["values"])
+                )
+        # id совпадает с ключом и отдельно не хранится.
+        columns.pop("id", None)
+        body = json.dumps(
+            dict(
+                version=2,
+                fields=list(columns),
+                dates=list(self.dates),
+                ids=ids,
+                columns=list(columns.values()),
+                irregular=irregular,
+            ),
+            ensure_ascii=False,
+        ).encode("utf-8")
+        return HEADER.pack(MAGIC, zlib.crc32(body)) + body
+
+    def items(self, filename: str):
+        # Пары (id, запись) в исходном порядке. Схема читается из самого
+        # файла, так что он не зависит от текущих полей менеджера.
+        with open(filename, "rb") as file:
+            blob = file.read()
+        METRICS.count_bytes(read=len(blob))
+        if len(blob) < HEADER.size:
+            raise ValueError(f"{filename}: пустой или обрезанный файл")
+        magic, checksum = HEADER.unpack_from(blob)
+        body = memoryview(blob)[HEADER.size :]
+        if magic != MAGIC:
+            if magic[:3] == MAGIC[:3]:
+                raise FormatError(f"{filename}: неизвестная версия формата {magic!r}")
+            raise ValueError(f"{filename}: не бинарное хранилище")
+        if zlib.crc32(body) != checksum:
+            raise ValueError(f"{filename}: контрольная сумма не совпадает")
+        try:
+            payload = json.loads(bytes(body))
+        except ValueError as error:
+            raise ValueError(f"{filename}: повреждённые данные ({error})") from None
+        try:
+            fields = payload["fields"]
+            columns = dict(zip(fields, payload["columns"]))
+            ids = payload["ids"]
+            irregular = payload["irregular"]
+            dates = payload.get("dates", ())
+            for field, column in columns.items():
+                if isinstance(column, dict):
+                    columns[field] = dictionary_decode(
+                        column, decode_date if field in dates else None
+                    )
+                elif field in dates:
+                    columns[field] = recode(column, decode_date)
+        except (KeyError, TypeError, IndexError) as error:
+            raise ValueError(f"{filename}: повреждённые данные ({error})") from None
+        names = ("id", *columns)
+        if not irregular:
+            # Записи собираются целиком в map/zip, без цикла на Python.
+            rows = zip(ids, *columns.values())
+            return zip(ids, map(dict, map(zip, repeat(names), rows)))
+        return self.merge(ids, names, columns, irregular)
+
+    @staticmethod
+    def merge(ids: list, names: tuple, columns: dict, irregular: dict):
+        regular = (key for key in ids if key not in irregular)
+        rows = zip(regular, *columns.values())
+        for key in ids:
+            if key in irregular:
+                yield key, irregular[key]
+            else:
+                yield key, dict(zip(names, next(rows)))
+
+    def load(self, filename: str) -> dict:
+        return dict(self.items(filename))
+
+
+SERIALIZERS = dict(binary=BinarySerializer)
+
+
+def detect_format(filename: str) -> str:
+    for name, serializer in SERIALIZERS.items():
+        if filename.endswith(serializer.extension):
+            return name
+    return "json"
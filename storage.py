@@ -0,0 +1,1652 @@
+import atexit
+import json
+import logging
+import mmap
+import os
+import re
+import shutil
+import sys
+import threading
+import uuid
+from collections.abc import MutableMapping
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+from metrics import METRICS
+from serializers import SERIALIZERS, detect_format
+
+DURABILITY_MODES = ("always", "batch", "off")
+
+
+def fsync_directory(directory: str) -> None:
+    # Без этого переименование может не пережить отключение питания.
+    # На Windows каталоги так не открываются — там просто пропускаем.
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def current_umask() -> int:
+    # umask можно узнать, только заменив его: прежний ставится обратно.
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+def atomic_write(filename: str, payload, sync: bool = True) -> None:
+    # Пишем во временный файл рядом с целевым и подменяем его через
+    # os.replace: читатель всегда видит либо старую, либо новую версию.
+    # payload — строка, bytes или итератор кусков bytes (для потоковой
+    # записи).
+    # tempfile тянет за собой random и hashlib, поэтому импортируется
+    # при первой записи, а не при старте.
+    import tempfile
+
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_filename = tempfile.mkstemp(
+        dir=directory, prefix=os.path.basename(filename) + ".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as file:
+            if isinstance(payload, str):
+                file.write(payload.encode())
+            elif isinstance(payload, bytes):
+                file.write(payload)
+            else:
+                file.writelines(payload)
+            METRICS.count_bytes(written=file.tell())
+            file.flush()
+            if sync:
+                os.fsync(file.fileno())
+        if os.path.exists(filename):
+            shutil.copymode(filename, tmp_filename)
+        else:
+            # mkstemp создаёт файл с правами 0600, а новое хранилище должно
+            # получить обычные права с учётом umask, как при open().
+            os.chmod(tmp_filename, 0o666 & ~current_umask())
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+        raise
+    if sync:
+        fsync_directory(directory)
+
+
+def read_json_dict(filename: str) -> dict:
+    with open(filename, "r") as file:
+        METRICS.count_bytes(read=os.fstat(file.fileno()).st_size)
+        data = json.loads(file.read())
+    if not isinstance(data, dict):
+        raise ValueError(f"{filename}: ожидался JSON-объект")
+    return data
+
+
+def replay_journal(filename: str, data: dict, offset: int = 0) -> int:
+    # Применяет записи журнала начиная с offset к data и возвращает их
+    # количество. Оборванная последняя строка (сбой посреди записи)
+    # отрезается, чтобы следующие записи не склеились с ней.
+    applied = 0
+    good_offset = offset
+    with open(filename, "rb+") as file:
+        file.seek(offset)
+        for line in iter(file.readline, b""):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                logging.warning(f"Журнал {filename} оборван, хвост отброшен")
+                file.seek(good_offset)
+                file.truncate()
+                break
+            target, key = change_target(data, entry["id"])
+            if entry["op"] == "put":
+                target[key] = entry["value"]
+            elif entry["op"] == "delete":
+                target.pop(key, None)
+            good_offset = file.tell()
+            applied += 1
+    METRICS.count_bytes(read=good_offset - offset)
+    return applied
+
+
+def apply_changes(data: dict, changes: list) -> None:
+    for op, key, value in changes:
+        target, key = change_target(data, key)
+        if op == "put":
+            target[key] = value
+        else:
+            target.pop(key, None)
+
+
+def change_target(data: dict, key):
+    # Изменения разделов общего файла (SectionStorage) адресуются парой
+    # (раздел, id), в журнале — списком из двух элементов.
+    if isinstance(key, (list, tuple)):
+        section, key = key
+        return data.setdefault(section, {}), key
+    return data, key
+
+
+def file_signature(filename: str):
+    # Атомарная запись меняет inode, дозапись — размер и mtime.
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+# Строка JSON целиком либо одна из скобок: запятые, двоеточия и числа
+# для разметки верхнего уровня не нужны.
+JSON_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}\[\]]')
+
+
+def index_json_object(filename: str) -> dict:
+    # Разметка файла вида {"id": {...}, ...} без разбора самих записей:
+    # id -> (смещение, длина) значения. Читается через mmap, поэтому
+    # пиковая память не зависит от размера файла.
+    index = {}
+    with open(filename, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            raise ValueError(f"{filename}: пустой файл")
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            METRICS.count_bytes(read=len(buffer))
+            depth = 0
+            key = start = None
+            for match in JSON_TOKEN.finditer(buffer):
+                token = match.group()
+                if token[0] == ord('"'):
+                    if depth == 1:
+                        if key is not None:
+                            raise ValueError(f"{filename}: значения должны быть объектами")
+                        key = json.loads(token)
+                    continue
+                if token in (b"{", b"["):
+                    if depth == 0 and token == b"[":
+                        raise ValueError(f"{filename}: ожидался JSON-объект")
+                    if depth == 1:
+                        if key is None:
+                            raise ValueError(f"{filename}: значение без ключа")
+                        start = match.start()
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth == 1:
+                    index[key] = (start, match.end() - start)
+                    key = None
+                elif depth == 0:
+                    if key is not None or buffer[match.end() :].strip():
+                        raise ValueError(f"{filename}: повреждённый JSON")
+                    return index
+                elif depth < 0:
+                    break
+    raise ValueError(f"{filename}: повреждённый JSON")
+
+
+class LazyJsonTable(MutableMapping):
+    # Словарь поверх JSON-снимка, из которого записи читаются по
+    # индексу только при обращении. Изменения до следующей записи снимка
+    # живут в overlay/deleted, неизменённые записи при сохранении
+    # копируются из старого файла байт в байт, без разбора.
+    def __init__(self, filename: str, index: dict) -> None:
+        self.filename = filename
+        self.index = index
+        self.overlay = {}
+        self.deleted = set()
+        self.file = open(filename, "rb")
+
+    @staticmethod
+    def index_filename(filename: str) -> str:
+        return filename + ".idx"
+
+    @classmethod
+    def open(cls, filename: str) -> "LazyJsonTable":
+        stat = os.stat(filename)
+        try:
+            with open(cls.index_filename(filename), "r") as file:
+                cached = json.loads(file.read())
+            if (cached["size"], cached["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns):
+                raise ValueError("устаревший индекс")
+            index = {key: tuple(span) for key, span in cached["index"].items()}
+            logging.info(f"Индекс {cls.index_filename(filename)} загружен из кэша")
+        except (OSError, ValueError, KeyError):
+            index = index_json_object(filename)
+            cls.save_index(filename, index)
+            logging.info(f"Построен индекс {cls.index_filename(filename)}")
+        return cls(filename, index)
+
+    @classmethod
+    def save_index(cls, filename: str, index: dict) -> None:
+        stat = os.stat(filename)
+        cached = dict(size=stat.st_size, mtime_ns=stat.st_mtime_ns, index=index)
+        try:
+            atomic_write(cls.index_filename(filename), json.dumps(cached), sync=False)
+        except OSError:
+            logging.warning(f"Не удалось сохранить индекс для {filename}")
+
+    def read_raw(self, key: str) -> bytes:
+        offset, length = self.index[key]
+        METRICS.count_bytes(read=length)
+        if hasattr(os, "pread"):
+            # pread не двигает общую позицию файла — читать можно из
+            # нескольких потоков сразу.
+            return os.pread(self.file.fileno(), length, offset)
+        self.file.seek(offset)
+        return self.file.read(length)
+
+    def __getitem__(self, key: str) -> dict:
+        if key in self.overlay:
+            return self.overlay[key]
+        if key in self.deleted or key not in self.index:
+            raise KeyError(key)
+        return json.loads(self.read_raw(key))
+
+    def __setitem__(self, key: str, value: dict) -> None:
+        self.deleted.discard(key)
+        self.overlay[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self.overlay.pop(key, None)
+        if key in self.index:
+            self.deleted.add(key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.overlay or (key in self.index and key not in self.deleted)
+
+    def __iter__(self):
+        for key in self.index:
+            if key not in self.deleted:
+                yield key
+        for key in self.overlay:
+            if key not in self.index:
+                yield key
+
+    def __len__(self) -> int:
+        added = sum(1 for key in self.overlay if key not in self.index)
+        return len(self.index) - len(self.deleted) + added
+
+    def values(self):
+        for key, value in self.items():
+            yield value
+
+    def items(self):
+        for key in self:
+            yield key, self[key]
+
+    def clear(self) -> None:
+        self.overlay = {}
+        self.deleted = set(self.index)
+
+    def copy(self) -> "LazyJsonTable":
+        table = LazyJsonTable.__new__(LazyJsonTable)
+        table.filename = self.filename
+        table.index = self.index
+        table.overlay = dict(self.overlay)
+        table.deleted = set(self.deleted)
+        table.file = self.file
+        return table
+
+    def reset(self, index: dict) -> None:
+        # Вызывается после записи нового снимка: старый файл уже подменён,
+        # открываем новый и забываем накопленные изменения.
+        self.file = open(self.filename, "rb")
+        self.index = index
+        self.overlay = {}
+        self.deleted = set()
+
+
+class CompactTable(MutableMapping):
+    # Словарь id -> запись, где каждая запись хранится кортежем значений
+    # в порядке fields, а не отдельным dict: имена полей не повторяются,
+    # поле id не дублирует ключ, повторяющиеся строки (категории, даты)
+    # интернируются, а ключи-UUID лежат 16 байтами вместо 36 символов.
+    # Наружу по-прежнему отдаются обычные dict.
+    MISSING = object()
+    SAME_AS_KEY = object()
+
+    def __init__(self, fields: tuple, interned: tuple = ()) -> None:
+        self.fields = tuple(fields)
+        self.interned = [field in interned for field in self.fields]
+        self.known = set(self.fields)
+        self.rows = {}
+
+    @staticmethod
+    def pack_key(key):
+        try:
+            packed = uuid.UUID(key)
+        except (AttributeError, TypeError, ValueError):
+            return key
+        return packed.bytes if str(packed) == key else key
+
+    @staticmethod
+    def unpack_key(key):
+        return str(uuid.UUID(bytes=key)) if isinstance(key, bytes) else key
+
+    def pack(self, key: str, value: dict) -> tuple:
+        row = []
+        for field, interned in zip(self.fields, self.interned):
+            item = value.get(field, self.MISSING)
+            if field == "id" and item == key:
+                item = self.SAME_AS_KEY
+            elif interned and isinstance(item, str):
+                item = sys.intern(item)
+            row.append(item)
+        # Поля вне схемы (например, лишние колонки из CSV) не теряем.
+        extra = {field: item for field, item in value.items() if field not in self.known}
+        row.append(extra or None)
+        return tuple(row)
+
+    def unpack(self, key: str, row: tuple) -> dict:
+        value = {}
+        for field, item in zip(self.fields, row):
+            if item is self.SAME_AS_KEY:
+                value[field] = key
+            elif item is not self.MISSING:
+                value[field] = item
+        if row[-1]:
+            value.update(row[-1])
+        return value
+
+    def __getitem__(self, key: str) -> dict:
+        return self.unpack(key, self.rows[self.pack_key(key)])
+
+    def __setitem__(self, key: str, value: dict) -> None:
+        self.rows[self.pack_key(key)] = self.pack(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        del self.rows[self.pack_key(key)]
+
+    def __contains__(self, key: object) -> bool:
+        return self.pack_key(key) in self.rows
+
+    def __iter__(self):
+        for key in self.rows:
+            yield self.unpack_key(key)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def values(self):
+        for key, value in self.items():
+            yield value
+
+    def items(self):
+        for packed, row in self.rows.items():
+            key = self.unpack_key(packed)
+            yield key, self.unpack(key, row)
+
+    def clear(self) -> None:
+        self.rows = {}
+
+    def copy(self) -> "CompactTable":
+        table = CompactTable.__new__(CompactTable)
+        table.__dict__.update(self.__dict__)
+        table.rows = dict(self.rows)
+        return table
+
+    def load(self, filename: str) -> "CompactTable":
+        # Разбираем по одной записи через разметку файла, чтобы не держать
+        # в памяти одновременно полный dict и его компактную копию.
+        index = index_json_object(filename)
+        with open(filename, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                for key, (offset, length) in index.items():
+                    self[key] = json.loads(buffer[offset : offset + length])
+        return self
+
+
+def dump_json_object(data, index: dict):
+    # Потоковая запись {"id": {...}, ...} кусками bytes; по ходу в index
+    # попадают смещения значений в новом файле.
+    offset = 1
+    yield b"{"
+    for number, key in enumerate(data):
+        if isinstance(data, LazyJsonTable) and key not in data.overlay:
+            value = data.read_raw(key)
+        else:
+            value = json.dumps(data[key]).encode()
+        head = (", " if number else "").encode() + json.dumps(key).encode() + b": "
+        index[key] = (offset + len(head), len(value))
+        offset += len(head) + len(value)
+        yield head
+        yield value
+    yield b"}"
+
+
+class RWLock:
+    # Блокировка читатель-писатель. Запись — как RLock: повторно входима и
+    # годится для threading.Condition. Чтения идут параллельно, повторно
+    # входимы внутри потока, а поток-писатель читает без ожидания. Ждущий
+    # писатель не пускает новых читателей, иначе под непрерывными
+    # чтениями он не дождётся своей очереди.
+    def __init__(self) -> None:
+        self.condition = threading.Condition(threading.Lock())
+        self.writer = None
+        self.depth = 0
+        self.readers = 0
+        self.waiting_writers = 0
+        self.local = threading.local()
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        me = threading.get_ident()
+        with self.condition:
+            if self.writer == me:
+                self.depth += 1
+                return True
+            if getattr(self.local, "reads", 0):
+                raise RuntimeError("Запись под блокировкой чтения приведёт к взаимоблокировке")
+            self.waiting_writers += 1
+            try:
+                self.condition.wait_for(
+                    lambda: self.writer is None and not self.readers
+                )
+            finally:
+                self.waiting_writers -= 1
+            self.writer = me
+            self.depth = 1
+        return True
+
+    def release(self) -> None:
+        with self.condition:
+            if self.writer != threading.get_ident():
+                raise RuntimeError("Блокировка записи принадлежит другому потоку")
+            self.depth -= 1
+            if not self.depth:
+                self.writer = None
+                self.condition.notify_all()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+    # Протокол, которым threading.Condition отпускает и возвращает
+    # повторно входимую блокировку на время wait().
+    def _is_owned(self) -> bool:
+        return self.writer == threading.get_ident()
+
+    def _release_save(self) -> int:
+        with self.condition:
+            depth, self.depth, self.writer = self.depth, 0, None
+            self.condition.notify_all()
+        return depth
+
+    def _acquire_restore(self, depth: int) -> None:
+        self.acquire()
+        self.depth = depth
+
+    @contextmanager
+    def reading(self):
+        if self.writer == threading.get_ident():
+            yield
+            return
+        reads = getattr(self.local, "reads", 0)
+        with self.condition:
+            if not reads:
+                self.condition.wait_for(
+                    lambda: self.writer is None and not self.waiting_writers
+                )
+            self.readers += 1
+        self.local.reads = reads + 1
+        try:
+            yield
+        finally:
+            self.local.reads -= 1
+            with self.condition:
+                self.readers -= 1
+                if not self.readers:
+                    self.condition.notify_all()
+
+
+class JsonStorage:
+    # durability: "always" — fsync после каждой записи, "batch" — раз в
+    # sync_every записей, "off" — без fsync (файл всё равно подменяется
+    # атомарно, но последние записи могут не пережить отключение питания).
+    # backups — сколько предыдущих снимков хранить как <filename>.1, .2, ...
+    # shared — файл делят несколько процессов: записи идут под flock на
+    # <filename>.lock, а перед операциями сверяется подпись файлов.
+    # write_behind — отложенная запись: изменения копятся в памяти, а
+    # фоновый поток пишет их через write_behind секунд после первого
+    # изменения или сразу, как их наберётся flush_every.
+    # thread_safe — менеджером пользуются несколько потоков: чтения идут
+    # параллельно под RWLock, а запись на диск — с копии данных, уже
+    # после того, как изменение отпустило блокировку.
+    # format — формат снимка: "json" или один из serializers.SERIALIZERS;
+    # по умолчанию определяется по расширению файла. dates — поля с
+    # датами "ДД-ММ-ГГГГ", которые бинарный формат хранит целыми.
+    def __init__(
+        self,
+        filename: str,
+        durability: str = "always",
+        backups: int = 0,
+        sync_every: int = 100,
+        lazy: bool = False,
+        compact: bool = False,
+        fields: tuple = (),
+        interned: tuple = (),
+        shared: bool = False,
+        write_behind: float = None,
+        flush_every: int = 1000,
+        thread_safe: bool = False,
+        format: str = None,
+        dates: tuple = (),
+    ) -> None:
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Неизвестный режим durability: {durability}")
+        format = format or detect_format(filename)
+        if format != "json" and format not in SERIALIZERS:
+            raise ValueError(f"Неизвестный формат хранилища: {format}")
+        # JSON-снимки пишутся и читаются здесь же, остальные форматы —
+        # через сериализатор.
+        self.serializer = None
+        if format != "json":
+            self.serializer = SERIALIZERS[format](fields, dates, interned)
+        if self.serializer is not None and lazy:
+            # Ленивая таблица читает записи по смещениям в JSON-снимке.
+            raise ValueError("Ленивая загрузка поддерживается только для JSON")
+        if shared and os.name != "posix":
+            raise ValueError("Общий доступ к файлу поддерживается только на POSIX")
+        if (write_behind is not None or thread_safe) and shared:
+            # Чужие изменения нельзя влить в ещё не записанные свои.
+            raise ValueError("Отложенная запись несовместима с shared")
+        if write_behind is not None and lazy:
+            # Ленивая таблица читает из файла, который подменяет запись.
+            raise ValueError("Отложенная запись несовместима с lazy")
+        self.filename = filename
+        self.journal_filename = filename + ".journal"
+        self.durability = durability
+        self.backups = backups
+        self.sync_every = sync_every
+        self.unsynced_writes = 0
+        self.lazy = lazy
+        self.compact = compact and not lazy
+        self.fields = fields
+        self.interned = interned
+        self.batch_depth = 0
+        self.pending = []
+        self.pending_save = False
+        self.shared = shared
+        self.lock_file = None
+        self.lock_depth = 0
+        self.known = None
+        # mutex защищает данные от фонового потока записи: изменения и
+        # пакеты идут под ним, а поток снимает под ним копию данных.
+        self.thread_safe = thread_safe
+        self.mutex = RWLock() if thread_safe else threading.RLock()
+        self.write_behind = write_behind
+        self.flush_every = flush_every
+        # deferring включают и асинхронные менеджеры: они копят изменения
+        # так же, но пишут их сами, без фонового потока.
+        self.deferring = write_behind is not None or thread_safe
+        self.deferred = []
+        self.deferred_save = False
+        self.deferred_data = None
+        self.flush_lock = threading.Lock()
+        self.flushes = 0
+        # Поколения отложенных изменений: последнее и записанное.
+        self.generation = 0
+        self.written = 0
+        # Число записанных снимков: по нему менеджер видит, что снимок
+        # переписан, и сохраняет итоги вместе с ним.
+        self.snapshots = 0
+        self.wakeup = threading.Condition(self.mutex)
+        self.flusher = None
+        self.closing = False
+
+    def locked(self):
+        if not self.shared:
+            return self.mutex
+        return self.exclusive()
+
+    def reading(self):
+        if not self.thread_safe:
+            return nullcontext()
+        return self.mutex.reading()
+
+    def iter_values(self, data: dict, chunk: int = 1000):
+        # В режиме thread_safe обход не держит блокировку между
+        # элементами: ключи снимаются разом, значения читаются порциями,
+        # а удалённые за это время записи пропускаются.
+        if not self.thread_safe:
+            yield from data.values()
+            return
+        with self.reading():
+            keys = list(data)
+        for start in range(0, len(keys), chunk):
+            with self.reading():
+                values = [data.get(key) for key in keys[start : start + chunk]]
+            for value in values:
+                if value is not None:
+                    yield value
+
+    def write_through(self) -> None:
+        # В режиме thread_safe изменение только откладывается под
+        # блокировкой, а пишет его сам поток после неё.
+        if self.thread_safe and self.write_behind is None:
+            self.flush()
+
+    @contextmanager
+    def exclusive(self):
+        # Блокировка повторно входимая: пакет держит её целиком, а
+        # вложенные commit и load её не переспрашивают.
+        import fcntl
+
+        with self.mutex:
+            if not self.lock_depth:
+                if self.lock_file is None:
+                    self.lock_file = open(self.filename + ".lock", "a")
+                fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+            self.lock_depth += 1
+            try:
+                yield
+            finally:
+                self.lock_depth -= 1
+                if not self.lock_depth:
+                    fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+
+    def signature(self) -> tuple:
+        return file_signature(self.filename), file_signature(self.journal_filename)
+
+    def remember(self) -> None:
+        if self.shared:
+            self.known = self.signature()
+
+    def refresh(self, data: dict):
+        # Перечитанные данные, если файл с нашего последнего чтения или
+        # записи изменил другой процесс, иначе None. Внутри пакета
+        # блокировка уже наша, и проверять нечего.
+        if not self.shared or self.batch_depth or self.signature() == self.known:
+            return None
+        with self.locked():
+            return self.reload(data)
+
+    def reload(self, data: dict) -> dict:
+        logging.info(f"Файл {self.filename} изменён другим процессом, перечитываем")
+        return self.load()
+
+    def load_snapshot(self) -> dict:
+        if not os.path.isfile(self.filename):
+            logging.warning(f"Файл {self.filename} не найден")
+            atomic_write(self.filename, self.encode({}), self.should_sync())
+            logging.info(f"Файл {self.filename} создан")
+            # Перечитывать только что записанный пустой файл незачем;
+            # ленивой таблице он всё же нужен открытым.
+            if self.lazy:
+                return self.read_snapshot(self.filename)
+            if self.compact:
+                return CompactTable(self.fields, self.interned)
+            return {}
+
+        try:
+            data = self.read_snapshot(self.filename)
+            logging.info(f"Файл {self.filename} найден и является валидным JSON")
+            return data
+        except (OSError, ValueError):
+            logging.warning(f"Файл {self.filename} поврежден")
+
+        # Повреждённый файл не затираем, а откладываем в сторону и
+        # поднимаем последнюю читаемую резервную копию.
+        corrupt_filename = (
+            f"{self.filename}.corrupt-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        )
+        os.replace(self.filename, corrupt_filename)
+        logging.warning(f"Повреждённый файл сохранён как {corrupt_filename}")
+        data = {}
+        for backup_filename in self.backup_filenames():
+            try:
+                data = self.read_plain(backup_filename)
+            except (OSError, ValueError):
+                logging.warning(f"Резервная копия {backup_filename} тоже повреждена")
+                continue
+            logging.warning(f"Данные восстановлены из {backup_filename}")
+            break
+        atomic_write(self.filename, self.encode(data), self.should_sync())
+        if self.lazy or self.compact:
+            return self.read_snapshot(self.filename)
+        return data
+
+    def read_snapshot(self, filename: str) -> dict:
+        if self.lazy:
+            return LazyJsonTable.open(filename)
+        if self.compact and self.serializer is not None:
+            table = CompactTable(self.fields, self.interned)
+            table.update(self.serializer.items(filename))
+            return table
+        if self.compact:
+            return CompactTable(self.fields, self.interned).load(filename)
+        return self.read_plain(filename)
+
+    def read_plain(self, filename: str) -> dict:
+        if self.serializer is not None:
+            return self.serializer.load(filename)
+        return read_json_dict(filename)
+
+    def encode(self, data: dict):
+        if self.serializer is not None:
+            return self.serializer.dumps(data)
+        return json.dumps(data)
+
+    def backup_filenames(self) -> list[str]:
+        filenames = []
+        number = 1
+        while os.path.isfile(f"{self.filename}.{number}"):
+            filenames.append(f"{self.filename}.{number}")
+            number += 1
+        return filenames
+
+    def rotate_backups(self) -> None:
+        if not self.backups or not os.path.isfile(self.filename):
+            return
+        for number in range(self.backups - 1, 0, -1):
+            if os.path.isfile(f"{self.filename}.{number}"):
+                os.replace(f"{self.filename}.{number}", f"{self.filename}.{number + 1}")
+        backup_filename = f"{self.filename}.1"
+        if os.path.exists(backup_filename):
+            os.remove(backup_filename)
+        try:
+            # Жёсткая ссылка бесплатна: os.replace ниже лишь отвяжет имя
+            # от старого содержимого, а копия останется под .1.
+            os.link(self.filename, backup_filename)
+        except OSError:
+            shutil.copy2(self.filename, backup_filename)
+
+    def should_sync(self) -> bool:
+        if self.durability == "always":
+            return True
+        if self.durability == "off":
+            return False
+        self.unsynced_writes += 1
+        if self.unsynced_writes >= self.sync_every:
+            self.unsynced_writes = 0
+            return True
+        return False
+
+    def load(self) -> dict:
+        with self.locked():
+            data = self.load_snapshot()
+            if os.path.isfile(self.journal_filename):
+                # Хранилище раньше открывали в режиме журнала: вливаем
+                # накопленные изменения в снимок, чтобы они не потерялись.
+                if replay_journal(self.journal_filename, data):
+                    self.save(data)
+                os.remove(self.journal_filename)
+            self.remember()
+        return data
+
+    def save(self, data: dict) -> None:
+        if self.batch_depth:
+            self.pending_save = True
+            return
+        if self.deferring:
+            self.defer(data, [], save=True)
+            return
+        with self.locked():
+            self.write_snapshot(data)
+            self.remember()
+
+    def write_snapshot(self, data: dict) -> None:
+        self.snapshots += 1
+        if self.serializer is not None or (isinstance(data, dict) and not self.lazy):
+            payload = self.encode(data)
+            self.rotate_backups()
+            atomic_write(self.filename, payload, self.should_sync())
+            return
+        index = {}
+        self.rotate_backups()
+        atomic_write(self.filename, dump_json_object(data, index), self.should_sync())
+        if self.lazy:
+            LazyJsonTable.save_index(self.filename, index)
+        if isinstance(data, LazyJsonTable):
+            data.reset(index)
+
+    def commit(self, data: dict, changes: list):
+        # Возвращает новые данные, если перед записью пришлось перечитать
+        # файл после другого процесса (наши изменения в них уже внесены).
+        if self.batch_depth:
+            self.pending.extend(changes)
+            return None
+        if self.deferring:
+            self.defer(data, changes)
+            return None
+        with self.locked():
+            fresh = self.refresh(data)
+            if fresh is not None:
+                apply_changes(fresh, changes)
+                data = fresh
+            self.write(data, changes)
+            self.remember()
+        return fresh
+
+    def write(self, data: dict, changes: list) -> None:
+        self.write_snapshot(data)
+
+    def defer(self, data: dict, changes: list, save: bool = False) -> None:
+        with self.mutex:
+            self.deferred.extend(changes)
+            self.deferred_save = self.deferred_save or save
+            self.deferred_data = data
+            self.generation += 1
+            if self.flusher is None and self.write_behind is not None:
+                self.flusher = threading.Thread(
+                    target=self.run_flusher, name=f"flush {self.filename}", daemon=True
+                )
+                self.flusher.start()
+                atexit.register(self.close)
+            self.wakeup.notify()
+
+    def dirty(self) -> bool:
+        return bool(self.deferred) or self.deferred_save
+
+    def run_flusher(self) -> None:
+        while True:
+            with self.mutex:
+                self.wakeup.wait_for(lambda: self.dirty() or self.closing)
+                # Ждём задержку от первого изменения, а не от последнего:
+                # при непрерывном потоке изменений запись не откладывается
+                # бесконечно.
+                self.wakeup.wait_for(
+                    lambda: len(self.deferred) >= self.flush_every or self.closing,
+                    timeout=self.write_behind,
+                )
+                if self.closing:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                logging.exception(f"Отложенная запись {self.filename} не удалась")
+                with self.mutex:
+                    self.wakeup.wait_for(lambda: self.closing, timeout=self.write_behind)
+
+    def flush(self) -> None:
+        # Записывает отложенные изменения. Под mutex только снимается
+        # копия данных; ожидание очереди записи (flush_lock), сериализация
+        # и запись идут без него, так что чтения и изменения не ждут
+        # диска. Поколение generation растёт с каждым отложенным
+        # изменением: кто дождался flush_lock, а его поколение уже записал
+        # другой поток, выходит сразу — подряд идущие изменения
+        # сливаются в одну запись и одну копию. Незакрытый пакет не
+        # пишется — его изменения попадут в отложенные в end().
+        if self.mutex._is_owned():
+            # Вызов изнутри изменения: его запишет внешний write_through
+            # (или фоновый поток) — под mutex очереди записи не ждём.
+            return
+        with self.mutex:
+            if self.batch_depth:
+                return
+            wanted = self.generation
+        with self.flush_lock:
+            if self.written >= wanted:
+                return
+            with self.mutex:
+                if self.batch_depth:
+                    return
+                changes, self.deferred = self.deferred, []
+                save, self.deferred_save = self.deferred_save, False
+                generation = self.generation
+                self.flushes += 1
+                flushes = self.flushes
+                data = None
+                if save or self.snapshot_due(len(changes)):
+                    data = self.deferred_data.copy()
+            try:
+                if save:
+                    self.write_snapshot(data)
+                else:
+                    self.write(data, changes)
+            except BaseException:
+                with self.mutex:
+                    self.deferred[:0] = changes
+                    self.deferred_save = self.deferred_save or save
+                raise
+            self.written = generation
+        if isinstance(data, LazyJsonTable):
+            # Записана копия ленивой таблицы; сама таблица переходит на
+            # новый файл, если с тех пор её не меняли и файл не подменила
+            # следующая запись (иначе — в следующий раз).
+            with self.mutex:
+                if (
+                    not self.dirty()
+                    and self.flushes == flushes
+                    and isinstance(self.deferred_data, LazyJsonTable)
+                ):
+                    self.deferred_data.reset(data.index)
+
+    def snapshot_due(self, count: int) -> bool:
+        return True
+
+    # Итоги менеджера (indexes.Summaries) лежат рядом в <filename>.sum
+    # вместе с подписью файлов хранилища и годятся, только пока подпись
+    # совпадает. Менеджер пишет их вместе со снимком и при flush, а не
+    # при каждом изменении: дописанный журнал делает файл итогов
+    # устаревшим, и при открытии они пересчитаются. Пока идёт пакет или
+    # есть незаписанные отложенные изменения, файл отстаёт от памяти —
+    # тогда итоги не пишутся; после flush — пишутся в любом режиме.
+    def unflushed(self) -> bool:
+        # generation растёт с каждым отложенным изменением, а written
+        # догоняет его только после записи: запись, которая ещё идёт,
+        # тоже считается незаконченной.
+        return bool(self.batch_depth) or self.written < self.generation
+
+    def save_summaries(self, summaries: dict, suffix: str = ".sum") -> None:
+        if self.unflushed():
+            return
+        payload = dict(signature=self.signature(), summaries=summaries)
+        try:
+            atomic_write(self.filename + suffix, json.dumps(payload), sync=False)
+        except OSError:
+            logging.warning(f"Не удалось сохранить итоги для {self.filename}")
+
+    def load_summaries(self, suffix: str = ".sum"):
+        if self.unflushed():
+            return None
+        try:
+            with open(self.filename + suffix, encoding="utf-8") as file:
+                payload = json.load(file)
+            signature = json.loads(json.dumps(self.signature()))
+            if payload["signature"] != signature:
+                return None
+            return payload["summaries"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def close(self) -> None:
+        if self.flusher is None:
+            return
+        with self.mutex:
+            self.closing = True
+            self.wakeup.notify()
+        self.flusher.join()
+        self.flusher = None
+        self.closing = False
+        atexit.unregister(self.close)
+        self.flush()
+
+    def replace(self, data: dict) -> dict:
+        if self.compact:
+            table = CompactTable(self.fields, self.interned)
+            table.update(data)
+            data = table
+        self.save(data)
+        if self.lazy and not self.batch_depth:
+            return LazyJsonTable.open(self.filename)
+        return data
+
+    # Пакетная запись: пока открыт хотя бы один begin(), изменения только
+    # копятся, а на диск уходят одним write (или одним снимком) в end().
+    def begin(self, data: dict) -> tuple:
+        self.batch_depth += 1
+        return len(self.pending), self.pending_save, data.copy()
+
+    def end(self, data: dict) -> None:
+        self.batch_depth -= 1
+        if self.batch_depth:
+            return
+        changes, self.pending = self.pending, []
+        pending_save, self.pending_save = self.pending_save, False
+        if pending_save:
+            self.save(data)
+        elif changes and self.deferring:
+            self.defer(data, changes)
+        elif changes:
+            self.write(data, changes)
+            self.remember()
+
+    def rollback(self, mark: tuple) -> dict:
+        self.batch_depth -= 1
+        del self.pending[mark[0] :]
+        self.pending_save = mark[1]
+        return mark[2]
+
+
+class JournalStorage(JsonStorage):
+    # Снимок в прежнем JSON-формате плюс журнал изменений рядом с ним:
+    # каждое изменение дописывается одной строкой, а после compact_every
+    # записей снимок перезаписывается целиком и журнал очищается.
+
+    def __init__(self, filename: str, compact_every: int = 1000, **options) -> None:
+        super().__init__(filename, **options)
+        self.compact_every = compact_every
+        self.journal_size = 0
+
+    def load(self) -> dict:
+        with self.locked():
+            data = self.load_snapshot()
+            self.journal_size = 0
+            if os.path.isfile(self.journal_filename):
+                self.journal_size = replay_journal(self.journal_filename, data)
+                logging.info(
+                    f"Из журнала {self.journal_filename} применено {self.journal_size} изменений"
+                )
+            self.remember()
+        return data
+
+    def reload(self, data: dict) -> dict:
+        # Если снимок прежний, а журнал только дописан, достаточно
+        # применить его новый хвост к уже загруженным данным.
+        snapshot, journal = self.signature()
+        known_snapshot, known_journal = self.known
+        if (
+            snapshot == known_snapshot
+            and journal is not None
+            and known_journal is not None
+            and journal[0] == known_journal[0]
+            and journal[1] >= known_journal[1]
+        ):
+            applied = replay_journal(self.journal_filename, data, known_journal[1])
+            self.journal_size += applied
+            self.remember()
+            logging.info(
+                f"Из журнала {self.journal_filename} применено {applied} новых изменений"
+            )
+            return data
+        return super().reload(data)
+
+    def write_snapshot(self, data: dict) -> None:
+        super().write_snapshot(data)
+        # Если упасть между записью снимка и очисткой журнала, журнал
+        # применится повторно — put и delete идемпотентны, это безопасно.
+        atomic_write(self.journal_filename, "", self.should_sync())
+        self.journal_size = 0
+
+    def write(self, data: dict, changes: list) -> None:
+        # json.dumps по умолчанию пишет только ASCII: символов столько же,
+        # сколько байт.
+        payload = "".join(
+            json.dumps(
+                dict(op=op, id=key, value=value) if op == "put" else dict(op=op, id=key)
+            )
+            + "\n"
+            for op, key, value in changes
+        )
+        with open(self.journal_filename, "a") as file:
+            file.write(payload)
+            METRICS.count_bytes(written=len(payload))
+            file.flush()
+            if self.should_sync():
+                os.fsync(file.fileno())
+        self.journal_size += len(changes)
+        if self.journal_size >= self.compact_every:
+            self.compact_journal(data)
+
+    def snapshot_due(self, count: int) -> bool:
+        # Для дозаписи в журнал копия данных не нужна — только для
+        # свёртки, которая случится на этой записи.
+        return self.journal_size + count >= self.compact_every
+
+    def compact_journal(self, data: dict) -> None:
+        self.write_snapshot(data)
+        logging.info(f"Журнал {self.journal_filename} свёрнут в снимок")
+
+
+class SqliteTable(MutableMapping):
+    # Словарь id -> запись поверх таблицы SQLite: менеджеры работают с ним
+    # так же, как с обычным dict, но в памяти ничего не держится.
+    # Помимо JSON самой записи в таблице лежат вычисляемые колонки из
+    # columns — по ним строятся индексы и фильтры в select/sum.
+    def __init__(self, connection, table: str, columns: dict):
+        self.connection = connection
+        self.table = table
+        self.columns = columns
+        names = ", ".join(["id", "data", *columns])
+        placeholders = ", ".join("?" * (len(columns) + 2))
+        self.insert_sql = f"INSERT OR REPLACE INTO {table} ({names}) VALUES ({placeholders})"
+
+    def row(self, key: str, value: dict) -> tuple:
+        return (
+            key,
+            json.dumps(value),
+            *(column(value) for column in self.columns.values()),
+        )
+
+    def __getitem__(self, key: str) -> dict:
+        row = self.connection.execute(
+            f"SELECT data FROM {self.table} WHERE id = ?", (key,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return json.loads(row[0])
+
+    def __setitem__(self, key: str, value: dict) -> None:
+        self.connection.execute(self.insert_sql, self.row(key, value))
+
+    def __delitem__(self, key: str) -> None:
+        cursor = self.connection.execute(
+            f"DELETE FROM {self.table} WHERE id = ?", (key,)
+        )
+        if not cursor.rowcount:
+            raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return (
+            self.connection.execute(
+                f"SELECT 1 FROM {self.table} WHERE id = ?", (key,)
+            ).fetchone()
+            is not None
+        )
+
+    def __iter__(self):
+        for (key,) in self.connection.execute(f"SELECT id FROM {self.table}"):
+            yield key
+
+    def __len__(self) -> int:
+        return self.connection.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def values(self):
+        return self.select()
+
+    def items(self):
+        for key, data in self.connection.execute(f"SELECT id, data FROM {self.table}"):
+            yield key, json.loads(data)
+
+    def clear(self) -> None:
+        self.connection.execute(f"DELETE FROM {self.table}")
+
+    def update(self, other=(), **kwargs) -> None:
+        items = other.items() if hasattr(other, "items") else other
+        self.connection.executemany(
+            self.insert_sql, (self.row(key, value) for key, value in items)
+        )
+        if kwargs:
+            self.update(kwargs)
+
+    def select(self, where: str = "", params: tuple = ()):
+        sql = f"SELECT data FROM {self.table}"
+        if where:
+            sql += f" WHERE {where}"
+        for (data,) in self.connection.execute(sql, params):
+            yield json.loads(data)
+
+    def sum(self, column: str, where: str = "", params: tuple = (), group_by: str = None):
+        sql = f"SELECT {group_by + ', ' if group_by else ''}TOTAL({column}) FROM {self.table}"
+        if where:
+            sql += f" WHERE {where}"
+        if group_by:
+            return dict(self.connection.execute(sql + f" GROUP BY {group_by}", params))
+        return self.connection.execute(sql, params).fetchone()[0]
+
+
+SQLITE_SYNCHRONOUS = dict(always="FULL", batch="NORMAL", off="OFF")
+
+
+def connect_sqlite(filename: str, durability: str = "always"):
+    # sqlite3 нужен только этому бэкенду — не тянем его при старте.
+    import sqlite3
+
+    # isolation_level=None: вне пакета каждая операция фиксируется сразу,
+    # а пакеты оформляются точками сохранения (SAVEPOINT) вручную.
+    # check_same_thread=False: асинхронные менеджеры открывают базу в
+    # executor, а работают с ней из потока цикла событий; доступ к
+    # соединению они упорядочивают сами.
+    connection = sqlite3.connect(
+        filename, isolation_level=None, check_same_thread=False
+    )
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS[durability]}")
+    return connection
+
+
+class SqliteStorage:
+    # Параметры, которые open_storage передаёт сюда из опций менеджера.
+    OPTIONS = ("durability", "shared", "write_behind", "flush_every", "thread_safe")
+    # Снимков база не пишет: итоги в ней ведут триггеры.
+    snapshots = 0
+
+    def __init__(
+        self,
+        filename: str,
+        table: str,
+        columns: dict = None,
+        durability: str = "always",
+        shared: bool = False,
+        write_behind: float = None,
+        flush_every: int = 1000,
+        thread_safe: bool = False,
+        connection=None,
+        mutex: RWLock = None,
+        summaries: dict = None,
+    ) -> None:
+        # connection и mutex передаёт SqliteWorkspace: таблицы всех
+        # менеджеров тогда живут в одной базе за одним соединением.
+        # summaries — итоги по группам: имя -> (выражение группы, {имя
+        # суммы: выражение}), в выражениях {row} — строка таблицы. Итоги
+        # лежат в таблицах <table>_<имя> и обновляются триггерами в той
+        # же транзакции, что и сами записи.
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Неизвестный режим durability: {durability}")
+        if write_behind is not None:
+            # Каждое изменение SQLite и так фиксирует дёшево: WAL без fsync
+            # на каждую транзакцию даёт durability="batch".
+            raise ValueError(
+                "Отложенная запись для SQLite не нужна, используйте durability='batch'"
+            )
+        self.filename = filename
+        self.columns = columns or {}
+        self.connection = connection or connect_sqlite(filename, durability)
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            f"(id TEXT PRIMARY KEY, data TEXT NOT NULL{''.join(', ' + name for name in self.columns)})"
+        )
+        self.table = SqliteTable(self.connection, table, self.columns)
+        existing = {
+            row[1] for row in self.connection.execute(f"PRAGMA table_info({table})")
+        }
+        missing = [name for name in self.columns if name not in existing]
+        if missing:
+            # Менеджер объявил новые колонки — добавляем их в старую базу
+            # и пересчитываем по JSON уже сохранённых записей.
+            self.connection.execute("BEGIN")
+            for name in missing:
+                self.connection.execute(f"ALTER TABLE {table} ADD COLUMN {name}")
+            self.table.update(list(self.table.items()))
+            self.connection.execute("COMMIT")
+            logging.info(f"В таблицу {table} добавлены колонки {', '.join(missing)}")
+        for name in self.columns:
+            self.connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_{name} ON {table} ({name})"
+            )
+        self.summaries = summaries or {}
+        if self.summaries:
+            # INSERT OR REPLACE удаляет прежнюю строку, и только так
+            # удаление вызывает триггеры.
+            self.connection.execute("PRAGMA recursive_triggers=ON")
+            for name in self.summaries:
+                self.create_summary(name)
+        self.batch_depth = 0
+        # Между процессами SQLite разводит запись своими блокировками, а
+        # данные и так читаются из базы. shared лишь включает проверку
+        # data_version, чтобы сбрасывать индексы в памяти после чужих
+        # изменений.
+        self.shared = shared
+        self.data_version = self.read_data_version()
+        # Соединение одно на все потоки: изменения и пакеты идут под
+        # блокировкой записи, чтения — параллельно под блокировкой чтения.
+        self.thread_safe = thread_safe
+        self.mutex = mutex or (RWLock() if thread_safe else None)
+
+    def summary_sql(self, name: str, row: str) -> tuple:
+        group, values = self.summaries[name]
+        # NULL в PRIMARY KEY не конфликтует сам с собой, поэтому группа
+        # без значения хранится как x'00' — с текстом он не совпадёт.
+        group = f"coalesce({group.format(row=row)}, x'00')"
+        return group, [expression.format(row=row) for expression in values.values()]
+
+    def summary_trigger(self, name: str, event: str) -> str:
+        target = f"{self.table.table}_{name}"
+        names = list(self.summaries[name][1])
+        rows = dict(
+            INSERT=(("NEW", 1),), DELETE=(("OLD", -1),), UPDATE=(("OLD", -1), ("NEW", 1))
+        )[event]
+        statements = []
+        for row, sign in rows:
+            group, values = self.summary_sql(name, row)
+            statements.append(
+                f"INSERT INTO {target} (grp, count, {', '.join(names)}) "
+                f"VALUES ({group}, {sign}, "
+                f"{', '.join(f'{sign} * ({value})' for value in values)}) "
+                f"ON CONFLICT(grp) DO UPDATE SET count = count + excluded.count, "
+                f"{', '.join(f'{n} = {n} + excluded.{n}' for n in names)};"
+            )
+            statements.append(f"DELETE FROM {target} WHERE grp = {group} AND count = 0;")
+        return (
+            f"CREATE TRIGGER {target}_{event.lower()} AFTER {event} ON {self.table.table} "
+            f"BEGIN {' '.join(statements)} END"
+        )
+
+    def create_summary(self, name: str) -> None:
+        target = f"{self.table.table}_{name}"
+        names = list(self.summaries[name][1])
+        existing = dict(
+            self.connection.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?",
+                (self.table.table,),
+            )
+        )
+        self.connection.execute("SAVEPOINT summary")
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {target} "
+            f"(grp PRIMARY KEY, count NOT NULL{''.join(f', {n} NOT NULL' for n in names)})"
+        )
+        changed = False
+        for event in ("INSERT", "DELETE", "UPDATE"):
+            trigger = f"{target}_{event.lower()}"
+            sql = self.summary_trigger(name, event)
+            if existing.get(trigger) == sql:
+                continue
+            # Триггера нет или он от другой схемы итогов — пересоздаём
+            # и пересчитываем итоги по таблице.
+            self.connection.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            self.connection.execute(sql)
+            changed = True
+        if changed:
+            self.rebuild_summary(name)
+            logging.info(f"Итоги {target} пересчитаны")
+        self.connection.execute("RELEASE summary")
+
+    def compute_summary(self, name: str) -> dict:
+        # Итоги полным проходом по таблице — для проверки сохранённых.
+        group, values = self.summary_sql(name, self.table.table)
+        names = list(self.summaries[name][1])
+        rows = self.connection.execute(
+            f"SELECT {group}, COUNT(*), "
+            f"{', '.join(f'SUM({value})' for value in values)} "
+            f"FROM {self.table.table} GROUP BY 1"
+        )
+        return self.summary_rows(rows, names)
+
+    def rebuild_summary(self, name: str) -> None:
+        target = f"{self.table.table}_{name}"
+        group, values = self.summary_sql(name, self.table.table)
+        names = list(self.summaries[name][1])
+        self.connection.execute(f"DELETE FROM {target}")
+        self.connection.execute(
+            f"INSERT INTO {target} (grp, count, {', '.join(names)}) "
+            f"SELECT {group}, COUNT(*), "
+            f"{', '.join(f'SUM({value})' for value in values)} "
+            f"FROM {self.table.table} GROUP BY 1"
+        )
+
+    def summary(self, name: str) -> dict:
+        names = list(self.summaries[name][1])
+        rows = self.connection.execute(
+            f"SELECT grp, count, {', '.join(names)} FROM {self.table.table}_{name}"
+        )
+        return self.summary_rows(rows, names)
+
+    @staticmethod
+    def summary_rows(rows, names: list) -> dict:
+        return {
+            None if row[0] == b"\x00" else row[0]: dict(zip(("count", *names), row[1:]))
+            for row in rows
+        }
+
+    def save_summaries(self, summaries: dict) -> None:
+        pass
+
+    def load_summaries(self):
+        return None
+
+    def read_data_version(self) -> int:
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def locked(self):
+        if not self.thread_safe:
+            return nullcontext()
+        return self.mutex
+
+    def reading(self):
+        if not self.thread_safe:
+            return nullcontext()
+        return self.mutex.reading()
+
+    def iter_values(self, data: dict, chunk: int = 1000):
+        # Порциями по rowid: курсор не остаётся открытым, пока другие
+        # потоки пишут в то же соединение.
+        if not self.thread_safe:
+            yield from data.values()
+            return
+        last = 0
+        while True:
+            with self.reading():
+                rows = self.connection.execute(
+                    f"SELECT rowid, data FROM {self.table.table} "
+                    "WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last, chunk),
+                ).fetchall()
+            if not rows:
+                return
+            for last, value in rows:
+                yield json.loads(value)
+
+    def write_through(self) -> None:
+        pass
+
+    def refresh(self, data: dict):
+        if not self.shared or self.batch_depth:
+            return None
+        version = self.read_data_version()
+        if version == self.data_version:
+            return None
+        self.data_version = version
+        return self.table
+
+    def load(self) -> SqliteTable:
+        logging.info(f"Открыта таблица {self.table.table} в базе {self.filename}")
+        return self.table
+
+    def save(self, data: dict) -> None:
+        # Изменения уже в базе — снимок нужен, только если нам передали
+        # посторонний словарь (например, после импорта).
+        if data is not self.table:
+            self.replace(data)
+
+    def replace(self, data: dict) -> SqliteTable:
+        mark = self.begin(self.table)
+        try:
+            self.table.clear()
+            self.table.update(data)
+        except BaseException:
+            self.rollback(mark)
+            raise
+        self.end(self.table)
+        return self.table
+
+    def commit(self, data: dict, changes: list):
+        return None
+
+    def flush(self) -> None:
+        pass
+
+    # Имя точки сохранения включает таблицу: в общей базе рабочего
+    # пространства пакеты разных таблиц вкладываются друг в друга.
+    def savepoint(self, depth: int) -> str:
+        return f"{self.table.table}_batch{depth}"
+
+    def begin(self, data: dict) -> int:
+        self.batch_depth += 1
+        self.connection.execute(f"SAVEPOINT {self.savepoint(self.batch_depth)}")
+        return self.batch_depth
+
+    def end(self, data: dict) -> None:
+        self.connection.execute(f"RELEASE {self.savepoint(self.batch_depth)}")
+        self.batch_depth -= 1
+
+    def rollback(self, mark: int) -> SqliteTable:
+        self.connection.execute(f"ROLLBACK TO {self.savepoint(mark)}")
+        self.connection.execute(f"RELEASE {self.savepoint(mark)}")
+        self.batch_depth = mark - 1
+        return self.table
+
+
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+
+def open_storage(
+    filename: str,
+    table: str,
+    columns: dict = None,
+    journal: bool = False,
+    backend: str = None,
+    fields: tuple = (),
+    interned: tuple = (),
+    dates: tuple = (),
+    summaries: dict = None,
+    **options,
+):
+    if backend is None:
+        if filename.endswith(SQLITE_EXTENSIONS):
+            backend = "sqlite"
+        else:
+            backend = "journal" if journal else "json"
+    if backend == "sqlite":
+        # Режимы JSON-файла (lazy, compact, format, journal...) к базе не
+        # относятся — молча их не игнорируем и не падаем на TypeError.
+        unsupported = sorted(set(options) - set(SqliteStorage.OPTIONS))
+        if journal:
+            unsupported.insert(0, "journal")
+        if unsupported:
+            raise ValueError(
+                f"Хранилище SQLite не поддерживает параметры: {', '.join(unsupported)}"
+            )
+        return SqliteStorage(filename, table, columns, summaries=summaries, **options)
+    if backend == "journal":
+        return JournalStorage(
+            filename, fields=fields, interned=interned, dates=dates, **options
+        )
+    if backend == "json":
+        return JsonStorage(
+            filename, fields=fields, interned=interned, dates=dates, **options
+        )
+    raise ValueError(f"Неизвестное хранилище: {backend}")
+
+
+class SectionStorage:
+    # Раздел общего JSON-файла рабочего пространства: данные одного
+    # менеджера внутри {"notes": {...}, "tasks": {...}}. Изменения всех
+    # разделов дописываются в один журнал общего JournalStorage с ключом
+    # (раздел, id), так что запись одного раздела не переписывает
+    # остальные, а пакеты нескольких разделов, открытые вместе, уходят
+    # на диск одной дозаписью. Снимок файла целиком пишется только при
+    # свёртке журнала и при замене раздела (save, replace).
+    def __init__(self, workspace: "JsonWorkspace", table: str) -> None:
+        self.workspace = workspace
+        self.storage = workspace.storage
+        self.filename = workspace.filename
+        self.table = table
+
+    def locked(self):
+        return self.storage.locked()
+
+    def reading(self):
+        return self.storage.reading()
+
+    def iter_values(self, data: dict, chunk: int = 1000):
+        return self.storage.iter_values(data, chunk)
+
+    def write_through(self) -> None:
+        self.storage.write_through()
+
+    def refresh(self, data: dict):
+        return None
+
+    def load(self) -> dict:
+        return self.workspace.data.setdefault(self.table, {})
+
+    def save(self, data: dict) -> None:
+        self.workspace.data[self.table] = data
+        self.storage.save(self.workspace.data)
+
+    def replace(self, data: dict) -> dict:
+        data = dict(data)
+        self.save(data)
+        return data
+
+    def commit(self, data: dict, changes: list):
+        self.workspace.data[self.table] = data
+        self.storage.commit(
+            self.workspace.data,
+            [(op, (self.table, key), value) for op, key, value in changes],
+        )
+        return None
+
+    def flush(self) -> None:
+        self.storage.flush()
+
+    @property
+    def snapshots(self) -> int:
+        return self.storage.snapshots
+
+    def save_summaries(self, summaries: dict) -> None:
+        self.storage.save_summaries(summaries, f".{self.table}.sum")
+
+    def load_summaries(self):
+        return self.storage.load_summaries(f".{self.table}.sum")
+
+    def begin(self, data: dict) -> tuple:
+        return self.storage.begin(self.workspace.data), data.copy()
+
+    def end(self, data: dict) -> None:
+        self.workspace.data[self.table] = data
+        self.storage.end(self.workspace.data)
+
+    def rollback(self, mark: tuple) -> dict:
+        self.storage.rollback(mark[0])
+        self.workspace.data[self.table] = mark[1]
+        return mark[1]
+
+
+class JsonWorkspace:
+    # Один JSON-файл на все разделы и один журнал изменений рядом с ним
+    # (JournalStorage). Отложенная запись и режимы с блокировками файла
+    # сюда не подходят: запись снимает копию только верхнего уровня, а
+    # разделы меняются на месте.
+    OPTIONS = ("durability", "backups", "sync_every", "compact_every")
+
+    def __init__(self, filename: str, **options) -> None:
+        unsupported = sorted(set(options) - set(self.OPTIONS))
+        if unsupported:
+            raise ValueError(
+                f"Общий JSON-файл не поддерживает параметры: {', '.join(unsupported)}"
+            )
+        self.filename = filename
+        self.storage = JournalStorage(filename, **options)
+        self.data = self.storage.load()
+        for table, section in self.data.items():
+            if not isinstance(section, dict):
+                raise ValueError(f"{filename}: раздел {table} — не объект")
+
+    def section(
+        self, table: str, columns: dict = None, summaries: dict = None
+    ) -> SectionStorage:
+        return SectionStorage(self, table)
+
+    def close(self) -> None:
+        self.storage.close()
+
+
+class SqliteWorkspace:
+    # Одна база и одно соединение на все таблицы; пакеты разных таблиц
+    # вложены в одну транзакцию SQLite.
+    def __init__(
+        self, filename: str, durability: str = "always", thread_safe: bool = False, **options
+    ) -> None:
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Неизвестный режим durability: {durability}")
+        self.filename = filename
+        self.connection = connect_sqlite(filename, durability)
+        self.mutex = RWLock() if thread_safe else None
+        self.options = dict(options, durability=durability, thread_safe=thread_safe)
+
+    def section(
+        self, table: str, columns: dict = None, summaries: dict = None
+    ) -> SqliteStorage:
+        return SqliteStorage(
+            self.filename,
+            table,
+            columns,
+            summaries=summaries,
+            connection=self.connection,
+            mutex=self.mutex,
+            **self.options,
+        )
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def open_workspace(filename: str, backend: str = None, **options):
+    if backend is None:
+        backend = "sqlite" if filename.endswith(SQLITE_EXTENSIONS) else "json"
+    if backend == "sqlite":
+        return SqliteWorkspace(filename, **options)
+    if backend == "json":
+        return JsonWorkspace(filename, **options)
+    raise ValueError(f"Неизвестное хранилище рабочего пространства: {backend}")
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Модули лежат в корне репозитория, а не в пакете.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
@@ -0,0 +1,120 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from analytics import FinanceColumns  # noqa: E402
+from personal_assistant import FinanceManager, FinanceRecord, date_ordinal  # noqa: E402
+
+CATEGORIES = ("еда", "жильё", "зарплата", None)
+
+
+def parse(date: str):
+    try:
+        return datetime.strptime(date, "%d-%m-%Y")
+    except ValueError:
+        return None
+
+
+def make_manager(tmp_path, count: int = 500, seed: int = 1) -> FinanceManager:
+    generator = random.Random(seed)
+    manager = FinanceManager(str(tmp_path / "finance.json"))
+    with manager.batch():
+        for number in range(count):
+            date = f"{generator.randint(1, 28):02d}-{generator.randint(1, 12):02d}-2024"
+            if number % 50 == 0:
+                date = "не дата"
+            # Разные суммы: у top_expenses не будет равных.
+            amount = round(generator.uniform(-1000, 1000), 2) + number / 1000
+            manager.add_record(
+                FinanceRecord(amount, generator.choice(CATEGORIES), date, "")
+            )
+    return manager
+
+
+def in_period(value: dict, start: str, end: str) -> bool:
+    day = parse(value["date"])
+    return day is not None and parse(start) <= day <= parse(end)
+
+
+def test_category_totals_for_period(tmp_path):
+    manager = make_manager(tmp_path)
+    expected = {}
+    for value in manager.data.values():
+        if in_period(value, "01-03-2024", "31-08-2024"):
+            category = value["category"]
+            expected[category] = expected.get(category, 0) + value["amount"]
+    totals = manager.category_totals("01-03-2024", "31-08-2024")
+    assert totals == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("period", ["month", "week"])
+def test_rollups(tmp_path, period):
+    manager = make_manager(tmp_path)
+    expected = {}
+    for value in manager.data.values():
+        day = parse(value["date"])
+        if day is None:
+            continue
+        if period == "month":
+            key = day.strftime("%Y-%m")
+        else:
+            key = (day - timedelta(days=day.weekday())).strftime("%Y-%m-%d")
+        row = expected.setdefault(key, dict(income=0, expense=0, total=0))
+        row["income" if value["amount"] > 0 else "expense"] += value["amount"]
+        row["total"] += value["amount"]
+    method = manager.monthly_totals if period == "month" else manager.weekly_totals
+    result = method("01-01-2024", "31-12-2024")
+    assert list(result) == sorted(expected)
+    for key, row in expected.items():
+        assert result[key] == pytest.approx(row)
+
+
+def test_running_balance_and_top_expenses(tmp_path):
+    manager = make_manager(tmp_path)
+    values = list(manager.data.values())
+    undated = sum(value["amount"] for value in values if parse(value["date"]) is None)
+    balance = undated
+    expected = {}
+    dated = [value for value in values if parse(value["date"])]
+    for value in sorted(dated, key=lambda value: parse(value["date"])):
+        balance += value["amount"]
+        expected[value["date"]] = balance
+    assert manager.running_balance() == pytest.approx(expected)
+
+    expenses = sorted(
+        (value for value in values if value["amount"] < 0), key=lambda value: value["amount"]
+    )
+    assert [record.id for record in manager.top_expenses(5)] == [
+        value["id"] for value in expenses[:5]
+    ]
+    june = [value for value in expenses if in_period(value, "01-06-2024", "30-06-2024")]
+    found = manager.top_expenses(3, "01-06-2024", "30-06-2024")
+    assert [record.id for record in found] == [value["id"] for value in june[:3]]
+
+
+def test_columns_follow_changes(tmp_path):
+    manager = make_manager(tmp_path, count=100)
+    manager.get_columns()
+    records = manager.get_all_records()
+    for record in records[:20]:
+        record.amount = -record.amount
+        record.category = "новая"
+        manager.edit_record(record)
+    for record in records[20:40]:
+        manager.delete_record(record.id)
+    for _ in range(30):
+        manager.add_record(FinanceRecord(1.5, "еда", "01-01-2024", ""))
+
+    columns = manager.get_columns()
+    rebuilt = FinanceColumns(
+        lambda record: record.get("amount"),
+        lambda record: date_ordinal(record.get("date")),
+        lambda record: record.get("category"),
+    ).build(manager.data)
+    assert columns.size == rebuilt.size == len(manager.data)
+    assert sorted(columns.ids[: columns.size]) == sorted(manager.data)
+    assert columns.balance() == pytest.approx(rebuilt.balance())
+    assert columns.category_totals() == pytest.approx(rebuilt.category_totals())
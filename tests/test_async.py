@@ -0,0 +1,107 @@
+import asyncio
+import threading
+
+import pytest
+
+from async_managers import AsyncFinanceManager, AsyncNoteManager
+from personal_assistant import FinanceManager, FinanceRecord, Note, NoteManager
+
+
+def record(amount=1.0):
+    return FinanceRecord(amount, "еда", "01-02-2024", "описание")
+
+
+def test_window_is_written_once(tmp_path):
+    filename = str(tmp_path / "finance.json")
+
+    async def main():
+        manager = await AsyncFinanceManager.open(filename)
+        snapshots = manager.manager.storage.snapshots
+        await asyncio.gather(*(manager.add_record(record(amount)) for amount in range(20)))
+        written = manager.manager.storage.snapshots - snapshots
+        balance = await manager.calculate_balance()
+        await manager.close()
+        return written, balance
+
+    written, balance = asyncio.run(main())
+    assert written == 1
+    assert balance == sum(range(20))
+    assert len(FinanceManager(filename).data) == 20
+
+
+def test_sqlite_writes_run_in_executor(tmp_path):
+    filename = str(tmp_path / "notes.db")
+    threads = set()
+
+    async def main():
+        manager = await AsyncNoteManager.open(filename)
+        create_note = manager.manager.create_note
+
+        def recorded(note):
+            threads.add(threading.get_ident())
+            create_note(note)
+
+        manager.manager.create_note = recorded
+        notes = [Note(f"заметка {number}", "текст") for number in range(5)]
+        await asyncio.gather(*(manager.create_note(note) for note in notes))
+        found = await manager.search_notes("заметка")
+        await manager.close()
+        return len(found)
+
+    assert asyncio.run(main()) == 5
+    assert threading.get_ident() not in threads
+    assert len(NoteManager(filename).data) == 5
+
+
+def test_sqlite_window_failure_rolls_back(tmp_path):
+    filename = str(tmp_path / "finance.db")
+
+    async def main():
+        manager = await AsyncFinanceManager.open(filename)
+        await manager.add_record(record())
+        add_record = manager.manager.add_record
+
+        def failing(item):
+            if item.amount < 0:
+                raise RuntimeError("сбой")
+            add_record(item)
+
+        manager.manager.add_record = failing
+        results = await asyncio.gather(
+            manager.add_record(record(2.0)),
+            manager.add_record(record(-1.0)),
+            return_exceptions=True,
+        )
+        count = len(await manager.get_all_records())
+        await manager.close()
+        return results, count
+
+    results, count = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert count == 1
+    assert len(FinanceManager(filename).data) == 1
+
+
+def test_iterate_and_exclusive(tmp_path):
+    filename = str(tmp_path / "notes.json")
+    csv_filename = str(tmp_path / "notes.csv")
+
+    async def main():
+        manager = await AsyncNoteManager.open(filename)
+        for number in range(7):
+            await manager.create_note(Note(str(number), "текст"))
+        titles = [note.title async for note in manager.iter_notes(chunk=3)]
+        await manager.export_to_csv(csv_filename)
+        await manager.close()
+        return titles
+
+    assert asyncio.run(main()) == [str(number) for number in range(7)]
+    copy = NoteManager(str(tmp_path / "copy.json"))
+    assert copy.import_from_csv(csv_filename) == 7
+
+
+@pytest.mark.parametrize("option", ["lazy", "shared"])
+def test_rejects_lazy_and_shared(tmp_path, option):
+    manager = NoteManager(str(tmp_path / "notes.json"), **{option: True})
+    with pytest.raises(ValueError):
+        AsyncNoteManager(manager)
@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from personal_assistant import FinanceManager, FinanceRecord
+
+
+def record(amount=1.0):
+    return FinanceRecord(amount, "еда", "01-02-2024", "описание")
+
+
+@pytest.mark.parametrize(
+    "options", [{}, dict(journal=True), dict(backend="sqlite")], ids=["json", "journal", "sqlite"]
+)
+def test_batch_rolls_back_on_error(tmp_path, options):
+    filename = str(tmp_path / ("finance.db" if options.get("backend") else "finance.json"))
+    manager = FinanceManager(filename, **options)
+    kept = record()
+    manager.add_record(kept)
+    with pytest.raises(RuntimeError):
+        with manager.batch():
+            manager.add_record(record())
+            manager.delete_record(kept.id)
+            raise RuntimeError
+    assert list(manager.data) == [kept.id]
+    assert list(FinanceManager(filename, **options).data) == [kept.id]
+
+
+def test_batch_writes_journal_once(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    manager = FinanceManager(filename, journal=True)
+    with manager.batch():
+        for _ in range(5):
+            manager.add_record(record())
+        assert not os.path.exists(filename + ".journal")
+    with open(filename + ".journal") as file:
+        assert len(file.readlines()) == 5
+    assert len(FinanceManager(filename, journal=True).data) == 5
+
+
+def test_nested_batches_write_at_outer_end(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    manager = FinanceManager(filename)
+    inode = os.stat(filename).st_ino
+    with manager.batch():
+        manager.add_record(record())
+        with manager.batch():
+            manager.add_record(record())
+        assert os.stat(filename).st_ino == inode
+    assert len(FinanceManager(filename).data) == 2
@@ -0,0 +1,70 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import managers as benchmarks  # noqa: E402
+
+SCRIPT = os.path.join(ROOT, "benchmarks", "managers.py")
+
+
+def run(*args):
+    return subprocess.run(
+        [sys.executable, SCRIPT, "--sizes=20", "--min-time=0", "--max-ops=2", *args],
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+
+
+@pytest.mark.parametrize("backend", list(benchmarks.BACKENDS))
+def test_suite_runs_on_every_backend(tmp_path, backend):
+    saved = tmp_path / "results.json"
+    result = run(f"--backend={backend}", f"--save={saved}")
+    assert result.returncode == 0, result.stderr
+    results = json.loads(saved.read_text(encoding="utf-8"))
+    assert set(results) == {f"{backend}/20/{name}" for name in benchmarks.BENCHMARKS}
+    for measured in results.values():
+        assert measured["ops"] >= 1
+        assert measured["p50_us"] <= measured["p99_us"]
+
+
+def test_same_seed_gives_same_data(tmp_path):
+    first = benchmarks.Workspace(str(tmp_path / "a"), 5, "json", seed=1)
+    second = benchmarks.Workspace(str(tmp_path / "b"), 5, "json", seed=1)
+    assert first.ids == second.ids
+
+
+def test_compare_reports_regressions():
+    baseline = {
+        "fast": dict(ops_per_s=100.0, peak_kb=10.0),
+        "slow": dict(ops_per_s=100.0, peak_kb=10.0),
+        "hungry": dict(ops_per_s=100.0, peak_kb=10.0),
+    }
+    results = {
+        "fast": dict(ops_per_s=90.0, peak_kb=10.0),
+        "slow": dict(ops_per_s=50.0, peak_kb=10.0),
+        "hungry": dict(ops_per_s=100.0, peak_kb=1000.0),
+        "new": dict(ops_per_s=1.0, peak_kb=1.0),
+    }
+    regressions = benchmarks.compare(results, baseline, 0.25)
+    assert [regression.split(":")[0] for regression in regressions] == ["slow", "hungry"]
+
+
+def test_baseline_regression_fails_the_run(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(
+        json.dumps({"json/20/calculate_balance": dict(ops_per_s=1e12, peak_kb=0.0)}),
+        encoding="utf-8",
+    )
+    result = run("--only=calculate_balance", f"--baseline={baseline}")
+    assert result.returncode == 1
+    assert "Регрессия: json/20/calculate_balance" in result.stdout
+
+    assert run("--only=нет_такого").returncode == 2
@@ -0,0 +1,75 @@
+import glob
+import zlib
+
+import pytest
+
+from personal_assistant import FinanceManager, FinanceRecord
+from serializers import HEADER, BinarySerializer, FormatError
+
+FIELDS = ("id", "amount", "category", "date", "description")
+
+
+def record(amount=1.0, category="еда", date="01-02-2024"):
+    return FinanceRecord(amount, category, date, "описание")
+
+
+def finance_data():
+    return {
+        "1": dict(id="1", amount=10.5, category="еда", date="01-02-2024", description="х"),
+        "2": dict(id="2", amount=-3, category=None, date="29-02-2024", description=""),
+        "3": dict(id="3", amount=0.0, category="еда", date="xx", description=" "),
+        # Не по схеме: лишнее поле и дата не строкой.
+        "4": dict(id="4", amount=1, category="еда", date=20240101, description="", extra=1),
+        "5": dict(id="другой", amount=1, category="еда", date=None, description=""),
+    }
+
+
+def write(filename, payload):
+    with open(filename, "wb") as file:
+        file.write(payload)
+
+
+def test_binary_round_trip(tmp_path):
+    filename = str(tmp_path / "finance.bin")
+    serializer = BinarySerializer(FIELDS, ("date",), ("category", "date"))
+    data = finance_data()
+    write(filename, serializer.dumps(data))
+    loaded = BinarySerializer().load(filename)
+    assert loaded == data
+    assert list(loaded) == list(data)
+
+
+def test_binary_manager_round_trip(tmp_path):
+    filename = str(tmp_path / "finance.bin")
+    manager = FinanceManager(filename)
+    records = [record(1.5), record(-2.0, None, "15-03-2024"), record(3.0, "жильё", "xx")]
+    for item in records:
+        manager.add_record(item)
+    reopened = FinanceManager(filename)
+    assert reopened.data == manager.data
+    assert FinanceManager(filename, compact=True).data == manager.data
+
+
+def test_binary_damage_and_unknown_version(tmp_path):
+    filename = str(tmp_path / "finance.bin")
+    payload = BinarySerializer(FIELDS, ("date",)).dumps(finance_data())
+    write(filename, payload[:-1] + b"!")
+    with pytest.raises(ValueError):
+        BinarySerializer().load(filename)
+
+    write(filename, b"PAB9" + payload[4:])
+    with pytest.raises(FormatError):
+        BinarySerializer().load(filename)
+    # Файл неизвестной версии не повреждён: его не откладывают в сторону.
+    with pytest.raises(FormatError):
+        FinanceManager(filename, backups=1)
+    assert not glob.glob(filename + ".corrupt-*")
+
+
+def test_legacy_marshal_format_is_not_read(tmp_path):
+    # Тело PAB1 не передаётся в marshal: файл отвергается до разбора.
+    filename = str(tmp_path / "finance.bin")
+    body = b"\xfb\x00\x00\x00\x00"
+    write(filename, HEADER.pack(b"PAB1", zlib.crc32(body)) + body)
+    with pytest.raises(FormatError):
+        BinarySerializer().load(filename)
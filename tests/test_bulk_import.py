@@ -0,0 +1,102 @@
+import csv
+import json
+
+import pytest
+
+from bulk_import import UNDECODED_MESSAGE, parse_file, split_file
+from personal_assistant import FinanceManager, NoteManager
+
+FIELDS = ("id", "title", "content", "timestamp")
+
+
+def parse(filename: str, chunk_size: int, workers: int = 1) -> tuple:
+    rows = []
+    errors = []
+    for chunk_rows, chunk_errors in parse_file(
+        filename, FIELDS, {}, workers=workers, chunk_size=chunk_size
+    ):
+        rows.extend(chunk_rows)
+        errors.extend(chunk_errors)
+    return rows, errors
+
+
+def write_notes_csv(filename: str, count: int) -> list:
+    rows = []
+    for number in range(count):
+        # Кавычки, запятые и переводы строк внутри полей.
+        content = f'строка {number}\nс "кавычками", запятой' if number % 3 else str(number)
+        rows.append((str(number), f"заметка {number}", content, "01-01-2024 00:00:00"))
+    with open(filename, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(FIELDS)
+        writer.writerows(rows)
+    return rows
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 2**20])
+def test_csv_chunks_split_on_record_boundaries(tmp_path, chunk_size):
+    filename = str(tmp_path / "notes.csv")
+    expected = write_notes_csv(filename, 50)
+    header, chunks = split_file(filename, True, chunk_size)
+    assert header == list(FIELDS)
+    for (start, end, line), (next_start, _, _) in zip(chunks, chunks[1:]):
+        assert end == next_start
+    rows, errors = parse(filename, chunk_size)
+    assert rows == expected
+    assert errors == []
+
+
+def test_csv_parsed_in_processes(tmp_path):
+    filename = str(tmp_path / "notes.csv")
+    expected = write_notes_csv(filename, 200)
+    assert parse(filename, 256, workers=2) == (expected, [])
+
+
+def test_csv_error_line_numbers(tmp_path):
+    filename = str(tmp_path / "finance.csv")
+    with open(filename, "wb") as file:
+        file.write(
+            "id,amount,category,date,description\n"
+            '1,10,еда,01-02-2024,"две\nстроки"\n'
+            "2,не число,еда,01-02-2024, \n"
+            "3,5,еда,01-02-2024,x\ry\n".encode()
+        )
+        file.write(b"4,5,\xff,01-02-2024,\n5,5,,01-02-2024,\n")
+    manager = FinanceManager(str(tmp_path / "finance.json"))
+    for chunk_size in (1, 2**20):
+        count, errors = manager.bulk_import(filename, chunk_size=chunk_size, workers=1)
+        assert count == 2
+        assert [line for line, message in errors] == [4, 5, 6]
+        assert errors[2][1] == UNDECODED_MESSAGE
+    assert set(manager.data) == {"1", "5"}
+    assert manager.data["1"]["description"] == "две\nстроки"
+
+
+def test_ndjson_lines_split_on_newline_only(tmp_path):
+    filename = str(tmp_path / "notes.ndjson")
+    with open(filename, "wb") as file:
+        file.write(json.dumps(dict(id="1", title="a b\x85c\x1cd"), ensure_ascii=False).encode())
+        file.write(b"\n\n[1]\n")
+        file.write(b'{"id": "2", "title": "\xff"}\n')
+        file.write(b'{"id": "3", "title": "ok"}\r\n')
+    for chunk_size in (1, 2**20):
+        rows, errors = parse(filename, chunk_size)
+        assert [row[:2] for row in rows] == [("1", "a b\x85c\x1cd"), ("3", "ok")]
+        assert [line for line, message in errors] == [3, 4]
+        assert errors[1][1] == UNDECODED_MESSAGE
+
+
+def test_bulk_import_replaces_or_merges(tmp_path):
+    filename = str(tmp_path / "notes.csv")
+    write_notes_csv(filename, 10)
+    manager = NoteManager(str(tmp_path / "notes.json"), journal=True)
+    kept = dict(id="kept", title="t", content="c", timestamp="01-01-2024 00:00:00")
+    manager.data["kept"] = kept
+    manager.save_to_file()
+
+    assert manager.bulk_import(filename, merge=True, workers=1) == (10, [])
+    assert len(NoteManager(str(tmp_path / "notes.json"), journal=True).data) == 11
+    assert manager.bulk_import(filename, workers=1) == (10, [])
+    reopened = NoteManager(str(tmp_path / "notes.json"), journal=True)
+    assert "kept" not in reopened.data and len(reopened.data) == 10
+    assert reopened.search_notes("заметка 7")[0].id == "7"
@@ -0,0 +1,72 @@
+from cache import CACHE_SIZE, EntityCache
+from personal_assistant import FinanceManager, FinanceRecord, Note, NoteManager
+
+
+def note(title="заметка"):
+    return Note(title, "текст", "01-02-2024 12:00:00")
+
+
+def test_default_cache_is_bounded(tmp_path):
+    manager = NoteManager(str(tmp_path / "notes.json"))
+    assert manager.get_cache().size == CACHE_SIZE
+    assert EntityCache(Note.from_json).size == CACHE_SIZE
+    assert NoteManager(str(tmp_path / "notes.json"), cache_size=2).get_cache().size == 2
+
+
+def test_least_recently_read_are_evicted(tmp_path):
+    manager = NoteManager(str(tmp_path / "notes.json"), cache_size=2)
+    notes = [note(str(number)) for number in range(3)]
+    for item in notes:
+        manager.create_note(item)
+    cache = manager.get_cache()
+    manager.get_note_by_id(notes[0].id)
+    manager.get_note_by_id(notes[1].id)
+    manager.get_note_by_id(notes[0].id)
+    manager.get_note_by_id(notes[2].id)
+    assert list(cache.entries) == [notes[0].id, notes[2].id]
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_large_selections_bypass_the_cache(tmp_path):
+    manager = NoteManager(str(tmp_path / "notes.json"), cache_size=2)
+    for number in range(5):
+        manager.create_note(note(str(number)))
+    assert len(manager.get_all_notes()) == 5
+    assert len(manager.get_cache().entries) == 0
+
+
+def test_disabled_cache(tmp_path):
+    manager = NoteManager(str(tmp_path / "notes.json"), cache_size=0)
+    added = note()
+    manager.create_note(added)
+    first = manager.get_note_by_id(added.id)
+    assert manager.get_note_by_id(added.id) is not first
+    assert len(manager.get_cache().entries) == 0
+
+
+def test_returned_entities_are_copies(tmp_path):
+    manager = NoteManager(str(tmp_path / "notes.json"))
+    added = note()
+    manager.create_note(added)
+    added.edit_note(new_title="не сохранено")
+    first = manager.get_note_by_id(added.id)
+    first.edit_note(new_title="чужая правка")
+    assert manager.get_note_by_id(added.id).title == "заметка"
+    assert manager.get_all_notes()[0].title == "заметка"
+    assert manager.data[added.id]["title"] == "заметка"
+
+    first.edit_note(new_title="новый")
+    manager.edit_note(first)
+    assert manager.get_note_by_id(added.id).title == "новый"
+
+
+def test_memoized_results_are_copies_and_expire(tmp_path):
+    manager = FinanceManager(str(tmp_path / "finance.json"))
+    manager.add_record(FinanceRecord(10.0, "еда", "01-02-2024", ""))
+    report = manager.generate_report()
+    report["еда"] = 0
+    report["чужое"] = 1
+    assert manager.generate_report() == {"еда": 10.0}
+    manager.add_record(FinanceRecord(5.0, "еда", "02-02-2024", ""))
+    assert manager.generate_report() == {"еда": 15.0}
+    assert manager.calculate_balance() == 15.0
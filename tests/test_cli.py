@@ -0,0 +1,98 @@
+import io
+import json
+
+import pytest
+
+from personal_assistant import FinanceManager, TaskManager, cli
+
+
+def run(monkeypatch, capsys, argv: list, stdin: str = "") -> tuple:
+    monkeypatch.setattr("sys.stdin", io.StringIO(stdin))
+    code = cli(argv)
+    captured = capsys.readouterr()
+    return code, captured.out, captured.err
+
+
+def ndjson(*records) -> str:
+    return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+
+@pytest.fixture
+def finance(tmp_path):
+    return str(tmp_path / "finance.json")
+
+
+def test_add_converts_types(monkeypatch, capsys, finance):
+    records = ndjson(
+        dict(id="1", amount="10", category="еда", date="01-02-2024", description=""),
+        dict(id="2", amount=-2.5, category="еда", date="02-02-2024", description=""),
+    )
+    code, out, err = run(monkeypatch, capsys, ["finance", "add", "--file", finance], records)
+    assert code == 0, err
+    assert [json.loads(line)["amount"] for line in out.splitlines()] == [10.0, -2.5]
+    assert FinanceManager(finance).data["1"]["amount"] == 10.0
+    code, out, err = run(monkeypatch, capsys, ["finance", "balance", "--file", finance])
+    assert (code, json.loads(out)) == (0, 7.5)
+    code, out, err = run(monkeypatch, capsys, ["finance", "report", "--file", finance])
+    assert (code, json.loads(out)) == (0, {"еда": 7.5})
+
+
+@pytest.mark.parametrize(
+    "bad",
+    [
+        dict(amount=True, date="01-02-2024"),
+        dict(amount="десять", date="01-02-2024"),
+        dict(amount=[1], date="01-02-2024"),
+        dict(amount=1, date=20240201),
+        dict(amount=1, date="31-02-2024"),
+        dict(date="01-02-2024"),
+    ],
+)
+def test_add_rejects_bad_records(monkeypatch, capsys, finance, bad):
+    good = dict(amount=1, category="еда", date="01-02-2024", description="")
+    records = ndjson(good) + "\n" + ndjson(dict(dict(category="еда", description=""), **bad))
+    code, out, err = run(monkeypatch, capsys, ["finance", "add", "--file", finance], records)
+    assert code == 1
+    assert "строка 3" in err
+    # Пакет отменён целиком, и отчёты работают.
+    assert len(FinanceManager(finance).data) == 0
+    code, out, err = run(monkeypatch, capsys, ["finance", "balance", "--file", finance])
+    assert code == 0 and json.loads(out) == 0
+
+
+def test_apply_operations(monkeypatch, capsys, tmp_path):
+    tasks = str(tmp_path / "tasks.json")
+    first = dict(
+        id="1", title="а", description="", priority="Высокий", due_date="01-02-2024", done="да"
+    )
+    operations = ndjson(
+        dict(op="add", record=first),
+        dict(op="add", id="2", title="б", description="", priority="Низкий", due_date=""),
+        dict(op="edit", id="1", title="изменена"),
+        dict(op="delete", id="2"),
+    )
+    code, out, err = run(monkeypatch, capsys, ["tasks", "apply", "--file", tasks], operations)
+    assert code == 0, err
+    stored = dict(TaskManager(tasks).data)
+    assert list(stored) == ["1"]
+    assert stored["1"]["title"] == "изменена" and stored["1"]["done"] is True
+
+    code, out, err = run(monkeypatch, capsys, ["tasks", "list", "--file", tasks])
+    assert [json.loads(line)["id"] for line in out.splitlines()] == ["1"]
+    code, out, err = run(monkeypatch, capsys, ["tasks", "get", "--file", tasks, "нет"])
+    assert code == 1
+
+
+def test_invalid_json_reports_line(monkeypatch, capsys, finance):
+    argv = ["finance", "add", "--file", finance]
+    code, out, err = run(monkeypatch, capsys, argv, "\n{oops\n")
+    assert code == 1 and "строка 2" in err
+    code, out, err = run(monkeypatch, capsys, argv, "[1]\n")
+    assert code == 1 and "строка 1" in err
+
+
+@pytest.mark.parametrize("option", ["--compact", "--lazy", "--journal", "--format=binary"])
+def test_json_options_rejected_for_sqlite(monkeypatch, capsys, tmp_path, option):
+    argv = ["finance", "list", "--file", str(tmp_path / "finance.db"), option]
+    code, out, err = run(monkeypatch, capsys, argv)
+    assert code == 1 and "Ошибка" in err
@@ -0,0 +1,88 @@
+import json
+import uuid
+
+import pytest
+
+from personal_assistant import (
+    Contact,
+    FinanceManager,
+    FinanceRecord,
+    Note,
+    Task,
+)
+from storage import CompactTable
+
+FIELDS = ("id", "amount", "category", "date", "description")
+
+
+def test_compact_table_round_trip():
+    table = CompactTable(FIELDS, ("category", "date"))
+    key = str(uuid.uuid4())
+    values = {
+        key: dict(id=key, amount=1.5, category="еда", date="01-02-2024", description=""),
+        "не-uuid": dict(id="не-uuid", amount=2, category=None, date="x", description="х"),
+        # id не совпадает с ключом, поле вне схемы и недостающее поле.
+        "ABC": dict(id="другой", amount=3, extra=[1, 2]),
+        key.upper(): dict(id=key.upper(), amount=4, category="еда", date="x", description=""),
+    }
+    for id, value in values.items():
+        table[id] = value
+    assert dict(table) == values
+    assert list(table) == list(values)
+    assert len(table) == 4
+    assert isinstance(next(iter(table.rows)), bytes)
+    assert key.upper() in table.rows
+    del table["ABC"]
+    assert "ABC" not in table and len(table) == 3
+    copy = table.copy()
+    copy["новый"] = dict(id="новый")
+    assert "новый" not in table
+
+
+def test_compact_table_interns_strings():
+    table = CompactTable(FIELDS, ("category",))
+    first = "".join(["е", "да"])
+    second = "".join(["ед", "а"])
+    assert first is not second
+    table["1"] = dict(id="1", category=first)
+    table["2"] = dict(id="2", category=second)
+    rows = list(table.rows.values())
+    assert rows[0][FIELDS.index("category")] is rows[1][FIELDS.index("category")]
+
+
+def test_compact_manager_matches_plain(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    plain = FinanceManager(filename)
+    records = [FinanceRecord(number / 4, "еда", "01-02-2024", "") for number in range(20)]
+    for record in records:
+        plain.add_record(record)
+    compact = FinanceManager(filename, compact=True)
+    assert isinstance(compact.data, CompactTable)
+    assert dict(compact.data) == dict(plain.data)
+    compact.delete_record(records[0].id)
+    records[1].amount = 100
+    compact.edit_record(records[1])
+    with open(filename) as file:
+        stored = json.load(file)
+    assert records[0].id not in stored
+    assert stored[records[1].id]["amount"] == 100
+    assert compact.calculate_balance() == sum(value["amount"] for value in stored.values())
+
+
+@pytest.mark.parametrize(
+    "entity",
+    [
+        Note("заголовок", "текст"),
+        Task("задача", "описание", "Высокий", "01-02-2024"),
+        Contact("Анна", "+7 900", "anna@example.com"),
+        FinanceRecord(1.5, "еда", "01-02-2024", "описание"),
+    ],
+    ids=lambda entity: type(entity).__name__,
+)
+def test_slotted_entities(entity):
+    assert not hasattr(entity, "__dict__")
+    cls = type(entity)
+    restored = cls.from_json(entity.to_json())
+    assert restored.to_json() == entity.to_json()
+    clone = entity.copy()
+    assert clone is not entity and clone.to_json() == entity.to_json()
@@ -0,0 +1,79 @@
+import csv
+import logging
+
+from personal_assistant import (
+    FinanceManager,
+    FinanceRecord,
+    Task,
+    TaskManager,
+    read_csv,
+    write_csv,
+)
+
+
+def write_rows(filename: str, rows: list) -> None:
+    with open(filename, "w", newline="", encoding="utf-8") as file:
+        csv.writer(file).writerows(rows)
+
+
+def test_export_import_round_trip(tmp_path):
+    source = TaskManager(str(tmp_path / "tasks.json"))
+    tasks = [
+        Task("первая", 'с "кавычками",\nи переводом строки', "Высокий", "01-02-2024"),
+        Task("вторая", "", "Низкий", "", done=True),
+    ]
+    for task in tasks:
+        source.add_task(task)
+    filename = str(tmp_path / "tasks.csv")
+    source.export_to_csv(filename)
+
+    target = TaskManager(str(tmp_path / "copy.json"))
+    assert target.import_from_csv(filename) == 2
+    assert dict(target.data) == dict(source.data)
+    assert target.data[tasks[1].id]["done"] is True
+
+
+def test_import_converts_and_skips_bad_rows(tmp_path, caplog):
+    filename = str(tmp_path / "finance.csv")
+    write_rows(
+        filename,
+        [
+            ["id", "amount", "category", "date", "description", "лишнее"],
+            ["1", "10.5", "еда", "01-02-2024", "две\nстроки", "x"],
+            ["2", "десять", "еда", "01-02-2024", "", ""],
+            ["", "-3", "", "15-03-2024", "", ""],
+            ["4", "1", "еда", "32-01-2024", "", ""],
+        ],
+    )
+    manager = FinanceManager(str(tmp_path / "finance.json"))
+    with caplog.at_level(logging.ERROR):
+        assert manager.import_from_csv(filename) == 2
+    assert manager.data["1"]["amount"] == 10.5
+    assert manager.data["1"]["лишнее"] == "x"
+    generated = [id for id in manager.data if id != "1"]
+    assert len(generated) == 1 and manager.data[generated[0]]["amount"] == -3.0
+    # Номера строк файла, а не записей: первая запись занимает две.
+    errors = [record for record in caplog.records if record.levelno == logging.ERROR]
+    assert [record.message.split()[1] for record in errors] == ["4", "6"]
+
+
+def test_import_merge_and_replace(tmp_path):
+    filename = str(tmp_path / "finance.csv")
+    header = ["id", "amount", "category", "date", "description"]
+    write_rows(filename, [header, ["1", "5", "еда", "01-02-2024", ""]])
+    manager = FinanceManager(str(tmp_path / "finance.json"))
+    kept = FinanceRecord(1.0, "еда", "01-02-2024", "", id="2")
+    manager.add_record(kept)
+    manager.import_from_csv(filename, merge=True)
+    assert sorted(manager.data) == ["1", "2"]
+    manager.import_from_csv(filename)
+    assert sorted(manager.data) == ["1"]
+    assert sorted(FinanceManager(str(tmp_path / "finance.json")).data) == ["1"]
+
+
+def test_write_csv_streams_values(tmp_path):
+    filename = str(tmp_path / "out.csv")
+    values = (dict(id=str(number), title="t", extra="не выгружается") for number in range(3))
+    assert write_csv(filename, ("id", "title"), values) == 3
+    expected = [dict(id=str(number), title="t") for number in range(3)]
+    assert list(read_csv(filename, {})) == expected
@@ -0,0 +1,102 @@
+import pytest
+
+from personal_assistant import (
+    MANAGERS,
+    Contact,
+    EntityStore,
+    FinanceRecord,
+    Note,
+    Task,
+    cli,
+)
+
+ENTITIES = dict(
+    notes=lambda: Note("заголовок", "текст", "01-02-2024 12:00:00"),
+    tasks=lambda: Task("задача", "описание", "Высокий", "01-02-2024"),
+    contacts=lambda: Contact("Анна", "+70000000000", "anna@example.com"),
+    finance=lambda: FinanceRecord(10.5, "еда", "01-02-2024", "обед"),
+)
+
+
+@pytest.fixture(params=list(MANAGERS))
+def kind(request):
+    return request.param
+
+
+def test_crud_is_shared_by_all_managers(tmp_path, kind):
+    filename = str(tmp_path / f"{kind}.json")
+    manager = MANAGERS[kind](filename)
+    assert isinstance(manager, EntityStore)
+    first, second = ENTITIES[kind](), ENTITIES[kind]()
+    manager.add(first)
+    manager.add(second)
+    assert manager.get_by_id(first.id).to_json() == first.to_json()
+    assert manager.get_by_id("нет") is None
+    assert sorted(entity.id for entity in manager.get_all()) == sorted([first.id, second.id])
+
+    changed = ENTITIES[kind]()
+    changed.id = first.id
+    manager.edit(changed)
+    manager.delete(second.id)
+    # Повторное удаление только пишет в журнал ошибку.
+    manager.delete(second.id)
+    reopened = MANAGERS[kind](filename)
+    assert reopened.data == {first.id: changed.to_json()}
+    assert [entity.id for entity in reopened.iter_entities()] == [first.id]
+
+
+def test_edit_replaces_existing_only(tmp_path):
+    manager = MANAGERS["notes"](str(tmp_path / "notes.json"))
+    note = ENTITIES["notes"]()
+    manager.add(note)
+    note.edit_note(new_title="новый")
+    manager.edit(note)
+    stranger = ENTITIES["notes"]()
+    manager.edit(stranger)
+    assert manager.get_by_id(note.id).title == "новый"
+    assert stranger.id not in manager.data
+
+
+def test_aliases_point_to_the_engine(tmp_path):
+    manager = MANAGERS["tasks"](str(tmp_path / "tasks.json"))
+    task = ENTITIES["tasks"]()
+    manager.add_task(task)
+    assert manager.tasks is manager.data
+    assert manager.get_task_by_id(task.id).title == "задача"
+
+
+def test_csv_round_trip(tmp_path, kind):
+    manager = MANAGERS[kind](str(tmp_path / f"{kind}.json"))
+    for _ in range(3):
+        manager.add(ENTITIES[kind]())
+    filename = str(tmp_path / f"{kind}.csv")
+    manager.export_to_csv(filename)
+    other = MANAGERS[kind](str(tmp_path / f"{kind}-copy.json"))
+    assert other.import_from_csv(filename) == 3
+    assert other.data == manager.data
+
+
+@pytest.mark.parametrize("kind, query", [("notes", "заголовок"), ("contacts", "анна")])
+def test_search(tmp_path, kind, query):
+    manager = MANAGERS[kind](str(tmp_path / f"{kind}.json"))
+    entity = ENTITIES[kind]()
+    manager.add(entity)
+    manager.add(ENTITIES[kind]())
+    assert len(manager.search(query)) == 2
+    assert manager.search(query, limit=1)[0].id in manager.data
+    assert manager.search("нет такого") == []
+
+
+@pytest.mark.parametrize("kind", ["tasks", "finance"])
+def test_search_without_text_fields(tmp_path, kind):
+    manager = MANAGERS[kind](str(tmp_path / f"{kind}.json"))
+    manager.add(ENTITIES[kind]())
+    with pytest.raises(ValueError, match="поиск по тексту не поддерживается"):
+        manager.search("задача")
+
+
+def test_cli_has_no_search_for_tasks(tmp_path, capsys):
+    with pytest.raises(SystemExit) as error:
+        cli(["tasks", "search", "задача", "--file", str(tmp_path / "tasks.json")])
+    assert error.value.code == 2
+    assert "invalid choice" in capsys.readouterr().err
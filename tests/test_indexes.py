@@ -0,0 +1,94 @@
+import random
+
+from indexes import FieldIndex, Indexes, SortedIndex, intersect
+from personal_assistant import Task, TaskManager
+
+PRIORITIES = ("Высокий", "Средний", "Низкий")
+
+
+def random_task(generator: random.Random) -> Task:
+    due_date = f"{generator.randint(1, 28):02d}-{generator.randint(1, 12):02d}-2024"
+    task = Task("задача", "описание", generator.choice(PRIORITIES), due_date)
+    task.done = generator.random() < 0.5
+    return task
+
+
+def test_field_index_build_matches_put():
+    data = {str(number): dict(value=number % 3) for number in range(30)}
+    built = FieldIndex(lambda value: value["value"]).build(data)
+    incremental = FieldIndex(lambda value: value["value"])
+    for id, value in data.items():
+        incremental.put(id, value)
+    assert built.postings == incremental.postings
+    incremental.put("0", dict(value=5))
+    incremental.remove("3")
+    assert list(incremental.get(0)) == [str(number) for number in range(6, 30, 3)]
+    assert list(incremental.get(5)) == ["0"]
+    assert incremental.get(7) == {}
+
+
+def test_sorted_index_range_and_updates():
+    data = {str(number): dict(key=number % 10 or None) for number in range(40)}
+    index = SortedIndex(lambda value: value["key"]).build(data)
+    assert sorted(index.range(3, 4)) == sorted(
+        id for id, value in data.items() if value["key"] in (3, 4)
+    )
+    assert len(index.range()) == 36
+    index.put("1", dict(key=None))
+    index.put("0", dict(key=4))
+    index.remove("4")
+    assert index.range(4, 4) == ["0", "14", "24", "34"]
+    assert "1" not in index.range()
+
+
+def test_indexes_build_on_first_use():
+    data = {"a": dict(x=1, y=2)}
+    indexes = Indexes(
+        data,
+        x=FieldIndex(lambda value: value["x"]),
+        y=FieldIndex(lambda value: value["y"]),
+    )
+    assert list(indexes.get(1, {})) == []
+    assert list(indexes["x"].get(1)) == ["a"]
+    assert list(indexes) == ["x"]
+    indexes.put("b", dict(x=1, y=3))
+    assert list(indexes["x"].get(1)) == ["a", "b"]
+    # Индекс, построенный после изменения, видит его через data.
+    data["b"] = dict(x=1, y=3)
+    assert list(indexes["y"].get(3)) == ["b"]
+
+
+def test_intersect():
+    assert intersect([{"a": None, "b": None, "c": None}, {"c": None, "a": None}]) == ["c", "a"]
+
+
+def test_filter_tasks_follow_changes(tmp_path):
+    generator = random.Random(1)
+    manager = TaskManager(str(tmp_path / "tasks.json"))
+    tasks = [random_task(generator) for _ in range(100)]
+    for task in tasks:
+        manager.add_task(task)
+    manager.filter_tasks(status=True)
+    for task in tasks[:20]:
+        task.priority = generator.choice(PRIORITIES)
+        task.done = not task.done
+        manager.edit_task(task)
+    for task in tasks[20:30]:
+        manager.delete_task(task.id)
+
+    for status in (None, True, False):
+        for priority in (None, *PRIORITIES):
+            expected = sorted(
+                id
+                for id, value in manager.data.items()
+                if (status is None or value["done"] == status)
+                and (priority is None or value["priority"] == priority)
+            )
+            found = manager.filter_tasks(status, priority)
+            assert sorted(task.id for task in found) == expected
+    between = manager.tasks_due_between("01-03-2024", "31-05-2024", status=False)
+    assert sorted(task.id for task in between) == sorted(
+        id
+        for id, value in manager.data.items()
+        if "03" <= value["due_date"][3:5] <= "05" and not value["done"]
+    )
@@ -0,0 +1,74 @@
+import json
+import os
+
+from personal_assistant import FinanceManager, FinanceRecord
+from storage import JournalStorage, JsonStorage
+
+
+def record(amount=1.0):
+    return FinanceRecord(amount, "еда", "01-02-2024", "описание")
+
+
+def test_journal_replays_changes(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    manager = FinanceManager(filename, journal=True)
+    first, second = record(10.0), record(-3.0)
+    manager.add_record(first)
+    manager.add_record(second)
+    manager.delete_record(first.id)
+    assert os.path.getsize(filename + ".journal") > 0
+
+    reopened = FinanceManager(filename, journal=True)
+    assert list(reopened.data) == [second.id]
+    assert reopened.data[second.id]["amount"] == -3.0
+
+
+def test_journal_appends_instead_of_rewriting_snapshot(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    manager = FinanceManager(filename, journal=True)
+    manager.add_record(record())
+    inode = os.stat(filename).st_ino
+    for _ in range(10):
+        manager.add_record(record())
+    assert os.stat(filename).st_ino == inode
+    with open(filename + ".journal") as file:
+        assert len(file.readlines()) == 11
+
+
+def test_journal_torn_tail_is_truncated(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    manager = FinanceManager(filename, journal=True)
+    kept = record()
+    manager.add_record(kept)
+    with open(filename + ".journal", "a") as file:
+        file.write('{"op": "put", "id": "torn", "val')
+
+    reopened = FinanceManager(filename, journal=True)
+    assert list(reopened.data) == [kept.id]
+    # Обрывок отрезан: следующая запись не склеивается с ним.
+    later = record()
+    reopened.add_record(later)
+    assert set(FinanceManager(filename, journal=True).data) == {kept.id, later.id}
+
+
+def test_journal_compaction_writes_snapshot(tmp_path):
+    filename = str(tmp_path / "store.json")
+    storage = JournalStorage(filename, compact_every=3)
+    data = storage.load()
+    for key in "abc":
+        data[key] = {"id": key}
+        storage.commit(data, [("put", key, data[key])])
+    assert os.path.getsize(filename + ".journal") == 0
+    with open(filename) as file:
+        assert json.load(file) == data
+
+
+def test_plain_storage_merges_leftover_journal(tmp_path):
+    filename = str(tmp_path / "store.json")
+    storage = JournalStorage(filename)
+    data = storage.load()
+    data["a"] = {"id": "a"}
+    storage.commit(data, [("put", "a", data["a"])])
+
+    assert JsonStorage(filename).load() == {"a": {"id": "a"}}
+    assert not os.path.exists(filename + ".journal")
@@ -0,0 +1,76 @@
+import json
+import os
+
+import pytest
+
+from personal_assistant import Note, NoteManager
+from storage import LazyJsonTable, index_json_object
+
+
+def write_notes(filename: str, count: int) -> dict:
+    data = {
+        str(number): dict(
+            id=str(number),
+            title=f'заметка "{number}" {{скобки}} [и] \\ слэш',
+            content="текст",
+            timestamp="01-01-2024 00:00:00",
+        )
+        for number in range(count)
+    }
+    with open(filename, "w") as file:
+        json.dump(data, file, ensure_ascii=False, indent=1)
+    return data
+
+
+def test_index_reads_records_without_parsing_file(tmp_path):
+    filename = str(tmp_path / "notes.json")
+    data = write_notes(filename, 20)
+    index = index_json_object(filename)
+    assert list(index) == list(data)
+    with open(filename, "rb") as file:
+        blob = file.read()
+    for key, (offset, length) in index.items():
+        assert json.loads(blob[offset : offset + length]) == data[key]
+
+
+@pytest.mark.parametrize("payload", ["", "[]", '{"a": {"b": 1}', '{"a": 1}'])
+def test_index_rejects_bad_files(tmp_path, payload):
+    filename = str(tmp_path / "notes.json")
+    with open(filename, "w") as file:
+        file.write(payload)
+    with pytest.raises(ValueError):
+        index_json_object(filename)
+
+
+def test_lazy_manager_reads_and_writes(tmp_path):
+    filename = str(tmp_path / "notes.json")
+    data = write_notes(filename, 50)
+    manager = NoteManager(filename, lazy=True)
+    assert isinstance(manager.data, LazyJsonTable)
+    assert dict(manager.data) == data
+    assert os.path.exists(filename + ".idx")
+
+    added = Note("новая", "текст")
+    manager.create_note(added)
+    manager.delete_note("3")
+    note = manager.get_note_by_id("4")
+    note.edit_note(new_title="изменена")
+    manager.edit_note(note)
+
+    expected = dict(data)
+    del expected["3"]
+    expected["4"] = dict(expected["4"], title="изменена")
+    expected[added.id] = added.to_json()
+    assert dict(manager.data) == expected
+    with open(filename) as file:
+        assert json.load(file) == expected
+    assert dict(NoteManager(filename, lazy=True).data) == expected
+
+
+def test_stale_index_is_rebuilt(tmp_path):
+    filename = str(tmp_path / "notes.json")
+    write_notes(filename, 5)
+    LazyJsonTable.open(filename)
+    data = write_notes(filename, 8)
+    os.utime(filename, ns=(0, 0))
+    assert dict(LazyJsonTable.open(filename)) == data
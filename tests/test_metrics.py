@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from metrics import METRICS, Metrics
+from personal_assistant import FinanceManager, FinanceRecord, cli
+
+
+def record(amount=1.0):
+    return FinanceRecord(amount, "еда", "01-02-2024", "описание")
+
+
+@pytest.fixture
+def metrics():
+    METRICS.reset()
+    METRICS.enable()
+    yield METRICS
+    METRICS.disable()
+    METRICS.reset()
+    METRICS.armed.clear()
+
+
+def test_disabled_metrics_record_nothing(tmp_path):
+    METRICS.reset()
+    manager = FinanceManager(str(tmp_path / "finance.json"))
+    manager.add_record(record())
+    manager.calculate_balance()
+    assert METRICS.snapshot() == {}
+
+
+def test_operations_are_counted_with_io(tmp_path, metrics):
+    manager = FinanceManager(str(tmp_path / "finance.json"))
+    manager.add_record(record())
+    manager.add_record(record())
+    manager.calculate_balance()
+    with pytest.raises(AttributeError):
+        manager.add(object())
+    snapshot = metrics.snapshot()
+    add = snapshot["FinanceManager.add"]
+    assert (add["count"], add["errors"]) == (3, 1)
+    assert add["bytes_written"] > 0
+    assert add["buckets"]["+Inf"] == 3
+    assert snapshot["FinanceManager.calculate_balance"]["count"] == 1
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = Metrics(buckets=(0.5, 1.0))
+    stats = metrics.stats("op")
+    stats.count = 3
+    stats.buckets = [1, 0, 2]
+    assert metrics.snapshot()["op"]["buckets"] == {"0.5": 1, "1.0": 1, "+Inf": 3}
+
+
+def test_exports(tmp_path, metrics):
+    manager = FinanceManager(str(tmp_path / "finance.json"))
+    manager.add_record(record())
+    assert json.loads(metrics.to_json()) == metrics.snapshot()
+    text = metrics.to_prometheus()
+    assert "# TYPE personal_assistant_operation_seconds histogram" in text
+    assert (
+        'personal_assistant_operation_seconds_count{operation="FinanceManager.add"} 1'
+        in text
+    )
+    assert 'le="+Inf"' in text
+    assert text.endswith("\n")
+
+
+def test_profile_next_calls(tmp_path, metrics):
+    manager = FinanceManager(str(tmp_path / "finance.json"))
+    metrics.profile("FinanceManager.add", "tracemalloc", calls=2)
+    for _ in range(3):
+        manager.add_record(record())
+    profiles = metrics.profiles["FinanceManager.add"]
+    assert len(profiles) == 2
+    assert profiles[0]["peak_bytes"] > 0
+    assert "FinanceManager.add" not in metrics.armed
+    with pytest.raises(ValueError):
+        metrics.profile("FinanceManager.add", "perf")
+
+
+def test_cli_metrics_flag(tmp_path, capsys, metrics):
+    metrics.disable()
+    filename = str(tmp_path / "finance.json")
+    assert cli(["--metrics=json", "finance", "balance", "--file", filename]) == 0
+    err = capsys.readouterr().err
+    assert "FinanceManager.calculate_balance" in json.loads(err.splitlines()[-1])
+    assert cli(["--metrics=prometheus", "finance", "balance", "--file", filename]) == 0
+    assert "personal_assistant_operation_seconds_bucket" in capsys.readouterr().err
@@ -0,0 +1,100 @@
+import glob
+import os
+import stat
+
+import pytest
+
+from personal_assistant import FinanceManager, FinanceRecord
+from storage import atomic_write
+
+
+def record(amount=1.0):
+    return FinanceRecord(amount, "еда", "01-02-2024", "описание")
+
+
+def mode(filename: str) -> int:
+    return stat.S_IMODE(os.stat(filename).st_mode)
+
+
+def test_atomic_write_replaces_without_leftovers(tmp_path):
+    filename = str(tmp_path / "store.json")
+    atomic_write(filename, "{}")
+    atomic_write(filename, b'{"a": 1}')
+    atomic_write(filename, iter([b"{", b"}"]))
+    with open(filename) as file:
+        assert file.read() == "{}"
+    assert os.listdir(tmp_path) == ["store.json"]
+
+
+def test_atomic_write_cleans_up_after_failure(tmp_path):
+    filename = str(tmp_path / "store.json")
+    atomic_write(filename, "{}")
+
+    def chunks():
+        yield b"{"
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        atomic_write(filename, chunks())
+    with open(filename) as file:
+        assert file.read() == "{}"
+    assert os.listdir(tmp_path) == ["store.json"]
+
+
+@pytest.mark.skipif(os.name != "posix", reason="права файлов POSIX")
+def test_new_file_mode_follows_umask(tmp_path):
+    previous = os.umask(0o022)
+    try:
+        atomic_write(str(tmp_path / "new.json"), "{}")
+        os.umask(0o077)
+        atomic_write(str(tmp_path / "private.json"), "{}")
+    finally:
+        os.umask(previous)
+    assert mode(str(tmp_path / "new.json")) == 0o644
+    assert mode(str(tmp_path / "private.json")) == 0o600
+
+
+@pytest.mark.skipif(os.name != "posix", reason="права файлов POSIX")
+def test_existing_file_keeps_mode(tmp_path):
+    filename = str(tmp_path / "store.json")
+    atomic_write(filename, "{}")
+    os.chmod(filename, 0o640)
+    atomic_write(filename, '{"a": 1}')
+    assert mode(filename) == 0o640
+
+
+def test_corrupt_snapshot_restored_from_backup(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    manager = FinanceManager(filename, backups=2)
+    first = record()
+    manager.add_record(first)
+    manager.add_record(record())
+    with open(filename, "w") as file:
+        file.write('{"оборван')
+
+    restored = FinanceManager(filename, backups=2)
+    assert list(restored.data) == [first.id]
+    corrupt = glob.glob(filename + ".corrupt-*")
+    assert len(corrupt) == 1
+    with open(corrupt[0]) as file:
+        assert file.read() == '{"оборван'
+
+
+def test_backups_rotate(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    manager = FinanceManager(filename, backups=2)
+    for _ in range(4):
+        manager.add_record(record())
+    assert sorted(os.listdir(tmp_path)) == [
+        "finance.json", "finance.json.1", "finance.json.2",
+    ]
+    assert len(FinanceManager(filename + ".2").data) == 2
+
+
+def test_corrupt_snapshot_without_backups_starts_empty(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    FinanceManager(filename).add_record(record())
+    with open(filename, "w") as file:
+        file.write("[]")
+    assert dict(FinanceManager(filename).data) == {}
+    assert glob.glob(filename + ".corrupt-*")
@@ -0,0 +1,100 @@
+import math
+import random
+
+from indexes import RangeSumIndex, money_parts, money_total
+from personal_assistant import FinanceManager, FinanceRecord, date_key
+
+CATEGORIES = ("еда", "жильё", "транспорт", None)
+
+
+def random_record(generator: random.Random) -> FinanceRecord:
+    day = generator.randint(1, 28)
+    month = generator.randint(1, 12)
+    date = f"{day:02d}-{month:02d}-{generator.choice((2023, 2024))}"
+    if generator.random() < 0.02:
+        date = "не дата"
+    return FinanceRecord(
+        round(generator.uniform(-500, 900), 2), generator.choice(CATEGORIES), date, ""
+    )
+
+
+def exact_report(data, low=None, high=None) -> dict:
+    amounts = {}
+    for value in data.values():
+        key = date_key(value["date"])
+        if low is not None or high is not None:
+            if key is None or key < (low or 0) or key > (high or math.inf):
+                continue
+        amounts.setdefault(value["category"], []).append(value["amount"])
+    return {category: round(math.fsum(values), 2) for category, values in amounts.items()}
+
+
+def test_money_parts():
+    assert money_parts(0.29) == (29, 0.0)
+    assert money_parts(-10) == (-1000, 0.0)
+    assert money_parts(0.001) == (0, 0.001)
+    assert money_total(74194439, 0.0) == 741944.39
+    assert money_total(100, 0.001) == 1.001
+
+
+def test_ranged_report_is_exact(tmp_path):
+    generator = random.Random(7)
+    manager = FinanceManager(str(tmp_path / "finance.json"))
+    with manager.batch():
+        for _ in range(20000):
+            manager.add_record(random_record(generator))
+    report = manager.generate_report("01-02-2023", "30-11-2024")
+    # Равенство, а не близость: суммы в копейках не копят погрешность.
+    assert report == exact_report(manager.data, 20230201, 20241130)
+    index = manager.get_indexes()["report"]
+    assert index.sum() == exact_report(manager.data)
+
+
+def test_report_follows_changes(tmp_path):
+    generator = random.Random(8)
+    manager = FinanceManager(str(tmp_path / "finance.json"))
+    records = [random_record(generator) for _ in range(300)]
+    for record in records:
+        manager.add_record(record)
+    assert manager.generate_report("01-01-2024", None) == exact_report(manager.data, 20240101)
+    for record in records[:50]:
+        record.amount = round(generator.uniform(-10, 10), 2)
+        record.date = "15-06-2024"
+        manager.edit_record(record)
+    for record in records[50:100]:
+        manager.delete_record(record.id)
+    for low, high in (("01-01-2024", None), (None, "31-12-2023"), ("15-06-2024", "15-06-2024")):
+        assert manager.generate_report(low, high) == exact_report(
+            manager.data, date_key(low) if low else None, date_key(high) if high else None
+        )
+
+
+def test_range_sum_index_drops_empty_cells():
+    index = RangeSumIndex(
+        lambda value: value["key"], lambda value: value["group"], lambda value: value["amount"]
+    )
+    index.put("a", dict(key=1, group="x", amount=1.5))
+    index.put("b", dict(key=2, group="y", amount=2))
+    index.put("c", dict(key=None, group="x", amount=0.25))
+    assert index.sum(1, 2) == {"x": 1.5, "y": 2.0}
+    assert index.sum() == {"x": 1.75, "y": 2.0}
+    index.remove("b")
+    index.put("a", dict(key=3, group="x", amount=1))
+    assert index.sorted_keys == [3]
+    assert index.sum(1, 2) == {}
+    assert index.sum(None, 3) == {"x": 1.0}
+
+
+def test_records_between_in_date_order(tmp_path):
+    generator = random.Random(9)
+    manager = FinanceManager(str(tmp_path / "finance.json"))
+    for _ in range(200):
+        manager.add_record(random_record(generator))
+    found = manager.records_between("01-03-2024", "31-08-2024")
+    keys = [date_key(record.date) for record in found]
+    assert keys == sorted(keys)
+    assert sorted(record.id for record in found) == sorted(
+        id
+        for id, value in manager.data.items()
+        if date_key(value["date"]) and 20240301 <= date_key(value["date"]) <= 20240831
+    )
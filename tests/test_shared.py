@@ -0,0 +1,55 @@
+import multiprocessing
+import os
+
+import pytest
+
+from personal_assistant import FinanceManager, FinanceRecord
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="flock есть только на POSIX")
+
+
+def record(amount=1.0):
+    return FinanceRecord(amount, "еда", "01-02-2024", "описание")
+
+
+@pytest.mark.parametrize("journal", [False, True], ids=["json", "journal"])
+def test_shared_manager_sees_other_writer(tmp_path, journal):
+    filename = str(tmp_path / "finance.json")
+    first = FinanceManager(filename, journal=journal, shared=True)
+    second = FinanceManager(filename, journal=journal, shared=True)
+    mine, theirs = record(1.0), record(2.0)
+    first.add_record(mine)
+    assert [item.id for item in second.get_all_records()] == [mine.id]
+    # Изменение поверх чужого вливается в перечитанные данные.
+    second.add_record(theirs)
+    assert {item.id for item in first.get_all_records()} == {mine.id, theirs.id}
+
+
+def test_unchanged_file_is_not_reloaded(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    manager = FinanceManager(filename, shared=True)
+    manager.add_record(record())
+    data = manager.data
+    manager.get_all_records()
+    assert manager.data is data
+
+
+def add_shared(filename: str, count: int) -> None:
+    manager = FinanceManager(filename, journal=True, shared=True)
+    for _ in range(count):
+        manager.add_record(record())
+
+
+def test_shared_processes_do_not_lose_writes(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    FinanceManager(filename, journal=True, shared=True)
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=add_shared, args=(filename, 25)) for _ in range(3)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(20)
+        assert process.exitcode == 0
+    assert len(FinanceManager(filename, journal=True).data) == 75
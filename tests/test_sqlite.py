@@ -0,0 +1,107 @@
+import random
+import sqlite3
+
+import pytest
+
+from personal_assistant import (
+    ContactManager,
+    Contact,
+    NoteManager,
+    Note,
+    Task,
+    TaskManager,
+    migrate_to_sqlite,
+)
+
+PRIORITIES = ("Высокий", "Средний", "Низкий")
+
+
+def make_tasks(count: int, seed: int = 1) -> list:
+    generator = random.Random(seed)
+    tasks = []
+    for number in range(count):
+        day = generator.randint(1, 28)
+        month = generator.randint(1, 12)
+        due_date = f"{day:02d}-{month:02d}-2024" if number % 7 else ""
+        task = Task(f"задача {number}", "описание", generator.choice(PRIORITIES), due_date)
+        task.done = generator.random() < 0.3
+        tasks.append(task)
+    return tasks
+
+
+def ids(entities) -> list:
+    return sorted(entity.id for entity in entities)
+
+
+def test_crud_persists(tmp_path):
+    filename = str(tmp_path / "notes.db")
+    manager = NoteManager(filename)
+    first, second = Note("первая", "текст"), Note("вторая", "текст")
+    manager.create_note(first)
+    manager.create_note(second)
+    first.edit_note(new_title="изменена")
+    manager.edit_note(first)
+    manager.delete_note(second.id)
+
+    reopened = NoteManager(filename)
+    assert ids(reopened.get_all_notes()) == [first.id]
+    assert reopened.get_note_by_id(first.id).title == "изменена"
+    assert reopened.get_note_by_id(second.id) is None
+    with sqlite3.connect(filename) as connection:
+        assert connection.execute("SELECT count(*) FROM notes").fetchone() == (1,)
+
+
+def test_task_queries_match_json(tmp_path):
+    tasks = make_tasks(200)
+    json_manager = TaskManager(str(tmp_path / "tasks.json"))
+    sqlite_manager = TaskManager(str(tmp_path / "tasks.db"))
+    for manager in (json_manager, sqlite_manager):
+        with manager.batch():
+            for task in tasks:
+                manager.add_task(task)
+
+    for status in (None, True, False):
+        for priority in (None, *PRIORITIES):
+            assert ids(sqlite_manager.filter_tasks(status, priority)) == ids(
+                json_manager.filter_tasks(status, priority)
+            )
+    due = tasks[1].due_date
+    assert ids(sqlite_manager.filter_tasks(due_date=due)) == ids(
+        json_manager.filter_tasks(due_date=due)
+    )
+    between = sqlite_manager.tasks_due_between("01-03-2024", "30-06-2024")
+    assert ids(between) == ids(json_manager.tasks_due_between("01-03-2024", "30-06-2024"))
+    # В порядке дедлайна.
+    days = [task.due_date[6:] + task.due_date[3:5] + task.due_date[:2] for task in between]
+    assert days == sorted(days)
+    assert len(between) > 0
+
+
+def test_search_on_sqlite(tmp_path):
+    manager = ContactManager(str(tmp_path / "contacts.db"))
+    anna = Contact("Анна Петрова", "+7 900", "anna@example.com")
+    manager.add_contact(anna)
+    manager.add_contact(Contact("Борис", "+7 901", "boris@example.com"))
+    assert [contact.id for contact in manager.search_contact("петрова")] == [anna.id]
+
+
+def test_batch_rollback_on_sqlite(tmp_path):
+    filename = str(tmp_path / "tasks.db")
+    manager = TaskManager(filename)
+    kept = make_tasks(1)[0]
+    manager.add_task(kept)
+    with pytest.raises(RuntimeError):
+        with manager.batch():
+            manager.delete_task(kept.id)
+            raise RuntimeError
+    assert ids(TaskManager(filename).get_all_tasks()) == [kept.id]
+
+
+def test_migrate_to_sqlite(tmp_path):
+    source = str(tmp_path / "tasks.json")
+    target = str(tmp_path / "tasks.db")
+    manager = TaskManager(source)
+    for task in make_tasks(20):
+        manager.add_task(task)
+    migrate_to_sqlite("tasks", source, target)
+    assert dict(TaskManager(target).data) == dict(manager.data)
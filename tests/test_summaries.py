@@ -0,0 +1,214 @@
+import json
+import math
+import random
+
+import pytest
+
+from personal_assistant import FinanceManager, FinanceRecord
+from storage import file_signature
+
+DATES = ("01-02-2024", "15-03-2024", "31-12-2023", "xx")
+CATEGORIES = ("еда", "жильё", None)
+
+
+def random_record(generator: random.Random) -> FinanceRecord:
+    return FinanceRecord(
+        round(generator.uniform(-100, 100), 2),
+        generator.choice(CATEGORIES),
+        generator.choice(DATES),
+        "описание",
+    )
+
+
+def expected_categories(manager) -> dict:
+    totals = {}
+    for value in manager.data.values():
+        totals[value["category"]] = totals.get(value["category"], 0) + value["amount"]
+    return totals
+
+
+def fill(manager, generator: random.Random) -> None:
+    ids = []
+    for _ in range(60):
+        item = random_record(generator)
+        manager.add_record(item)
+        ids.append(item.id)
+    for id in ids[:20]:
+        item = random_record(generator)
+        item.id = id
+        manager.edit_record(item)
+    for id in ids[20:30]:
+        manager.delete_record(id)
+    with pytest.raises(RuntimeError):
+        with manager.batch():
+            manager.delete_record(ids[40])
+            manager.add_record(random_record(generator))
+            raise RuntimeError
+    with manager.batch():
+        for _ in range(5):
+            manager.add_record(random_record(generator))
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{}, dict(journal=True), dict(compact=True), dict(format="binary"), dict(backend="sqlite")],
+    ids=["json", "journal", "compact", "binary", "sqlite"],
+)
+def test_summaries_follow_changes(tmp_path, options):
+    filename = str(tmp_path / ("finance.db" if options.get("backend") else "finance.json"))
+    manager = FinanceManager(filename, **options)
+    manager.calculate_balance()
+    fill(manager, random.Random(1))
+
+    assert manager.verify_summaries() == {}
+    expected = expected_categories(manager)
+    totals = manager.category_totals()
+    assert totals.keys() == expected.keys()
+    assert all(abs(totals[key] - expected[key]) < 1e-6 for key in expected)
+    balance = sum(value["amount"] for value in manager.data.values())
+    assert abs(manager.calculate_balance() - balance) < 1e-6
+
+    manager.flush()
+    reopened = FinanceManager(filename, **options)
+    assert abs(reopened.calculate_balance() - balance) < 1e-6
+    assert reopened.verify_summaries() == {}
+
+
+def test_journal_sidecar_written_on_flush_not_per_change(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    generator = random.Random(2)
+    manager = FinanceManager(filename, journal=True)
+    manager.add_record(random_record(generator))
+    manager.calculate_balance()
+    signature = file_signature(filename + ".sum")
+    for _ in range(10):
+        manager.add_record(random_record(generator))
+    assert file_signature(filename + ".sum") == signature
+    # Дописанный журнал делает файл итогов устаревшим.
+    assert FinanceManager(filename, journal=True).storage.load_summaries() is None
+
+    manager.flush()
+    reopened = FinanceManager(filename, journal=True)
+    assert reopened.storage.load_summaries() is not None
+    balance = sum(value["amount"] for value in reopened.data.values())
+    assert abs(reopened.calculate_balance() - balance) < 1e-6
+
+
+def test_journal_compaction_saves_summaries(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    generator = random.Random(3)
+    manager = FinanceManager(filename, journal=True, compact_every=5)
+    manager.calculate_balance()
+    for _ in range(5):
+        manager.add_record(random_record(generator))
+    assert manager.storage.load_summaries() is not None
+
+
+def test_stale_sidecar_is_rebuilt(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    generator = random.Random(4)
+    manager = FinanceManager(filename)
+    manager.add_record(random_record(generator))
+    manager.calculate_balance()
+    # Изменение без итогов в памяти (другой процесс) файл итогов не
+    # обновляет, и тот больше не подходит к данным.
+    other = FinanceManager(filename)
+    extra = dict(id="extra", amount=1000.0, category="еда", date="01-02-2024", description="")
+    other.storage.save(dict(other.data, extra=extra))
+    reopened = FinanceManager(filename)
+    balance = sum(value["amount"] for value in reopened.data.values())
+    assert abs(reopened.calculate_balance() - balance) < 1e-6
+
+
+def test_verify_finds_and_rebuilds_damaged_summaries(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    generator = random.Random(5)
+    manager = FinanceManager(filename)
+    for _ in range(10):
+        manager.add_record(random_record(generator))
+    manager.calculate_balance()
+    with open(filename + ".sum") as file:
+        payload = json.load(file)
+    row = payload["summaries"]["categories"]["rows"][0]
+    row[2] += 500
+    with open(filename + ".sum", "w") as file:
+        json.dump(payload, file)
+
+    damaged = FinanceManager(filename)
+    assert damaged.verify_summaries() == {"categories": [row[0]]}
+    damaged.verify_summaries(rebuild=True)
+    assert damaged.verify_summaries() == {}
+    assert FinanceManager(filename).verify_summaries() == {}
+
+
+@pytest.mark.parametrize(
+    "options", [dict(write_behind=60), dict(thread_safe=True)], ids=["write_behind", "thread_safe"]
+)
+def test_deferred_modes_save_sidecar_after_flush(tmp_path, options):
+    filename = str(tmp_path / "finance.json")
+    generator = random.Random(6)
+    manager = FinanceManager(filename, **options)
+    manager.calculate_balance()
+    manager.add_record(random_record(generator))
+    manager.flush()
+    assert manager.storage.load_summaries() is not None
+    manager.storage.close()
+
+    reopened = FinanceManager(filename, **options)
+    assert reopened.stored_summaries() is not None
+    balance = sum(value["amount"] for value in reopened.data.values())
+    assert reopened.calculate_balance() == round(balance, 2)
+    reopened.storage.close()
+
+
+def test_write_behind_skips_sidecar_while_changes_are_pending(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    manager = FinanceManager(filename, write_behind=60)
+    manager.calculate_balance()
+    manager.flush()
+    signature = file_signature(filename + ".sum")
+    manager.add_record(random_record(random.Random(7)))
+    manager.save_summaries()
+    assert file_signature(filename + ".sum") == signature
+    assert manager.storage.load_summaries() is None
+    manager.storage.close()
+
+
+def test_unbounded_totals_are_exact(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    generator = random.Random(8)
+    manager = FinanceManager(filename)
+    with manager.batch():
+        for _ in range(5000):
+            manager.add_record(random_record(generator))
+    manager.calculate_balance()
+    with manager.batch():
+        for item in list(manager.get_all_records())[:500]:
+            manager.delete_record(item.id)
+    expected = {}
+    for value in manager.data.values():
+        expected.setdefault(value["category"], []).append(value["amount"])
+    assert manager.generate_report() == {
+        category: round(math.fsum(amounts), 2) for category, amounts in expected.items()
+    }
+    balance = round(math.fsum(value["amount"] for value in manager.data.values()), 2)
+    assert manager.calculate_balance() == balance
+    manager.flush()
+    assert FinanceManager(filename).calculate_balance() == balance
+
+
+def test_float_sidecar_of_previous_format_is_rebuilt(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    manager = FinanceManager(filename)
+    manager.add_record(FinanceRecord(0.1, "еда", "01-02-2024", ""))
+    manager.add_record(FinanceRecord(0.2, "еда", "01-02-2024", ""))
+    manager.calculate_balance()
+    with open(filename + ".sum") as file:
+        payload = json.load(file)
+    for summary in payload["summaries"].values():
+        del summary["money"]
+    with open(filename + ".sum", "w") as file:
+        json.dump(payload, file)
+    reopened = FinanceManager(filename)
+    assert reopened.stored_summaries() is None
+    assert reopened.calculate_balance() == 0.3
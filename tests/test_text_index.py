@@ -0,0 +1,81 @@
+import random
+
+from indexes import TextIndex, tokenize
+from personal_assistant import Note, NoteManager
+
+SYLLABLES = ("ан", "на", "бо", "рис", "ма", "ри", "я", "до", "ком", "от", "чёт")
+
+
+def random_text(generator: random.Random) -> str:
+    words = [
+        "".join(generator.choice(SYLLABLES) for _ in range(generator.randint(1, 3)))
+        for _ in range(generator.randint(1, 4))
+    ]
+    return " ".join(word.capitalize() if generator.random() < 0.3 else word for word in words)
+
+
+def expected_ids(data: dict, query: str, prefix: bool = False) -> set:
+    found = set()
+    for id, value in data.items():
+        words = tokenize(value["title"]) + tokenize(value["content"])
+        if all(
+            any(
+                word.startswith(token)
+                or (not prefix and len(token) >= 2 and token in word)
+                for word in words
+            )
+            for token in tokenize(query)
+        ):
+            found.add(id)
+    return found
+
+
+def test_search_matches_brute_force():
+    generator = random.Random(3)
+    data = {
+        str(number): dict(title=random_text(generator), content=random_text(generator))
+        for number in range(300)
+    }
+    index = TextIndex(dict(title=3, content=1)).build(data)
+    for query in ("ан", "рис", "Борис", "ма ри", "ч", "комот", "на я", "xyz", "ёт"):
+        for prefix in (False, True):
+            assert set(index.search(query, prefix=prefix)) == expected_ids(data, query, prefix)
+
+
+def test_index_follows_changes():
+    generator = random.Random(4)
+    data = {
+        str(number): dict(title=random_text(generator), content=random_text(generator))
+        for number in range(200)
+    }
+    index = TextIndex(dict(title=3, content=1)).build(data)
+    for number in range(0, 200, 3):
+        data[str(number)] = dict(title=random_text(generator), content="")
+        index.put(str(number), data[str(number)])
+    for number in range(1, 200, 5):
+        del data[str(number)]
+        index.remove(str(number))
+
+    rebuilt = TextIndex(dict(title=3, content=1)).build(data)
+    assert index.vocabulary == rebuilt.vocabulary == sorted(rebuilt.postings)
+    assert index.postings == rebuilt.postings
+    assert index.grams == rebuilt.grams
+    assert index.pairs == rebuilt.pairs
+    for query in ("ан", "рис", "ком", "до ма"):
+        assert set(index.search(query)) == expected_ids(data, query)
+
+
+def test_ranking_and_limit(tmp_path):
+    manager = NoteManager(str(tmp_path / "notes.json"))
+    in_content = Note("список", "купить хлеб")
+    in_title = Note("Хлеб", "купить")
+    partial = Note("хлебница", "")
+    for note in (in_content, in_title, partial):
+        manager.create_note(note)
+    assert [note.id for note in manager.search_notes("хлеб")] == [
+        in_title.id, partial.id, in_content.id,
+    ]
+    assert [note.id for note in manager.search_notes("хлеб", limit=1)] == [in_title.id]
+    assert [note.id for note in manager.search_notes("лебн")] == [partial.id]
+    assert manager.search_notes("лебн", prefix=True) == []
+    assert len(manager.search_notes("")) == 3
@@ -0,0 +1,156 @@
+import json
+import threading
+import time
+
+import pytest
+
+from personal_assistant import FinanceManager, FinanceRecord
+from storage import RWLock
+
+TIMEOUT = 5
+
+
+def record(amount=1.0):
+    return FinanceRecord(amount, "еда", "01-02-2024", "описание")
+
+
+def read_file(filename: str) -> dict:
+    with open(filename) as file:
+        return json.load(file)
+
+
+def test_rwlock_readers_run_in_parallel():
+    lock = RWLock()
+    both_inside = threading.Barrier(2, timeout=TIMEOUT)
+
+    def read():
+        with lock.reading():
+            both_inside.wait()
+
+    thread = threading.Thread(target=read)
+    thread.start()
+    read()
+    thread.join()
+
+
+def test_rwlock_writer_waits_for_readers_and_blocks_new_ones():
+    lock = RWLock()
+    order = []
+    reader_inside = threading.Event()
+    release_reader = threading.Event()
+
+    def reader():
+        with lock.reading():
+            reader_inside.set()
+            release_reader.wait(TIMEOUT)
+            order.append("reader")
+
+    def writer():
+        with lock:
+            order.append("writer")
+
+    def late_reader():
+        with lock.reading():
+            order.append("late reader")
+
+    threads = [threading.Thread(target=reader)]
+    threads[0].start()
+    reader_inside.wait(TIMEOUT)
+    threads.append(threading.Thread(target=writer))
+    threads[1].start()
+    deadline = time.monotonic() + TIMEOUT
+    while not lock.waiting_writers and time.monotonic() < deadline:
+        time.sleep(0.001)
+    threads.append(threading.Thread(target=late_reader))
+    threads[2].start()
+    release_reader.set()
+    for thread in threads:
+        thread.join(TIMEOUT)
+    assert order == ["reader", "writer", "late reader"]
+
+
+def test_rwlock_reentrancy():
+    lock = RWLock()
+    with lock:
+        with lock:
+            with lock.reading():
+                pass
+    with lock.reading():
+        with lock.reading():
+            with pytest.raises(RuntimeError):
+                lock.acquire()
+
+
+def test_rwlock_condition_wait():
+    lock = RWLock()
+    condition = threading.Condition(lock)
+    ready = []
+
+    def notify():
+        with condition:
+            ready.append(True)
+            condition.notify()
+
+    with condition:
+        thread = threading.Thread(target=notify)
+        thread.start()
+        assert condition.wait_for(lambda: ready, timeout=TIMEOUT)
+        assert lock._is_owned()
+    thread.join()
+
+
+def test_reads_do_not_wait_for_disk(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    manager = FinanceManager(filename, thread_safe=True)
+    manager.add_record(record())
+    storage = manager.storage
+    writing = threading.Event()
+    release = threading.Event()
+    write_snapshot = storage.write_snapshot
+
+    def slow_write_snapshot(data):
+        writing.set()
+        release.wait(TIMEOUT)
+        write_snapshot(data)
+
+    storage.write_snapshot = slow_write_snapshot
+    writers = [threading.Thread(target=manager.add_record, args=(record(),))]
+    writers[0].start()
+    try:
+        assert writing.wait(TIMEOUT)
+        # Второе изменение ждёт записи первого, но не под mutex.
+        writers.append(threading.Thread(target=manager.add_record, args=(record(),)))
+        writers[1].start()
+        deadline = time.monotonic() + TIMEOUT
+        while len(manager.data) < 3 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        time.sleep(0.05)
+        reads = []
+        reader = threading.Thread(target=lambda: reads.append(manager.get_all_records()))
+        reader.start()
+        reader.join(1)
+        assert not reader.is_alive()
+        assert len(reads[0]) == 3
+    finally:
+        release.set()
+        for writer in writers:
+            writer.join(TIMEOUT)
+    assert len(read_file(filename)) == 3
+
+
+def test_concurrent_writers(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    manager = FinanceManager(filename, thread_safe=True)
+
+    def add():
+        for _ in range(50):
+            manager.add_record(record())
+
+    threads = [threading.Thread(target=add) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    manager.flush()
+    assert len(manager.data) == 200
+    assert len(read_file(filename)) == 200
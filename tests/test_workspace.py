@@ -0,0 +1,138 @@
+import io
+import json
+import os
+
+import pytest
+
+from personal_assistant import (
+    FinanceRecord,
+    Note,
+    Task,
+    Workspace,
+    cli,
+    offer_adoption,
+)
+from storage import JsonStorage
+
+
+def note(title="заметка"):
+    return Note(title, "текст", "01-02-2024 12:00:00")
+
+
+def record(amount=1.0):
+    return FinanceRecord(amount, "еда", "01-02-2024", "")
+
+
+def read_journal(filename):
+    with open(filename + ".journal") as file:
+        return [json.loads(line) for line in file]
+
+
+def test_mutation_does_not_rewrite_other_sections(tmp_path):
+    filename = str(tmp_path / "assistant.json")
+    workspace = Workspace(filename)
+    for _ in range(10):
+        workspace["finance"].add_record(record())
+    before = os.stat(filename)
+    snapshots = workspace.storage.storage.snapshots
+    added = note()
+    workspace["notes"].create_note(added)
+    # Снимок общего файла не переписан: изменение ушло в журнал.
+    assert os.stat(filename).st_ino == before.st_ino
+    assert os.path.getsize(filename) == before.st_size
+    assert workspace.storage.storage.snapshots == snapshots
+    assert read_journal(filename)[-1] == dict(
+        op="put", id=["notes", added.id], value=added.to_json()
+    )
+    reopened = Workspace(filename)
+    assert list(reopened["notes"].data) == [added.id]
+    assert len(reopened["finance"].data) == 10
+
+
+def test_journal_compaction_keeps_all_sections(tmp_path):
+    filename = str(tmp_path / "assistant.json")
+    workspace = Workspace(filename, compact_every=3)
+    notes, finance = workspace["notes"], workspace["finance"]
+    kept = note()
+    notes.create_note(kept)
+    finance.add_record(record(2.0))
+    gone = note()
+    notes.create_note(gone)
+    notes.delete_note(gone.id)
+    assert os.path.getsize(filename + ".journal") > 0
+    reopened = Workspace(filename)
+    assert list(reopened["notes"].data) == [kept.id]
+    assert reopened["finance"].calculate_balance() == 2.0
+    with open(filename) as file:
+        assert set(json.load(file)) == {"notes", "finance"}
+
+
+def test_transaction_rolls_back_every_section(tmp_path):
+    filename = str(tmp_path / "assistant.json")
+    workspace = Workspace(filename)
+    with pytest.raises(RuntimeError):
+        with workspace.transaction("notes", "finance"):
+            workspace["notes"].create_note(note())
+            workspace["finance"].add_record(record())
+            raise RuntimeError
+    with workspace.transaction("notes", "tasks"):
+        workspace["notes"].create_note(note())
+        workspace["tasks"].add_task(Task("задача", "", "Высокий", "01-02-2024"))
+    # Пакет двух разделов — одна дозапись журнала.
+    assert len(read_journal(filename)) == 2
+    reopened = Workspace(filename)
+    assert (len(reopened["notes"].data), len(reopened["finance"].data)) == (1, 0)
+    assert len(reopened["tasks"].data) == 1
+
+
+def legacy_files(directory, **sections):
+    for kind, data in sections.items():
+        JsonStorage(str(directory / f"{kind}.json")).save(data)
+
+
+def test_opening_does_not_adopt_legacy_files(tmp_path, monkeypatch, capsys, caplog):
+    monkeypatch.chdir(tmp_path)
+    legacy = note()
+    legacy_files(tmp_path, notes={legacy.id: legacy.to_json()})
+    assert cli(["notes", "list"]) == 0
+    assert capsys.readouterr().out == ""
+    assert (tmp_path / "notes.json").exists()
+    assert not (tmp_path / "notes.json.adopted").exists()
+    assert "командой adopt" in caplog.text
+
+    assert cli(["adopt"]) == 0
+    assert capsys.readouterr().out == "notes: notes.json\n"
+    assert not (tmp_path / "notes.json").exists()
+    assert (tmp_path / "notes.json.adopted").exists()
+    assert cli(["notes", "list"]) == 0
+    assert json.loads(capsys.readouterr().out)["id"] == legacy.id
+
+
+def test_adoption_refuses_non_empty_sections(tmp_path):
+    filename = str(tmp_path / "assistant.json")
+    workspace = Workspace(filename)
+    workspace["notes"].create_note(note())
+    legacy_files(tmp_path, notes={}, finance={})
+    with pytest.raises(ValueError, match="notes"):
+        workspace.adopt_files()
+    assert (tmp_path / "notes.json").exists()
+    assert (tmp_path / "finance.json").exists()
+    assert len(workspace["notes"].data) == 1
+
+
+@pytest.mark.parametrize("answer, adopted", [("да\n", True), ("нет\n", False)])
+def test_menu_asks_before_adopting(tmp_path, monkeypatch, answer, adopted):
+    legacy = record()
+    legacy_files(tmp_path, finance={legacy.id: legacy.to_json()})
+    workspace = Workspace(str(tmp_path / "assistant.json"))
+    monkeypatch.setattr("sys.stdin", io.StringIO(answer))
+    offer_adoption(workspace)
+    assert (tmp_path / "finance.json.adopted").exists() == adopted
+    assert len(workspace["finance"].data) == adopted
+
+
+def test_cli_accepts_journal_for_workspace(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    assert cli(["finance", "balance", "--journal"]) == 0
+    assert cli(["finance", "balance", "--backend=journal"]) == 0
+    assert cli(["finance", "balance", "--lazy"]) == 1
@@ -0,0 +1,79 @@
+import json
+import time
+
+import pytest
+
+from personal_assistant import FinanceManager, FinanceRecord
+
+TIMEOUT = 5
+
+
+def record(amount=1.0):
+    return FinanceRecord(amount, "еда", "01-02-2024", "описание")
+
+
+def read_file(filename: str) -> dict:
+    with open(filename) as file:
+        return json.load(file)
+
+
+def test_write_behind_defers_until_flush(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    manager = FinanceManager(filename, write_behind=60)
+    items = [record(amount) for amount in range(5)]
+    for item in items:
+        manager.add_record(item)
+    assert read_file(filename) == {}
+    manager.flush()
+    assert set(read_file(filename)) == {item.id for item in items}
+    manager.storage.close()
+
+
+def test_background_flush_and_close(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    manager = FinanceManager(filename, write_behind=0.01)
+    first = record()
+    manager.add_record(first)
+    deadline = time.monotonic() + TIMEOUT
+    while not read_file(filename) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert list(read_file(filename)) == [first.id]
+
+    manager.storage.write_behind = 60
+    second = record()
+    manager.add_record(second)
+    manager.storage.close()
+    assert set(read_file(filename)) == {first.id, second.id}
+
+
+def test_flush_every_triggers_write(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    manager = FinanceManager(filename, write_behind=60, flush_every=10)
+    for _ in range(10):
+        manager.add_record(record())
+    deadline = time.monotonic() + TIMEOUT
+    while len(read_file(filename)) < 10 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(read_file(filename)) == 10
+    manager.storage.close()
+
+
+def test_journal_flushes_coalesced_changes(tmp_path):
+    filename = str(tmp_path / "finance.json")
+    manager = FinanceManager(filename, journal=True, write_behind=60)
+    items = [record(amount) for amount in range(10)]
+    for item in items:
+        manager.add_record(item)
+    manager.delete_record(items[0].id)
+    manager.flush()
+    manager.storage.close()
+    with open(filename + ".journal") as file:
+        assert len(file.readlines()) == 11
+    reopened = FinanceManager(filename, journal=True)
+    assert set(reopened.data) == {item.id for item in items[1:]}
+
+
+@pytest.mark.parametrize("option", [dict(shared=True), dict(lazy=True)])
+def test_incompatible_options(tmp_path, option):
+    with pytest.raises(ValueError):
+        FinanceManager(str(tmp_path / "finance.json"), write_behind=1, **option)